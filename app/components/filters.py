@@ -4,10 +4,37 @@ Filters Component
 
 Componente de filtros interactivos para el dataset.
 Permite filtrar por año, magnitud, profundidad, tsunami, etc.
+
+Los widgets solo producen el estado de los filtros; el filtrado en sí lo
+hace utils/filter_engine.py en una sola pasada.
+
+En el menú lateral los controles viven en un fragmento de Streamlit: mover
+un slider solo vuelve a ejecutar el panel (con una vista previa del número
+de eventos), y la página se recalcula una sola vez al pulsar "Aplicar".
+El estado aplicado se refleja en la URL (`?f=...`, ver utils/filter_spec.py)
+para compartir la vista.
 """
 
+import math
+
 import streamlit as st
-import pandas as pd
+from utils.derived_columns import get_derived, is_available
+from utils.filter_engine import (
+    CATEGORY_FILTERS,
+    DEFAULT_FILTER_STATE,
+    HEMISPHERES,
+    count_filtered,
+    filter_catalog,
+)
+from utils.filter_spec import FILTER_SPEC_PARAM, decode_filter_spec, encode_filter_spec
+from utils.regions import bbox_region, parse_polygon
+
+
+# Clave de session_state con el estado de filtros aplicado
+APPLIED_FILTERS_KEY = 'applied_filters'
+
+# Prefijo de las claves de session_state de los widgets de filtro
+WIDGET_KEY_PREFIX = 'filter_'
 
 
 # ============================================================================
@@ -23,9 +50,22 @@ def apply_filters(df):
         
     Returns:
         pd.DataFrame: DataFrame filtrado según las selecciones del usuario
+            (de solo lectura: puede ser el propio catálogo)
+    """
+    return filter_catalog(df, render_filter_controls(df))
+
+
+def render_filter_controls(df):
     """
+    Renderiza los controles de filtro y retorna su estado.
     
-    df_filtered = df.copy()
+    Args:
+        df (pd.DataFrame): DataFrame original
+        
+    Returns:
+        dict: Estado de los filtros (ver filter_engine.DEFAULT_FILTER_STATE)
+    """
+    state = dict(DEFAULT_FILTER_STATE)
     
     # ===== FILTRO DE AÑOS =====
     st.markdown("#### 📅 Período de Tiempo")
@@ -37,14 +77,11 @@ def apply_filters(df):
         "Rango de años:",
         min_value=min_year,
         max_value=max_year,
-        value=(min_year, max_year),
-        step=1
+        step=1,
+        key=_widget_key('year_range', (min_year, max_year))
     )
     
-    df_filtered = df_filtered[
-        (df_filtered['Year'] >= year_range[0]) & 
-        (df_filtered['Year'] <= year_range[1])
-    ]
+    state['year_range'] = year_range
     
     # ===== FILTRO DE MAGNITUD =====
     st.markdown("#### 📏 Magnitud")
@@ -56,73 +93,77 @@ def apply_filters(df):
         "Rango de magnitud:",
         min_value=min_mag,
         max_value=max_mag,
-        value=(min_mag, max_mag),
-        step=0.1
+        step=0.1,
+        key=_widget_key('mag_range', (min_mag, max_mag))
     )
     
-    df_filtered = df_filtered[
-        (df_filtered['magnitude'] >= mag_range[0]) & 
-        (df_filtered['magnitude'] <= mag_range[1])
-    ]
+    state['mag_range'] = mag_range
     
     # ===== FILTRO DE PROFUNDIDAD =====
     st.markdown("#### 🌍 Profundidad")
     
+    # Redondeo hacia arriba: el valor por defecto no debe excluir el evento
+    # más profundo
+    depth_limit = math.ceil(df['depth'].max())
     max_depth = st.slider(
         "Profundidad máxima (km):",
         min_value=0,
-        max_value=int(df['depth'].max()),
-        value=int(df['depth'].max()),
-        step=10
+        max_value=depth_limit,
+        step=10,
+        key=_widget_key('max_depth', depth_limit)
     )
     
-    df_filtered = df_filtered[df_filtered['depth'] <= max_depth]
+    state['max_depth'] = max_depth
     
     # ===== FILTRO DE TSUNAMI =====
     st.markdown("#### 🌊 Tipo de Evento")
     
     tsunami_filter = st.selectbox(
         "Filtrar por tsunami:",
-        options=["Todos", "Solo con Tsunami", "Solo sin Tsunami"]
+        options=["Todos", "Solo con Tsunami", "Solo sin Tsunami"],
+        key=_widget_key('tsunami', "Todos")
     )
     
     if tsunami_filter == "Solo con Tsunami":
-        df_filtered = df_filtered[df_filtered['tsunami'] == 1]
+        state['tsunami'] = 1
     elif tsunami_filter == "Solo sin Tsunami":
-        df_filtered = df_filtered[df_filtered['tsunami'] == 0]
+        state['tsunami'] = 0
     
     # ===== FILTRO DE REGIÓN (por hemisferio) =====
     st.markdown("#### 🗺️ Región Geográfica")
     
-    regions = st.multiselect(
+    state['hemispheres'] = st.multiselect(
         "Selecciona hemisferios:",
-        options=["Norte", "Sur", "Este", "Oeste"],
-        default=["Norte", "Sur", "Este", "Oeste"]
+        options=HEMISPHERES,
+        key=_widget_key('hemispheres', list(HEMISPHERES))
     )
     
-    # Aplicar filtro de región
-    if "Norte" not in regions:
-        df_filtered = df_filtered[df_filtered['latitude'] < 0]
-    if "Sur" not in regions:
-        df_filtered = df_filtered[df_filtered['latitude'] >= 0]
-    if "Este" not in regions:
-        df_filtered = df_filtered[df_filtered['longitude'] < 0]
-    if "Oeste" not in regions:
-        df_filtered = df_filtered[df_filtered['longitude'] >= 0]
+    state['region'] = render_region_control()
     
     # ===== FILTRO AVANZADO (opcional) =====
     with st.expander("⚙️ Filtros Avanzados"):
         
         # Filtro por categoría de magnitud
-        if 'magnitude_category' in df.columns:
+        if is_available(df, 'magnitude_category'):
+            magnitude_category = get_derived(df, 'magnitude_category')
             mag_cats = st.multiselect(
                 "Categorías de magnitud:",
-                options=df['magnitude_category'].dropna().unique().tolist(),
-                default=df['magnitude_category'].dropna().unique().tolist()
+                options=magnitude_category.dropna().unique().tolist(),
+                key=_widget_key('magnitude_categories', magnitude_category.dropna().unique().tolist())
             )
             
-            if mag_cats:
-                df_filtered = df_filtered[df_filtered['magnitude_category'].isin(mag_cats)]
+            state['magnitude_categories'] = mag_cats
+        
+        # Filtro por categoría de profundidad
+        if is_available(df, 'depth_category'):
+            depth_category = get_derived(df, 'depth_category')
+            depth_cats = st.multiselect(
+                "Categorías de profundidad:",
+                options=depth_category.dropna().unique().tolist(),
+                key=_widget_key('depth_categories', depth_category.dropna().unique().tolist())
+            )
+            
+            state['depth_categories'] = depth_cats
         
         # Filtro por significancia
         if 'sig' in df.columns:
@@ -130,51 +171,227 @@ def apply_filters(df):
                 "Significancia mínima:",
                 min_value=int(df['sig'].min()),
                 max_value=int(df['sig'].max()),
-                value=int(df['sig'].min())
+                key=_widget_key('min_sig', int(df['sig'].min()))
             )
             
-            df_filtered = df_filtered[df_filtered['sig'] >= min_sig]
+            state['min_sig'] = min_sig
         
         # Filtro por eventos superficiales
-        shallow_only = st.checkbox("Solo eventos superficiales (< 50km)", value=False)
-        if shallow_only:
-            df_filtered = df_filtered[df_filtered['depth'] < 50]
+        state['shallow_only'] = st.checkbox(
+            "Solo eventos superficiales (< 50km)",
+            key=_widget_key('shallow_only', False)
+        )
         
         # Filtro por magnitud alta
-        high_mag_only = st.checkbox("Solo magnitud alta (≥ 7.0)", value=False)
-        if high_mag_only:
-            df_filtered = df_filtered[df_filtered['magnitude'] >= 7.0]
+        state['high_mag_only'] = st.checkbox(
+            "Solo magnitud alta (≥ 7.0)",
+            key=_widget_key('high_mag_only', False)
+        )
+        
+        # Filtro de réplicas (declustering de Gardner-Knopoff)
+        if is_available(df, 'is_mainshock'):
+            state['mainshock_only'] = st.checkbox(
+                "Solo eventos principales (sin réplicas)",
+                key=_widget_key('mainshock_only', False)
+            )
     
     # ===== BOTÓN DE RESET =====
     if st.button("🔄 Resetear Filtros", use_container_width=True):
+        reset_filters()
         st.rerun()
     
-    return df_filtered
+    return state
+
+
+def _widget_key(name, default):
+    """Retorna la clave de un widget de filtro, con su valor inicial."""
+    key = WIDGET_KEY_PREFIX + name
+    if key not in st.session_state:
+        st.session_state[key] = default
+    return key
+
+
+def reset_filters():
+    """Devuelve los widgets de filtro a sus valores por defecto."""
+    for key in list(st.session_state):
+        if key.startswith(WIDGET_KEY_PREFIX) or key == APPLIED_FILTERS_KEY:
+            del st.session_state[key]
+    st.query_params.pop(FILTER_SPEC_PARAM, None)
+
+
+def seed_filter_widgets(df, state):
+    """
+    Da a los widgets de filtro los valores de un estado (p. ej. de la URL).
+    
+    Los rangos se recortan a los límites del catálogo y las categorías
+    desconocidas se descartan, para que los widgets acepten los valores.
+    
+    Args:
+        df (pd.DataFrame): DataFrame original
+        state (dict): Estado de los filtros
+    """
+    values = {}
+    
+    def clamp(column, value, cast):
+        return cast(min(max(value, df[column].min()), df[column].max()))
+    
+    if state['year_range'] is not None:
+        values['year_range'] = tuple(clamp('Year', v, int) for v in state['year_range'])
+    if state['mag_range'] is not None:
+        values['mag_range'] = tuple(clamp('magnitude', v, float) for v in state['mag_range'])
+    if state['max_depth'] is not None:
+        values['max_depth'] = clamp('depth', state['max_depth'], math.ceil)
+    if state['tsunami'] is not None:
+        values['tsunami'] = "Solo con Tsunami" if state['tsunami'] == 1 else "Solo sin Tsunami"
+    values['hemispheres'] = list(state['hemispheres'])
+    if state['min_sig'] is not None and 'sig' in df.columns:
+        values['min_sig'] = clamp('sig', state['min_sig'], int)
+    values['shallow_only'] = state['shallow_only']
+    values['high_mag_only'] = state['high_mag_only']
+    values['mainshock_only'] = state['mainshock_only']
+    
+    for key, column in CATEGORY_FILTERS.items():
+        if state[key] is not None and is_available(df, column):
+            options = get_derived(df, column).dropna().unique().tolist()
+            values[key] = [value for value in state[key] if value in options]
+    
+    region = state['region']
+    if region is not None and region[0] == 'bbox':
+        values['region_type'] = "Rectángulo"
+        values.update(zip(('south', 'north', 'west', 'east'), region[1:]))
+    elif region is not None:
+        values['region_type'] = "Polígono"
+        values['polygon'] = "; ".join(f"{lon:g}, {lat:g}" for lon, lat in region[1])
+    
+    for key, value in values.items():
+        st.session_state[WIDGET_KEY_PREFIX + key] = value
+
+
+# ============================================================================
+# PANEL DE FILTROS CON APLICACIÓN DIFERIDA
+# ============================================================================
+
+def render_filter_panel(df):
+    """
+    Renderiza los controles de filtro y retorna el estado aplicado.
+    
+    Los cambios en los widgets solo vuelven a ejecutar el panel; el estado
+    aplicado (y con él la página) cambia al pulsar "Aplicar Filtros". Al
+    abrir la sesión, los filtros se toman de la URL si traen especificación.
+    
+    Args:
+        df (pd.DataFrame): DataFrame original
+        
+    Returns:
+        dict: Último estado de filtros aplicado
+    """
+    if APPLIED_FILTERS_KEY not in st.session_state:
+        spec = st.query_params.get(FILTER_SPEC_PARAM)
+        if spec:
+            try:
+                seed_filter_widgets(df, decode_filter_spec(spec))
+            except ValueError as e:
+                st.warning(f"⚠️ Filtros del enlace no válidos ({e}); se usan los valores por defecto.")
+    
+    _filter_panel(df)
+    return st.session_state[APPLIED_FILTERS_KEY]
+
+
+@st.fragment
+def _filter_panel(df):
+    """Fragmento con los controles, la vista previa y el botón de aplicar."""
+    draft = render_filter_controls(df)
+    
+    # Primera ejecución de la sesión: los valores por defecto ya están aplicados
+    applied = st.session_state.setdefault(APPLIED_FILTERS_KEY, draft)
+    pending = draft != applied
+    
+    # Vista previa: solo el conteo, con los índices (sin filtrar filas)
+    if pending:
+        count, tsunamis = count_filtered(df, draft)
+        st.caption(f"Vista previa: **{count:,}** eventos ({tsunamis:,} con tsunami)")
+    
+    if st.button("✅ Aplicar Filtros", type="primary", disabled=not pending,
+                 use_container_width=True):
+        st.session_state[APPLIED_FILTERS_KEY] = draft
+        spec = encode_filter_spec(draft)
+        if spec:
+            st.query_params[FILTER_SPEC_PARAM] = spec
+        else:
+            st.query_params.pop(FILTER_SPEC_PARAM, None)
+        st.rerun()
+
+
+def render_region_control():
+    """
+    Renderiza el selector de región (rectángulo o polígono).
+    
+    Returns:
+        tuple: Región (ver utils/regions.py) o None si no hay región o no
+            es válida
+    """
+    region_type = st.selectbox(
+        "Área personalizada:",
+        options=["Ninguna", "Rectángulo", "Polígono"],
+        key=_widget_key('region_type', "Ninguna")
+    )
+    
+    try:
+        if region_type == "Rectángulo":
+            col1, col2 = st.columns(2)
+            with col1:
+                north = st.number_input("Norte:", min_value=-90.0, max_value=90.0,
+                                        key=_widget_key('north', 90.0))
+                west = st.number_input("Oeste:", min_value=-180.0, max_value=180.0,
+                                       key=_widget_key('west', -180.0))
+            with col2:
+                south = st.number_input("Sur:", min_value=-90.0, max_value=90.0,
+                                        key=_widget_key('south', -90.0))
+                east = st.number_input("Este:", min_value=-180.0, max_value=180.0,
+                                       key=_widget_key('east', 180.0))
+            st.caption("Si oeste > este, el rectángulo cruza la línea de cambio de fecha.")
+            return bbox_region(south, north, west, east)
+        
+        if region_type == "Polígono":
+            text = st.text_area(
+                "Vértices (lon, lat; lon, lat; ...):",
+                key=_widget_key('polygon', "-82, -5; -70, -5; -68, -40; -78, -40")
+            )
+            return parse_polygon(text)
+    except ValueError as e:
+        st.error(f"Región no válida: {e}")
+    
+    return None
 
 
 # ============================================================================
 # FUNCIONES AUXILIARES
 # ============================================================================
 
-def get_filter_summary(df_original, df_filtered):
+def get_filter_summary(df_original, filter_state):
     """
     Genera un resumen de los filtros aplicados.
     
+    Los conteos salen de los índices del motor de filtrado (bitmaps y
+    popcount), sin construir el DataFrame filtrado.
+    
     Args:
         df_original (pd.DataFrame): DataFrame original
-        df_filtered (pd.DataFrame): DataFrame filtrado
+        filter_state (dict): Estado de los filtros (ver render_filter_controls)
         
     Returns:
         dict: Diccionario con estadísticas de filtrado
     """
     
+    filtered_count, tsunami_count = count_filtered(df_original, filter_state)
+    
     summary = {
         'original_count': len(df_original),
-        'filtered_count': len(df_filtered),
-        'percentage': (len(df_filtered) / len(df_original)) * 100 if len(df_original) > 0 else 0,
-        'removed_count': len(df_original) - len(df_filtered),
-        'tsunami_count': df_filtered['tsunami'].sum() if 'tsunami' in df_filtered.columns else 0,
-        'tsunami_percentage': (df_filtered['tsunami'].sum() / len(df_filtered) * 100) if len(df_filtered) > 0 else 0
+        'filtered_count': filtered_count,
+        'percentage': (filtered_count / len(df_original)) * 100 if len(df_original) > 0 else 0,
+        'removed_count': len(df_original) - filtered_count,
+        'tsunami_count': tsunami_count,
+        'tsunami_percentage': (tsunami_count / filtered_count * 100) if filtered_count > 0 else 0
     }
     
     return summary
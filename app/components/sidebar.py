@@ -6,7 +6,9 @@ Componente del menú lateral con navegación y filtros interactivos.
 """
 
 import streamlit as st
-from components.filters import apply_filters
+from components.filters import render_filter_panel
+from utils.filter_engine import filter_catalog
+from pages import PAGE_MODULES
 
 
 # ============================================================================
@@ -21,7 +23,7 @@ def render_sidebar(df):
         df (pd.DataFrame): DataFrame completo de terremotos
         
     Returns:
-        tuple: (página_seleccionada, dataframe_filtrado)
+        tuple: (página_seleccionada, dataframe_filtrado, estado_de_filtros)
     """
     
     with st.sidebar:
@@ -42,15 +44,8 @@ def render_sidebar(df):
         # ===== NAVEGACIÓN =====
         st.markdown("### 🧭 Navegación")
         
-        pages = [
-            "🏠 Inicio",
-            "📊 Exploración de Datos",
-            "🗺️ Análisis Geoespacial",
-            "📅 Análisis Temporal",
-            "🔬 Análisis Multivariable",
-            "📝 Conclusiones",
-            "🤖 Machine Learning"
-        ]
+        # Las páginas se registran en pages/__init__.py
+        pages = list(PAGE_MODULES)
         
         page_selected = st.radio(
             label="Selecciona una sección:",
@@ -63,8 +58,11 @@ def render_sidebar(df):
         # ===== FILTROS =====
         st.markdown("### 🎛️ Filtros de Datos")
         
-        # Aplicar filtros y obtener el dataframe filtrado
-        df_filtered = apply_filters(df)
+        # Los cambios se aplican con el botón del panel; se filtra con el
+        # último estado aplicado (que también sirve para los conteos sin
+        # materializar filas)
+        filter_state = render_filter_panel(df)
+        df_filtered = filter_catalog(df, filter_state)
         
         st.markdown("---")
         
@@ -95,6 +93,7 @@ def render_sidebar(df):
                 
                 1. **Navegación:** Usa el menú superior para cambiar de sección
                 2. **Filtros:** Ajusta los parámetros en este panel lateral
+                   y pulsa "Aplicar Filtros"
                 3. **Interacción:** Los gráficos son interactivos (zoom, hover, etc.)
                 4. **Descarga:** Muchas visualizaciones permiten exportar datos
                 
@@ -107,4 +106,4 @@ def render_sidebar(df):
                 """
             )
     
-    return page_selected, df_filtered
+    return page_selected, df_filtered, filter_state
@@ -11,17 +11,17 @@ Fecha: 2025-10-16
 
 import streamlit as st
 from components.sidebar import render_sidebar
-from components.filters import apply_filters
-from pages import (
-    introduccion,
-    exploracion_datos,
-    analisis_geoespacial,
-    analisis_temporal,
-    analisis_multivariable,
-    conclusiones,
-    machine_learning
-)
-from utils.data_loader import load_data, get_data_info
+from components.filters import get_filter_summary
+from pages import PAGE_IMPORT_TIMES, PAGE_MODULES, load_page, measure_page_imports
+from utils.data_loader import load_data, load_quarantine, get_data_info, memory_report
+from utils.aggregate_cache import get_aggregate_cache_stats
+from utils.catalog_cache import get_cache_stats
+from utils.cube import get_cube_stats, set_cube_source
+from utils.derived_columns import with_derived_columns
+from utils.filter_engine import get_filter_cache_stats
+from utils.filter_spec import encode_filter_spec, spec_fingerprint
+from utils.fingerprint import get_fingerprint, set_fingerprint
+from utils.validation import report_table
 from utils.styles import apply_custom_css
 
 
@@ -72,46 +72,100 @@ def main():
         col2.metric("Eventos con Tsunami", data_info['tsunami_events'])
         col3.metric("% Tsunamis", f"{data_info['tsunami_percentage']:.2f}%")
         col4.metric("Años de Datos", data_info['years_span'])
+        
+        cache_stats = get_cache_stats()
+        st.caption(f"💾 Caché en disco: {cache_stats['hits']} aciertos, "
+                   f"{cache_stats['misses']} fallos · versión del catálogo "
+                   f"`{get_fingerprint(df)[:12]}`")
+        filter_stats = get_filter_cache_stats()
+        st.caption(f"🎛️ Caché de filtros: {filter_stats['hits']} aciertos, "
+                   f"{filter_stats['misses']} fallos, {filter_stats['entries']} resultados "
+                   f"({filter_stats['bytes'] / 1024 ** 2:.1f} MB)")
+        aggregate_stats = get_aggregate_cache_stats()
+        st.caption(f"📦 Caché de agregados: {aggregate_stats['hits']} aciertos, "
+                   f"{aggregate_stats['misses']} fallos, {aggregate_stats['waits']} esperas, "
+                   f"{aggregate_stats['entries']} agregados "
+                   f"({aggregate_stats['bytes'] / 1024 ** 2:.1f} MB)")
+        cube_stats = get_cube_stats()
+        st.caption(f"🧊 Cubo de agregados: {cube_stats['cube']} consultas desde el cubo, "
+                   f"{cube_stats['selection']} desde cubos de selección "
+                   f"({cube_stats['updates']} actualizados por diferencias, "
+                   f"{cube_stats['rebuilds']} construidos), "
+                   f"{cube_stats['rows']} desde las filas filtradas")
+        
+        mem_report = memory_report(df)
+        st.caption(f"🧠 Memoria del catálogo: {mem_report['MB'].sum():.2f} MB")
+        if st.checkbox("Mostrar uso de memoria por columna", value=False):
+            st.dataframe(mem_report.round(3), use_container_width=True)
+        
+        # Se rellena al final, cuando la página seleccionada ya se importó
+        show_import_times = st.checkbox("Mostrar tiempos de importación de páginas", value=False)
+        import_report = st.empty()
+        
+        validation = df.attrs.get('validation')
+        if validation:
+            st.caption(f"🧹 Validación: {validation['rejected']} de "
+                       f"{validation['rows']} filas en cuarentena")
+            if validation['rejected'] and st.checkbox("Mostrar reporte de validación", value=False):
+                st.dataframe(report_table(validation), use_container_width=True)
+                quarantine = load_quarantine()
+                if quarantine is not None:
+                    st.dataframe(quarantine, use_container_width=True)
     
     # Renderizar el menú lateral con filtros y navegación
-    page_selected, df_filtered = render_sidebar(df)
+    page_selected, df_filtered, filter_state = render_sidebar(df)
+    summary = get_filter_summary(df, filter_state)
     
     # Mostrar advertencia si no hay datos después de aplicar filtros
-    if df_filtered.empty:
+    if summary['filtered_count'] == 0:
         st.warning("⚠️ No hay datos disponibles con los filtros seleccionados. Ajusta los parámetros.")
         st.stop()
     
     # Mostrar métricas de datos filtrados
     st.sidebar.markdown("---")
     st.sidebar.markdown("### 📊 Datos Filtrados")
-    st.sidebar.info(f"**Eventos:** {len(df_filtered)} de {len(df)}")
-    st.sidebar.info(f"**Tsunamis:** {df_filtered['tsunami'].sum()} "
-                   f"({df_filtered['tsunami'].sum()/len(df_filtered)*100:.1f}%)")
+    st.sidebar.info(f"**Eventos:** {summary['filtered_count']} de {summary['original_count']}")
+    st.sidebar.info(f"**Tsunamis:** {summary['tsunami_count']} "
+                   f"({summary['tsunami_percentage']:.1f}%)")
     
     # Navegación entre páginas
     st.markdown("---")
     
-    # Renderizar la página seleccionada
-    if page_selected == "🏠 Inicio":
-        introduccion.render(df_filtered)
-    
-    elif page_selected == "📊 Exploración de Datos":
-        exploracion_datos.render(df_filtered)
-    
-    elif page_selected == "🗺️ Análisis Geoespacial":
-        analisis_geoespacial.render(df_filtered)
-    
-    elif page_selected == "📅 Análisis Temporal":
-        analisis_temporal.render(df_filtered)
-    
-    elif page_selected == "🔬 Análisis Multivariable":
-        analisis_multivariable.render(df_filtered)
-    
-    elif page_selected == "📝 Conclusiones":
-        conclusiones.render(df_filtered)
-    
-    elif page_selected == "🤖 Machine Learning":
-        machine_learning.render(df_filtered)
+    # Renderizar la página seleccionada (importada bajo demanda), con las
+    # columnas derivadas que usa
+    page_module = load_page(page_selected)
+    df_page = with_derived_columns(df_filtered, df, page_module.REQUIRED_DERIVED_COLUMNS)
+    
+    # Huella de los datos de la página, para las cachés que dependan de ellos
+    # (utils/aggregate_cache.py): se deriva de la especificación de los
+    # filtros, así que un enlace compartido reutiliza los agregados ya
+    # calculados. Sin filtros ni columnas derivadas, la página recibe el
+    # propio catálogo.
+    if df_page is not df:
+        set_fingerprint(df_page, spec_fingerprint(
+            df, encode_filter_spec(filter_state), df_page.columns
+        ))
+    # Origen de los datos, para responder las agregaciones con el cubo
+    set_cube_source(df_page, df, filter_state)
+    page_module.render(df_page)
+    
+    if show_import_times:
+        with st.spinner("Midiendo importaciones en frío..."):
+            cold_times = measure_page_imports()
+        import_report.dataframe(
+            {
+                'página': list(PAGE_MODULES),
+                'importación (s)': [
+                    PAGE_IMPORT_TIMES.get(module_name)
+                    for module_name in PAGE_MODULES.values()
+                ],
+                'en frío (s)': [
+                    'n/d' if cold_times[label] is None else f"{cold_times[label]:.3f}"
+                    for label in PAGE_MODULES
+                ],
+            },
+            use_container_width=True
+        )
     
     # Footer
     st.markdown("---")
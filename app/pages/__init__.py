@@ -1,4 +1,118 @@
 """
 Pages package
 Módulo de páginas del dashboard.
+
+Las páginas se importan bajo demanda con `load_page()`: solo la página
+seleccionada carga sus dependencias pesadas, lo que acorta el arranque en
+frío de la aplicación. Streamlit ya importa plotly.graph_objects, así que lo
+que se aplaza es sobre todo scipy.stats (y los módulos de plotly.express).
 """
+
+import functools
+import importlib
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+
+# ============================================================================
+# REGISTRO DE PÁGINAS
+# ============================================================================
+
+# Etiqueta del menú lateral -> módulo de la página (en orden de menú)
+PAGE_MODULES = {
+    "🏠 Inicio": "pages.introduccion",
+    "📊 Exploración de Datos": "pages.exploracion_datos",
+    "🗺️ Análisis Geoespacial": "pages.analisis_geoespacial",
+    "📅 Análisis Temporal": "pages.analisis_temporal",
+    "🔬 Análisis Multivariable": "pages.analisis_multivariable",
+    "📝 Conclusiones": "pages.conclusiones",
+    "🤖 Machine Learning": "pages.machine_learning",
+}
+
+# Tiempo de la primera importación de cada página en este proceso (segundos)
+PAGE_IMPORT_TIMES = {}
+
+# Límite de cada importación en frío del reporte (segundos)
+IMPORT_TIMEOUT_SECONDS = 60
+
+_import_lock = threading.Lock()
+
+
+def load_page(label):
+    """
+    Importa (la primera vez) y retorna el módulo de una página.
+
+    Args:
+        label (str): Etiqueta de la página en el menú lateral
+
+    Returns:
+        module: Módulo con la función `render(df)`
+    """
+    module_name = PAGE_MODULES[label]
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+
+    with _import_lock:
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        PAGE_IMPORT_TIMES.setdefault(module_name, time.perf_counter() - start)
+    return module
+
+
+# ============================================================================
+# REPORTE DE IMPORTACIÓN
+# ============================================================================
+
+def measure_page_imports():
+    """
+    Mide el tiempo de importación en frío de cada página.
+
+    Cada página se importa en un intérprete nuevo que ya tiene Streamlit
+    cargado, de modo que el tiempo incluye todas las dependencias propias de
+    la página (como en su primer acceso en un contenedor recién arrancado).
+    Cuesta un arranque de intérprete por página, así que se mide una vez por
+    versión del código (ver _code_version) y los reruns reutilizan el
+    resultado.
+
+    Returns:
+        dict: {etiqueta: segundos, o None si la página no pudo importarse}
+    """
+    return _measure_page_imports(_code_version())
+
+
+@functools.lru_cache(maxsize=1)
+def _measure_page_imports(code_version):
+    """Mide las importaciones para una versión del código (ver measure_page_imports)."""
+    app_dir = Path(__file__).parent.parent
+    code = (
+        "import time, importlib, streamlit; t = time.perf_counter(); "
+        "importlib.import_module({!r}); print(time.perf_counter() - t)"
+    )
+
+    times = {}
+    for label, module_name in PAGE_MODULES.items():
+        try:
+            result = subprocess.run(
+                [sys.executable, "-c", code.format(module_name)],
+                cwd=app_dir, capture_output=True, text=True, check=True,
+                timeout=IMPORT_TIMEOUT_SECONDS
+            )
+            times[label] = float(result.stdout.strip().splitlines()[-1])
+        except (subprocess.SubprocessError, OSError, ValueError, IndexError):
+            # La página falla al importarse en frío: el reporte muestra "n/d"
+            times[label] = None
+    return times
+
+
+def _code_version():
+    """Rutas, tamaños y fechas de los fuentes de la aplicación."""
+    app_dir = Path(__file__).parent.parent
+    return tuple(
+        (str(path.relative_to(app_dir)), stat.st_size, stat.st_mtime_ns)
+        for path in sorted(app_dir.rglob('*.py'))
+        for stat in (path.stat(),)
+    )
@@ -5,9 +5,40 @@ Página de Análisis Geoespacial
 Mapas interactivos y análisis de patrones geográficos.
 """
 
+from functools import partial
+
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
+from utils.aggregate_cache import cached_aggregate
+from utils.cube import cube_rollup
+from utils.geo_bins import HEX_SIZE_DEGREES, MAP_POINT_LIMIT, MAP_RASTER_LIMIT, hexbin_aggregate, map_mode
+from utils.raster import RASTER_WIDTH, density_raster, density_ticks
+
+
+# Columnas derivadas que usa esta página (ver utils/derived_columns.py)
+REQUIRED_DERIVED_COLUMNS = ['monitoring_quality', 'impact_level']
+
+# Medida de cada celda que sustituye a cada columna en los mapas agregados
+HEXBIN_COLUMNS = {
+    'magnitude': 'magnitude_max',
+    'depth': 'depth_mean',
+    'sig': 'sig_max',
+    'tsunami_label': 'tsunami_share',
+}
+
+# Etiquetas de las medidas de las celdas
+HEXBIN_LABELS = {
+    'count': 'Eventos',
+    'tsunami_share': 'Proporción con tsunami',
+    'magnitude_max': 'Magnitud máx.',
+    'depth_mean': 'Profundidad media (km)',
+    'sig_max': 'Significancia máx.',
+    'nst_mean': 'Nº estaciones (media)',
+}
+
+# Leyenda de las imágenes de densidad separadas por tsunami
+RASTER_CLASS_LEGEND = {'Sin Tsunami': '#4488ff', 'Con Tsunami': '#ff4444'}
 
 
 # ============================================================================
@@ -63,6 +94,9 @@ def render(df):
 def render_main_map(df):
     """Renderiza el mapa principal de distribución global."""
     
+    # Con muchos eventos, celdas o imagen calculadas en el servidor
+    mode = map_mode(df)
+    
     col1, col2, col3 = st.columns([2, 2, 1])
     
     with col1:
@@ -80,14 +114,32 @@ def render_main_map(df):
         )
     
     with col3:
+        # La imagen de densidad solo se alinea con la proyección equirectangular
         projection = st.selectbox(
             "Proyección:",
             options=['natural earth', 'orthographic', 'equirectangular'],
-            index=0
+            index=0,
+            disabled=mode == 'raster',
+            help="Con imagen de densidad el mapa es siempre equirectangular." if mode == 'raster' else None
         )
     
     # Crear mapa
-    if color_by == 'tsunami_label':
+    if mode == 'raster':
+        fig = raster_map(
+            df,
+            title='Distribución Global de Terremotos',
+            weight='sig' if color_by == 'sig' else None,
+            split='tsunami' if color_by == 'tsunami_label' else None
+        )
+    elif mode == 'hexbins':
+        fig = hexbin_map(
+            df,
+            color=HEXBIN_COLUMNS[color_by],
+            title='Distribución Global de Terremotos',
+            color_scale='RdBu_r' if color_by == 'tsunami_label' else 'Viridis',
+            projection=projection
+        )
+    elif color_by == 'tsunami_label':
         fig = px.scatter_geo(
             df,
             lat='latitude',
@@ -131,19 +183,22 @@ def render_main_map(df):
     # Estadísticas del mapa
     col1, col2, col3, col4 = st.columns(4)
     
+    # Totales desde el cubo de agregados (una fila, sin dimensiones)
+    totals = cube_rollup(df, []).iloc[0]
+    
     with col1:
         st.metric("Eventos Visibles", f"{len(df):,}")
     
     with col2:
-        mag_avg = df['magnitude'].mean()
+        mag_avg = totals['magnitude_mean']
         st.metric("Magnitud Media", f"{mag_avg:.2f}")
     
     with col3:
-        depth_avg = df['depth'].mean()
+        depth_avg = totals['depth_mean']
         st.metric("Profundidad Media", f"{depth_avg:.1f} km")
     
     with col4:
-        tsunami_pct = (df['tsunami'].sum() / len(df) * 100) if len(df) > 0 else 0
+        tsunami_pct = (totals['tsunami_count'] / len(df) * 100) if len(df) > 0 else 0
         st.metric("% con Tsunami", f"{tsunami_pct:.1f}%")
 
 
@@ -162,17 +217,29 @@ def render_tsunami_depth_map(df):
     📏 **Tamaño** = Profundidad del epicentro
     """)
     
-    fig = px.scatter_geo(
-        df,
-        lat='latitude',
-        lon='longitude',
-        color='tsunami_label',
-        size='depth',
-        hover_data=['magnitude', 'depth', 'sig', 'Year'],
-        color_discrete_map={'Sin Tsunami': '#4488ff', 'Con Tsunami': '#ff4444'},
-        title='🌊 Tsunamis vs Profundidad del Epicentro',
-        labels={'tsunami_label': 'Tipo', 'depth': 'Profundidad (km)'}
-    )
+    mode = map_mode(df)
+    if mode == 'raster':
+        fig = raster_map(df, title='🌊 Tsunamis vs Profundidad del Epicentro', split='tsunami')
+    elif mode == 'hexbins':
+        fig = hexbin_map(
+            df,
+            color='tsunami_share',
+            title='🌊 Tsunamis vs Profundidad del Epicentro',
+            color_scale='RdBu_r',
+            hover=['depth_mean']
+        )
+    else:
+        fig = px.scatter_geo(
+            df,
+            lat='latitude',
+            lon='longitude',
+            color='tsunami_label',
+            size='depth',
+            hover_data=['magnitude', 'depth', 'sig', 'Year'],
+            color_discrete_map={'Sin Tsunami': '#4488ff', 'Con Tsunami': '#ff4444'},
+            title='🌊 Tsunamis vs Profundidad del Epicentro',
+            labels={'tsunami_label': 'Tipo', 'depth': 'Profundidad (km)'}
+        )
     
     fig.update_layout(
         height=600,
@@ -224,19 +291,32 @@ def render_ring_of_fire_map(df):
     🎨 **Color** = Magnitud del evento
     """)
     
-    fig = px.scatter_geo(
-        df,
-        lat='latitude',
-        lon='longitude',
-        color='magnitude',
-        size='sig',
-        symbol='tsunami',
-        hover_data=['depth', 'Year', 'sig'],
-        color_continuous_scale='Viridis',
-        symbol_map={0: 'circle', 1: 'diamond'},
-        title='🔥 Cinturón de Fuego: Zonas de Alto Riesgo Tsunamigénico',
-        labels={'magnitude': 'Magnitud', 'sig': 'Significancia'}
-    )
+    mode = map_mode(df)
+    if mode == 'raster':
+        fig = raster_map(df, title='🔥 Cinturón de Fuego: Zonas de Alto Riesgo Tsunamigénico',
+                         projection='orthographic')
+    elif mode == 'hexbins':
+        fig = hexbin_map(
+            df,
+            color='magnitude_max',
+            title='🔥 Cinturón de Fuego: Zonas de Alto Riesgo Tsunamigénico',
+            color_scale='Viridis',
+            hover=['depth_mean', 'sig_max']
+        )
+    else:
+        fig = px.scatter_geo(
+            df,
+            lat='latitude',
+            lon='longitude',
+            color='magnitude',
+            size='sig',
+            symbol='tsunami',
+            hover_data=['depth', 'Year', 'sig'],
+            color_continuous_scale='Viridis',
+            symbol_map={0: 'circle', 1: 'diamond'},
+            title='🔥 Cinturón de Fuego: Zonas de Alto Riesgo Tsunamigénico',
+            labels={'magnitude': 'Magnitud', 'sig': 'Significancia'}
+        )
     
     fig.update_layout(
         height=600,
@@ -248,12 +328,14 @@ def render_ring_of_fire_map(df):
             showcountries=True,
             countrycolor='gray',
             showcoastlines=True,
-            coastlinecolor='yellow',
-            projection_type='orthographic',
-            projection_rotation=dict(lon=-160, lat=0, roll=0)
+            coastlinecolor='yellow'
         )
     )
     
+    # La imagen de densidad solo se alinea con la proyección equirectangular
+    if mode != 'raster':
+        fig.update_geos(projection_type='orthographic', projection_rotation=dict(lon=-160, lat=0, roll=0))
+    
     st.plotly_chart(fig, use_container_width=True)
     
     # Regiones de mayor actividad
@@ -299,17 +381,28 @@ def render_monitoring_quality_map(df):
     """)
     
     if 'nst' in df.columns and 'dmin' in df.columns:
-        fig = px.scatter_geo(
-            df,
-            lat='latitude',
-            lon='longitude',
-            color='nst',
-            size='dmin',
-            hover_data=['magnitude', 'gap', 'sig', 'tsunami'],
-            color_continuous_scale='RdYlGn',
-            title='🎯 Cobertura de Monitoreo: Estaciones vs Distancia',
-            labels={'nst': 'Nº Estaciones', 'dmin': 'Distancia Mín. (°)'}
-        )
+        mode = map_mode(df)
+        if mode == 'raster':
+            fig = raster_map(df, title='🎯 Cobertura de Monitoreo: Densidad de Eventos', color_scale='Viridis')
+        elif mode == 'hexbins':
+            fig = hexbin_map(
+                df,
+                color='nst_mean',
+                title='🎯 Cobertura de Monitoreo: Estaciones por Celda',
+                color_scale='RdYlGn'
+            )
+        else:
+            fig = px.scatter_geo(
+                df,
+                lat='latitude',
+                lon='longitude',
+                color='nst',
+                size='dmin',
+                hover_data=['magnitude', 'gap', 'sig', 'tsunami'],
+                color_continuous_scale='RdYlGn',
+                title='🎯 Cobertura de Monitoreo: Estaciones vs Distancia',
+                labels={'nst': 'Nº Estaciones', 'dmin': 'Distancia Mín. (°)'}
+            )
         
         fig.update_layout(
             height=600,
@@ -365,19 +458,30 @@ def render_significant_events_map(df):
     🎨 **Color** = Puntaje de significancia
     """)
     
-    fig = px.scatter_geo(
-        df,
-        lat='latitude',
-        lon='longitude',
-        color='sig',
-        size='impact_level' if 'impact_level' in df.columns else 'sig',
-        symbol='tsunami',
-        hover_data=['magnitude', 'depth', 'Year'],
-        color_continuous_scale='Hot',
-        symbol_map={0: 'circle', 1: 'star'},
-        title='⚡ Significancia vs Impacto: Eventos Críticos',
-        labels={'sig': 'Significancia', 'impact_level': 'Impacto'}
-    )
+    mode = map_mode(df)
+    if mode == 'raster':
+        fig = raster_map(df, title='⚡ Significancia vs Impacto: Eventos Críticos', weight='sig', color_scale='Hot')
+    elif mode == 'hexbins':
+        fig = hexbin_map(
+            df,
+            color='sig_max',
+            title='⚡ Significancia vs Impacto: Eventos Críticos',
+            color_scale='Hot'
+        )
+    else:
+        fig = px.scatter_geo(
+            df,
+            lat='latitude',
+            lon='longitude',
+            color='sig',
+            size='impact_level' if 'impact_level' in df.columns else 'sig',
+            symbol='tsunami',
+            hover_data=['magnitude', 'depth', 'Year'],
+            color_continuous_scale='Hot',
+            symbol_map={0: 'circle', 1: 'star'},
+            title='⚡ Significancia vs Impacto: Eventos Críticos',
+            labels={'sig': 'Significancia', 'impact_level': 'Impacto'}
+        )
     
     fig.update_layout(
         height=600,
@@ -409,3 +513,126 @@ def render_significant_events_map(df):
         use_container_width=True,
         hide_index=True
     )
+
+
+# ============================================================================
+# MAPAS AGREGADOS (ver utils/geo_bins.py)
+# ============================================================================
+
+def hexbin_map(df, color, title, color_scale, hover=(), projection=None):
+    """
+    Mapa de celdas hexagonales en lugar de un marcador por evento.
+    
+    Args:
+        df (pd.DataFrame): Datos del mapa
+        color (str): Medida de las celdas para el color
+        title (str): Título del mapa
+        color_scale (str): Escala de colores
+        hover (list): Medidas adicionales en la etiqueta emergente
+        projection (str): Proyección (opcional)
+        
+    Returns:
+        go.Figure: Figura con un marcador por celda (tamaño = eventos)
+    """
+    # Celdas compartidas por todos los mapas y sesiones con los mismos filtros
+    bins = cached_aggregate(df, ('hexbins', HEX_SIZE_DEGREES), hexbin_aggregate)
+    
+    st.caption(
+        f"🔷 {len(df):,} eventos agrupados en {len(bins):,} celdas hexagonales de "
+        f"{HEX_SIZE_DEGREES:g}° (más de {MAP_POINT_LIMIT:,} eventos). "
+        "Tamaño = eventos por celda."
+    )
+    
+    hover_data = {'latitude': False, 'longitude': False, 'count': True,
+                  'magnitude_max': ':.1f', 'tsunami_share': ':.0%'}
+    hover_data.update({column: ':.1f' for column in hover if column in bins.columns})
+    
+    fig = px.scatter_geo(
+        bins,
+        lat='latitude',
+        lon='longitude',
+        color=color,
+        size='count',
+        hover_data=hover_data,
+        color_continuous_scale=color_scale,
+        projection=projection,
+        title=title,
+        labels=HEXBIN_LABELS
+    )
+    fig.update_traces(marker=dict(symbol='hexagon', line=dict(width=0)))
+    
+    return fig
+
+
+def raster_map(df, title, weight=None, split=None, color_scale='Inferno', projection=None):
+    """
+    Mapa de densidad dibujado como una imagen calculada en el servidor.
+    
+    Args:
+        df (pd.DataFrame): Datos del mapa
+        title (str): Título del mapa
+        weight (str): Columna que pondera cada evento (None: conteo)
+        split (str): Columna de clase de tsunami con la que se mezclan los
+            colores (None: escala de colores)
+        color_scale (str): Escala de colores (sin `split`)
+        projection (str): Proyección que tendría el mapa de puntos; si no es
+            equirectangular, el pie avisa de que la imagen no la usa
+        
+    Returns:
+        go.Figure: Figura geográfica equirectangular con la imagen superpuesta
+    """
+    raster, peak = cached_aggregate(
+        df,
+        ('density_raster', RASTER_WIDTH, weight, split, color_scale),
+        partial(density_raster, weight=weight, split=split, color_scale=color_scale)
+    )
+    
+    measure = 'significancia' if weight == 'sig' else 'eventos'
+    projection_note = "Proyección equirectangular"
+    if projection not in (None, 'equirectangular'):
+        projection_note += f" (la imagen no admite la proyección {projection})"
+    st.caption(
+        f"🖼️ {len(df):,} eventos dibujados como imagen de densidad de "
+        f"{RASTER_WIDTH}×{RASTER_WIDTH // 2} píxeles (más de {MAP_RASTER_LIMIT:,} eventos), "
+        f"{measure} por píxel en escala logarítmica. {projection_note}."
+    )
+    
+    fig = go.Figure()
+    
+    # Trazas sin puntos: solo aportan la leyenda o la barra de colores
+    if split is not None:
+        for label, color in RASTER_CLASS_LEGEND.items():
+            fig.add_trace(go.Scattergeo(
+                lat=[None], lon=[None], mode='markers', name=label,
+                marker=dict(color=color, size=10, symbol='square')
+            ))
+    else:
+        tickvals, ticktext = density_ticks(peak)
+        fig.add_trace(go.Scattergeo(
+            lat=[None, None], lon=[None, None], mode='markers', showlegend=False,
+            hoverinfo='skip',
+            marker=dict(
+                color=[0, 1], cmin=0, cmax=1, colorscale=color_scale, showscale=True,
+                colorbar=dict(title=measure.capitalize(), tickvals=tickvals, ticktext=ticktext)
+            )
+        ))
+    
+    # El mundo equirectangular (2:1) se ajusta al dominio del mapa como la
+    # imagen con sizing='contain': centrados y con la misma escala
+    fig.update_geos(
+        projection_type='equirectangular',
+        lonaxis_range=[-180, 180],
+        lataxis_range=[-90, 90],
+        domain=dict(x=[0, 1], y=[0, 1])
+    )
+    fig.add_layout_image(
+        source=raster,
+        xref='paper', yref='paper',
+        x=0.5, y=0.5, sizex=1, sizey=1,
+        xanchor='center', yanchor='middle',
+        sizing='contain',
+        layer='above'
+    )
+    fig.update_layout(title=title)
+    
+    return fig
@@ -11,6 +11,12 @@ import plotly.graph_objects as go
 import numpy as np
 
 
+# Columnas derivadas que usa esta página (ver utils/derived_columns.py)
+REQUIRED_DERIVED_COLUMNS = [
+    'impact_level', 'nst_norm', 'gap_norm', 'dmin_norm', 'monitoring_quality',
+]
+
+
 # ============================================================================
 # FUNCIÓN PRINCIPAL
 # ============================================================================
@@ -5,10 +5,44 @@ Página de Análisis Temporal
 Análisis de tendencias, evolución y patrones temporales.
 """
 
+from functools import partial
+
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
+from utils.aggregate_cache import cached_aggregate
+from utils.cube import cube_rollup
+from utils.data_loader import load_data
+from utils.derived_columns import get_derived, is_available
+from utils.seasonality import CONFIDENCE, N_RESAMPLES, seasonality_tests
+from utils.seismicity import MIN_EVENTS_FOR_B, gutenberg_richter
+
+
+# Columnas derivadas que usa esta página (ver utils/derived_columns.py)
+REQUIRED_DERIVED_COLUMNS = []
+
+# Segundos entre años al reproducir el mapa animado
+ANIMATION_FRAME_SECONDS = 1.5
+
+# Años que se envían juntos (año actual + siguientes) con la animación en pausa
+ANIMATION_PREFETCH_YEARS = 3
+
+# Colores por tipo de evento
+TSUNAMI_COLORS = {'Sin Tsunami': '#4488ff', 'Con Tsunami': '#ff4444'}
+
+# Nombres de los meses
+MONTH_NAMES = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun',
+               'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
+
+# Nivel de significación de las pruebas de estacionalidad
+SIGNIFICANCE_LEVEL = 0.05
+
+# Ventana por defecto (años) del valor b deslizante
+GR_DEFAULT_WINDOW_YEARS = 10
+
+# Magnitudes de la tabla de periodos de retorno
+GR_RETURN_MAGNITUDES = [7.0, 7.5, 8.0, 8.5, 9.0]
 
 
 # ============================================================================
@@ -28,10 +62,11 @@ def render(df):
     st.markdown("---")
     
     # ===== TABS =====
-    tab1, tab2, tab3 = st.tabs([
+    tab1, tab2, tab3, tab4 = st.tabs([
         "📈 Evolución Anual",
         "📊 Análisis Mensual",
-        "🎬 Animaciones Temporales"
+        "🎬 Animaciones Temporales",
+        "📐 Gutenberg-Richter"
     ])
     
     with tab1:
@@ -42,6 +77,9 @@ def render(df):
     
     with tab3:
         render_temporal_animations(df)
+    
+    with tab4:
+        render_gutenberg_richter(df)
 
 
 # ============================================================================
@@ -53,16 +91,8 @@ def render_yearly_analysis(df):
     
     st.subheader("📈 Evolución Anual de Eventos")
     
-    # Agregación por año
-    yearly_stats = df.groupby('Year').agg({
-        'magnitude': ['count', 'mean', 'max'],
-        'tsunami': 'sum',
-        'depth': 'mean',
-        'sig': 'mean'
-    }).reset_index()
-    
-    yearly_stats.columns = ['Year', 'event_count', 'mag_mean', 'mag_max', 
-                            'tsunami_count', 'depth_mean', 'sig_mean']
+    # Agregación por año (compartida entre sesiones con los mismos filtros)
+    yearly_stats = cached_aggregate(df, 'yearly_stats', compute_yearly_stats)
     
     # Gráfico de líneas: eventos por año
     fig1 = go.Figure()
@@ -140,19 +170,25 @@ def render_monthly_analysis(df):
     
     st.subheader("📊 Análisis Mensual y Estacionalidad")
     
-    # Agregación por mes (promedio entre años)
-    monthly_stats = df.groupby('Month').agg({
-        'magnitude': ['count', 'mean'],
-        'tsunami': 'sum',
-        'depth': 'mean'
-    }).reset_index()
-    
-    monthly_stats.columns = ['Month', 'event_count', 'mag_mean', 'tsunami_count', 'depth_mean']
+    # Las secuencias de réplicas concentran eventos en pocos meses. El
+    # declustering recorre todo el catálogo: solo se calcula si se pide
+    catalog = load_data()
+    if catalog is not None and is_available(catalog, 'is_mainshock') and st.checkbox(
+        "🔁 Contar réplicas (Gardner-Knopoff)", key='temporal_count_aftershocks'
+    ):
+        is_mainshock = get_derived(catalog, 'is_mainshock').reindex(df.index)
+        aftershocks = len(df) - int(is_mainshock.sum())
+        if aftershocks:
+            st.caption(
+                f"ℹ️ {aftershocks:,} de {len(df):,} eventos son réplicas o premonitores "
+                "(Gardner-Knopoff). Activa \"Solo eventos principales\" en los filtros "
+                "avanzados para ver la estacionalidad sin secuencias de réplicas."
+            )
+        else:
+            st.caption("ℹ️ Ningún evento filtrado es réplica ni premonitor (Gardner-Knopoff).")
     
-    # Nombres de meses
-    month_names = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 
-                   'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
-    monthly_stats['Month_Name'] = monthly_stats['Month'].apply(lambda x: month_names[x-1])
+    # Agregación por mes (promedio entre años)
+    monthly_stats = cached_aggregate(df, 'monthly_stats', compute_monthly_stats)
     
     # Gráfico de barras: eventos por mes
     fig1 = px.bar(
@@ -203,19 +239,74 @@ def render_monthly_analysis(df):
         fig3.update_layout(height=400)
         st.plotly_chart(fig3, use_container_width=True)
     
-    # Conclusión sobre estacionalidad
+    # Conclusión sobre estacionalidad: pruebas de remuestreo (ver
+    # utils/seasonality.py), compartidas entre sesiones con los mismos filtros
     max_month = monthly_stats.loc[monthly_stats['event_count'].idxmax(), 'Month_Name']
     min_month = monthly_stats.loc[monthly_stats['event_count'].idxmin(), 'Month_Name']
     
+    tests, month_intervals, year_intervals = cached_aggregate(
+        df, ('seasonality_tests', N_RESAMPLES), compute_seasonality_tests
+    )
+    events_p = tests.loc[0, 'p_value']
+    rate_p = tests.loc[1, 'p_value']
+    
+    if events_p < SIGNIFICANCE_LEVEL:
+        events_conclusion = "hay **evidencia de estacionalidad** en la ocurrencia de terremotos"
+    else:
+        events_conclusion = "**no hay evidencia de estacionalidad** en la ocurrencia de terremotos"
+    if rate_p < SIGNIFICANCE_LEVEL:
+        rate_conclusion = "**varía** significativamente entre meses"
+    else:
+        rate_conclusion = "**no varía** significativamente entre meses"
+    
     st.info(f"""
     **📊 Observación sobre Estacionalidad:**
     
     El mes con más eventos es **{max_month}** ({monthly_stats['event_count'].max()} eventos), 
     y el mes con menos eventos es **{min_month}** ({monthly_stats['event_count'].min()} eventos).
     
-    La variación es **{((monthly_stats['event_count'].max() - monthly_stats['event_count'].min()) / monthly_stats['event_count'].mean() * 100):.1f}%** 
-    respecto a la media, lo que sugiere que **no hay una estacionalidad fuerte** en la ocurrencia de terremotos.
+    Frente a {N_RESAMPLES:,} sorteos con los eventos repartidos uniformemente en el tiempo,
+    el p-valor es **{events_p:.3f}**: {events_conclusion}
+    (nivel {SIGNIFICANCE_LEVEL}). La tasa de tsunamis {rate_conclusion} (p = {rate_p:.3f}).
     """)
+    
+    with st.expander("🔬 Pruebas Estadísticas"):
+        st.dataframe(
+            tests.rename(columns={
+                'test': 'Prueba',
+                'statistic': 'Estadístico',
+                'p_value': 'p-valor',
+                'method': 'Método'
+            }).round(4),
+            use_container_width=True,
+            hide_index=True
+        )
+        
+        # Tasa de tsunamis por mes y por año con intervalos bootstrap
+        col1, col2 = st.columns(2)
+        
+        for column, intervals, label in [
+            (col1, month_intervals.assign(Label=[MONTH_NAMES[m - 1] for m in month_intervals['Month']]), 'Mes'),
+            (col2, year_intervals.assign(Label=year_intervals['Year']), 'Año'),
+        ]:
+            fig = go.Figure(go.Scatter(
+                x=intervals['Label'],
+                y=intervals['rate'],
+                error_y=dict(
+                    type='data',
+                    array=intervals['rate_hi'] - intervals['rate'],
+                    arrayminus=intervals['rate'] - intervals['rate_lo']
+                ),
+                mode='markers',
+                marker=dict(color='#ff4444', size=8)
+            ))
+            fig.update_layout(
+                title=f'Tasa de Tsunamis por {label} (IC {CONFIDENCE:.0%} bootstrap)',
+                xaxis_title=label,
+                yaxis_title='Proporción con tsunami',
+                height=400
+            )
+            column.plotly_chart(fig, use_container_width=True)
 
 
 # ============================================================================
@@ -233,16 +324,7 @@ def render_temporal_animations(df):
     """)
     
     # Preparar datos agregados por año y mes
-    monthly_data = df.groupby(['Year', 'Month', 'tsunami_label']).agg({
-        'magnitude': ['mean', 'max', 'count'],
-        'depth': 'mean',
-        'sig': 'mean'
-    }).reset_index()
-    
-    monthly_data.columns = ['Year', 'Month', 'tsunami_label', 'mag_mean', 
-                            'mag_max', 'event_count', 'depth_mean', 'sig_mean']
-    
-    monthly_data['Date'] = pd.to_datetime(monthly_data[['Year', 'Month']].assign(day=1))
+    monthly_data = cached_aggregate(df, 'monthly_evolution', compute_monthly_evolution)
     
     # Gráfico animado: magnitud promedio por año
     fig = px.bar(
@@ -268,41 +350,21 @@ def render_temporal_animations(df):
     # Mapa animado temporal
     st.markdown("#### 🗺️ Mapa Temporal de Eventos")
     
-    # Preparar datos para mapa animado
-    df_map = df.copy()
-    df_map = df_map.sort_values('Year')
-    
-    fig_map = px.scatter_geo(
-        df_map,
-        lat='latitude',
-        lon='longitude',
-        color='tsunami_label',
-        size='magnitude',
-        animation_frame='Year',
-        hover_data=['magnitude', 'depth', 'Month'],
-        color_discrete_map={'Sin Tsunami': '#4488ff', 'Con Tsunami': '#ff4444'},
-        projection='natural earth',
-        title='Evolución Geoespacial de Eventos por Año'
-    )
+    # Solo se envía al navegador el año actual (y, en pausa, una ventana de
+    # años siguientes); el resto de años se piden al avanzar
+    years = sorted(cached_aggregate(df, 'yearly_stats', compute_yearly_stats)['Year'].tolist())
+    playing = st.toggle("▶️ Reproducir año a año", key='animated_map_playing')
     
-    fig_map.update_layout(
-        height=600,
-        geo=dict(
-            showland=True,
-            landcolor='lightgray',
-            showocean=True,
-            oceancolor='lightblue',
-            showcountries=True,
-            showcoastlines=True
-        )
+    # Reproduciendo, el fragmento se vuelve a ejecutar solo (un año por paso)
+    # sin recalcular el resto de la página
+    st.fragment(render_animated_map, run_every=ANIMATION_FRAME_SECONDS if playing else None)(
+        df, years, playing
     )
     
-    st.plotly_chart(fig_map, use_container_width=True)
-    
     # Distribución anual de tsunamis
     st.markdown("#### 🌊 Distribución Anual de Tsunamis")
     
-    tsunami_yearly = df[df['tsunami'] == 1].groupby('Year').size().reset_index(name='count')
+    tsunami_yearly = cached_aggregate(df, 'tsunami_yearly', compute_tsunami_yearly)
     
     fig_tsunami = px.bar(
         tsunami_yearly,
@@ -316,3 +378,326 @@ def render_temporal_animations(df):
     
     fig_tsunami.update_layout(height=400)
     st.plotly_chart(fig_tsunami, use_container_width=True)
+
+
+# ============================================================================
+# GUTENBERG-RICHTER
+# ============================================================================
+
+def render_gutenberg_richter(df):
+    """Completitud, valor b y tasas de recurrencia (ver utils/seismicity.py)."""
+    
+    st.subheader("📐 Ley de Gutenberg-Richter")
+    
+    st.markdown("""
+    Relación entre magnitud y frecuencia: **log₁₀ N(≥M) = a − b·M**.
+    La magnitud de completitud (Mc) se estima por máxima curvatura y el
+    valor b por máxima verosimilitud (Aki-Utsu).
+    """)
+    
+    # Periodo completo (compartido entre sesiones con los mismos filtros)
+    params, rates = cached_aggregate(
+        df, ('gutenberg_richter', None, 1), partial(gutenberg_richter, window_years=None)
+    )
+    if params.empty or params['b_value'].isna().all():
+        st.info(f"Se necesitan al menos {MIN_EVENTS_FOR_B} eventos sobre Mc para estimar el valor b.")
+        return
+    
+    overall = params.iloc[0]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Mc", f"{overall['mc']:.1f}")
+    col2.metric("Valor b", f"{overall['b_value']:.2f} ± {overall['b_std']:.2f}")
+    col3.metric("Valor a (anual)", f"{overall['a_value']:.2f}")
+    col4.metric("Eventos ≥ Mc", f"{int(overall['n_complete']):,}")
+    
+    # Distribución frecuencia-magnitud: tasas anuales observadas y del modelo
+    complete = rates[rates['magnitude'] >= overall['mc'] - 1e-9]
+    fig1 = go.Figure()
+    
+    fig1.add_trace(go.Bar(
+        x=rates['magnitude'],
+        y=rates['count'] / (overall['end_year'] - overall['start_year'] + 1),
+        name='Eventos por año (intervalo)',
+        marker_color='#9ecae1'
+    ))
+    
+    fig1.add_trace(go.Scatter(
+        x=rates['magnitude'],
+        y=rates['observed_rate'],
+        name='Tasa observada N(≥M)',
+        mode='markers',
+        marker=dict(color='#1f77b4', size=8)
+    ))
+    
+    fig1.add_trace(go.Scatter(
+        x=complete['magnitude'],
+        y=complete['model_rate'],
+        name=f"Gutenberg-Richter (b = {overall['b_value']:.2f})",
+        line=dict(color='#ff4444', width=3)
+    ))
+    
+    fig1.add_vline(x=overall['mc'], line_dash='dash', line_color='gray', annotation_text='Mc')
+    fig1.update_layout(
+        title='Distribución Frecuencia-Magnitud',
+        xaxis_title='Magnitud',
+        yaxis_title='Eventos por año',
+        yaxis_type='log',
+        height=500
+    )
+    
+    st.plotly_chart(fig1, use_container_width=True)
+    
+    # Periodos de retorno según el modelo del periodo completo
+    st.markdown("#### ⏳ Periodos de Retorno Estimados")
+    
+    magnitudes = pd.Series(GR_RETURN_MAGNITUDES, dtype=float)
+    annual_rate = 10 ** (overall['a_value'] - overall['b_value'] * magnitudes)
+    st.dataframe(
+        pd.DataFrame({
+            'Magnitud (≥)': magnitudes,
+            'Eventos por año': annual_rate.round(3),
+            'Periodo de retorno (años)': (1 / annual_rate).round(1),
+        }),
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    # Valor b y Mc en ventanas deslizantes
+    st.markdown("#### 🪟 Evolución en Ventanas Deslizantes")
+    
+    span = int(overall['end_year'] - overall['start_year'] + 1)
+    if span < 2:
+        st.info("Se necesitan al menos dos años para comparar ventanas.")
+        return
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        window_years = st.slider("Años por ventana:", 1, span, min(GR_DEFAULT_WINDOW_YEARS, span))
+    with col2:
+        step_years = st.slider("Paso entre ventanas (años):", 1, 5, 1)
+    
+    windows, _ = cached_aggregate(
+        df, ('gutenberg_richter', window_years, step_years),
+        partial(gutenberg_richter, window_years=window_years, step_years=step_years)
+    )
+    
+    fig2 = go.Figure()
+    
+    fig2.add_trace(go.Scatter(
+        x=windows['mid_year'],
+        y=windows['b_value'],
+        error_y=dict(type='data', array=windows['b_std'], visible=True),
+        name='Valor b',
+        line=dict(color='#1f77b4', width=3),
+        mode='lines+markers'
+    ))
+    
+    fig2.add_trace(go.Scatter(
+        x=windows['mid_year'],
+        y=windows['mc'],
+        name='Mc',
+        yaxis='y2',
+        line=dict(color='#ff7f0e', width=2, dash='dot'),
+        mode='lines+markers'
+    ))
+    
+    fig2.update_layout(
+        title=f'Valor b y Mc (ventanas de {window_years} años)',
+        xaxis_title='Año central de la ventana',
+        yaxis=dict(title='Valor b'),
+        yaxis2=dict(title='Mc', overlaying='y', side='right'),
+        hovermode='x unified',
+        height=450
+    )
+    
+    st.plotly_chart(fig2, use_container_width=True)
+    
+    if windows['b_value'].isna().any():
+        st.caption(f"Las ventanas con menos de {MIN_EVENTS_FOR_B} eventos sobre Mc no tienen valor b.")
+
+
+# ============================================================================
+# MAPA ANIMADO POR VENTANAS
+# ============================================================================
+
+def render_animated_map(df, years, playing):
+    """
+    Mapa de eventos de un año, con los años siguientes bajo demanda.
+    
+    Se ejecuta como fragmento: reproduciendo, cada ejecución avanza un año
+    y envía solo sus puntos; en pausa, la figura incluye como frames de
+    Plotly el año seleccionado y los ANIMATION_PREFETCH_YEARS - 1 siguientes.
+    
+    Args:
+        df (pd.DataFrame): DataFrame de terremotos (filtrado)
+        years (list): Años con eventos, en orden
+        playing (bool): Si la animación está en reproducción
+    """
+    key = 'animated_map_year'
+    if st.session_state.get(key) not in years:
+        st.session_state[key] = years[0]
+    elif playing:
+        position = years.index(st.session_state[key])
+        st.session_state[key] = years[(position + 1) % len(years)]
+    
+    year = st.select_slider("Año:", options=years, key=key, disabled=playing)
+    
+    position = years.index(year)
+    window = years[position:position + (1 if playing else ANIMATION_PREFETCH_YEARS)]
+    
+    # Escala de tamaños común a todos los años (como px: área, máximo 20 px)
+    magnitude_max = cube_rollup(df, []).iloc[0]['magnitude_max']
+    sizeref = 2 * magnitude_max / 20 ** 2
+    
+    frames = []
+    for frame_year in window:
+        points = cached_aggregate(df, ('map_year', frame_year),
+                                  partial(year_map_points, year=frame_year))
+        frames.append(go.Frame(data=year_map_traces(points, sizeref), name=str(frame_year)))
+    
+    fig = go.Figure(data=frames[0].data, frames=frames if len(frames) > 1 else None)
+    fig.update_layout(
+        title=f'Evolución Geoespacial de Eventos: {year}',
+        height=600,
+        uirevision='animated_map',
+        geo=dict(
+            projection_type='natural earth',
+            showland=True,
+            landcolor='lightgray',
+            showocean=True,
+            oceancolor='lightblue',
+            showcountries=True,
+            showcoastlines=True
+        )
+    )
+    
+    if len(frames) > 1:
+        frame_args = {'frame': {'duration': ANIMATION_FRAME_SECONDS * 1000, 'redraw': True},
+                      'mode': 'immediate'}
+        fig.update_layout(
+            updatemenus=[dict(
+                type='buttons',
+                showactive=False,
+                x=0.05, y=0,
+                buttons=[dict(label='▶', method='animate', args=[None, frame_args])]
+            )],
+            sliders=[dict(
+                x=0.15, len=0.8, y=0,
+                steps=[dict(label=frame.name, method='animate', args=[[frame.name], frame_args])
+                       for frame in frames]
+            )]
+        )
+    
+    st.plotly_chart(fig, use_container_width=True)
+    
+    if not playing and len(years) > len(window):
+        st.caption(f"Se muestran {len(window)} de {len(years)} años; "
+                   "mueve el año o pulsa Reproducir para cargar los siguientes.")
+
+
+def year_map_traces(points, sizeref):
+    """Trazas del mapa animado (una por tipo de evento, siempre en el mismo orden)."""
+    traces = []
+    for label, color in TSUNAMI_COLORS.items():
+        rows = points[points['tsunami_label'] == label]
+        traces.append(go.Scattergeo(
+            lat=rows['latitude'],
+            lon=rows['longitude'],
+            mode='markers',
+            name=label,
+            marker=dict(
+                size=rows['magnitude'],
+                sizemode='area',
+                sizeref=sizeref,
+                color=color
+            ),
+            customdata=rows[['magnitude', 'depth', 'Month']],
+            hovertemplate=('Magnitud: %{customdata[0]:.1f}<br>Profundidad: %{customdata[1]:.0f} km'
+                           '<br>Mes: %{customdata[2]}<extra>' + label + '</extra>')
+        ))
+    return traces
+
+
+# ============================================================================
+# AGREGADOS (ver utils/aggregate_cache.py y utils/cube.py)
+# ============================================================================
+
+def compute_yearly_stats(df):
+    """Eventos, magnitud, tsunamis, profundidad y significancia por año."""
+    yearly = cube_rollup(df, ['Year'])
+    return pd.DataFrame({
+        'Year': yearly['Year'],
+        'event_count': yearly['magnitude_count'],
+        'mag_mean': yearly['magnitude_mean'],
+        'mag_max': yearly['magnitude_max'],
+        'tsunami_count': yearly['tsunami_count'],
+        'depth_mean': yearly['depth_mean'],
+        'sig_mean': yearly['sig_mean'],
+    })
+
+
+def compute_monthly_stats(df):
+    """Eventos, magnitud, tsunamis y profundidad por mes del año."""
+    monthly = cube_rollup(df, ['Month'])
+    monthly_stats = pd.DataFrame({
+        'Month': monthly['Month'],
+        'event_count': monthly['magnitude_count'],
+        'mag_mean': monthly['magnitude_mean'],
+        'tsunami_count': monthly['tsunami_count'],
+        'depth_mean': monthly['depth_mean'],
+    })
+    
+    # Nombres de meses
+    monthly_stats['Month_Name'] = monthly_stats['Month'].apply(lambda x: MONTH_NAMES[x-1])
+    return monthly_stats
+
+
+def compute_monthly_evolution(df):
+    """Magnitud, eventos, profundidad y significancia por año, mes y tipo."""
+    grouped = cube_rollup(df, ['Year', 'Month', 'tsunami'])
+    monthly_data = pd.DataFrame({
+        'Year': grouped['Year'],
+        'Month': grouped['Month'],
+        'tsunami_label': pd.Categorical.from_codes(
+            grouped['tsunami'], df['tsunami_label'].cat.categories
+        ),
+        'mag_mean': grouped['magnitude_mean'],
+        'mag_max': grouped['magnitude_max'],
+        'event_count': grouped['magnitude_count'],
+        'depth_mean': grouped['depth_mean'],
+        'sig_mean': grouped['sig_mean'],
+    })
+    
+    monthly_data['Date'] = pd.to_datetime(monthly_data[['Year', 'Month']].assign(day=1))
+    return monthly_data
+
+
+def compute_seasonality_tests(df):
+    """Pruebas de estacionalidad e intervalos de la tasa de tsunamis."""
+    monthly = cube_rollup(df, ['Month']).set_index('Month').reindex(range(1, 13), fill_value=0)
+    yearly = cube_rollup(df, ['Year'])
+    return seasonality_tests(
+        pd.DataFrame({
+            'Month': monthly.index,
+            'events': monthly['count'].to_numpy(),
+            'tsunamis': monthly['tsunami_count'].to_numpy(),
+        }),
+        pd.DataFrame({
+            'Year': yearly['Year'],
+            'events': yearly['count'],
+            'tsunamis': yearly['tsunami_count'],
+        }),
+    )
+
+
+def compute_tsunami_yearly(df):
+    """Número de tsunamis por año."""
+    yearly = cube_rollup(df, ['Year'])
+    yearly = yearly[yearly['tsunami_count'] > 0]
+    return pd.DataFrame({'Year': yearly['Year'], 'count': yearly['tsunami_count']}).reset_index(drop=True)
+
+
+def year_map_points(df, year):
+    """Puntos de un año para el mapa animado."""
+    columns = ['latitude', 'longitude', 'magnitude', 'depth', 'Month', 'tsunami_label']
+    return df.loc[df['Year'].to_numpy() == year, columns]
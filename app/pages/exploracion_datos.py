@@ -11,6 +11,14 @@ import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
 from scipy import stats
+from utils.aggregate_cache import cached_aggregate
+
+
+# Columnas derivadas que usa esta página (ver utils/derived_columns.py)
+REQUIRED_DERIVED_COLUMNS = [
+    'magnitude_category', 'depth_category', 'impact_level',
+    'nst_norm', 'gap_norm', 'dmin_norm', 'monitoring_quality',
+]
 
 
 # ============================================================================
@@ -181,8 +189,11 @@ def render_correlations(df):
     
     numeric_cols = [col for col in numeric_cols if col not in exclude_cols]
     
-    # Calcular correlación
-    corr_matrix = df[numeric_cols].corr(method=method)
+    # Calcular correlación (compartida entre sesiones con los mismos filtros)
+    corr_matrix = cached_aggregate(
+        df, ('correlations', method, tuple(numeric_cols)),
+        lambda data: data[numeric_cols].corr(method=method)
+    )
     
     # Crear heatmap
     fig = px.imshow(
@@ -10,6 +10,10 @@ from utils.data_loader import get_variable_descriptions
 from utils.styles import create_highlight_box
 
 
+# Columnas derivadas que usa esta página (ver utils/derived_columns.py)
+REQUIRED_DERIVED_COLUMNS = []
+
+
 # ============================================================================
 # FUNCIÓN PRINCIPAL
 # ============================================================================
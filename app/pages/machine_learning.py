@@ -9,6 +9,10 @@ import streamlit as st
 from utils.styles import create_highlight_box
 
 
+# Columnas derivadas que usa esta página (ver utils/derived_columns.py)
+REQUIRED_DERIVED_COLUMNS = []
+
+
 # ============================================================================
 # FUNCIÓN PRINCIPAL
 # ============================================================================
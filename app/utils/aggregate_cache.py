@@ -0,0 +1,146 @@
+"""
+Aggregate Cache
+===============
+
+Caché compartida de los agregados de las páginas (groupbys, correlaciones).
+
+La clave es la huella de los datos de la página (ver main.py: para datos
+filtrados se deriva de la especificación de los filtros, utils/filter_spec.py)
+más el nombre del agregado. Todas las sesiones del proceso comparten los
+resultados: cuando muchas personas abren el mismo enlace, el agregado se
+calcula una sola vez y el resto espera a ese cálculo en lugar de repetirlo.
+
+Los resultados son de solo lectura: las páginas no deben modificarlos.
+"""
+
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.fingerprint import get_fingerprint
+
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+# Presupuesto de memoria de la caché de agregados (MB), configurable
+AGGREGATE_CACHE_BUDGET_MB = float(os.environ.get('EQ_AGGREGATE_CACHE_MB', 64))
+
+# Agregados recientes: {(huella, nombre): (resultado, bytes)}, del menos al
+# más recientemente usado
+_aggregates = OrderedDict()
+_aggregates_bytes = 0
+_lock = threading.Lock()
+
+# Cálculos en curso: {(huella, nombre): threading.Event}
+_pending = {}
+
+# Contadores de la caché de agregados ('waits': esperas a otra sesión)
+AGGREGATE_CACHE_STATS = {'hits': 0, 'misses': 0, 'waits': 0, 'evictions': 0}
+
+
+# ============================================================================
+# CONSULTA
+# ============================================================================
+
+def cached_aggregate(df, name, compute):
+    """
+    Retorna un agregado de los datos de una página, calculándolo una vez.
+
+    Args:
+        df (pd.DataFrame): Datos de la página (con huella registrada)
+        name: Nombre hasheable del agregado, con sus parámetros
+            (p. ej. ('correlations', 'spearman', False))
+        compute (callable): Función que recibe `df` y retorna el agregado
+
+    Returns:
+        Agregado (de solo lectura)
+    """
+    key = (get_fingerprint(df), name)
+
+    while True:
+        with _lock:
+            entry = _aggregates.get(key)
+            if entry is not None:
+                _aggregates.move_to_end(key)
+                AGGREGATE_CACHE_STATS['hits'] += 1
+                return entry[0]
+            pending = _pending.get(key)
+            if pending is None:
+                # Esta sesión calcula; las demás esperan su resultado
+                _pending[key] = threading.Event()
+                AGGREGATE_CACHE_STATS['misses'] += 1
+                break
+            AGGREGATE_CACHE_STATS['waits'] += 1
+        pending.wait()
+
+    try:
+        result = compute(df)
+        _store(key, result)
+    finally:
+        with _lock:
+            _pending.pop(key).set()
+    return result
+
+
+def _store(key, result):
+    """Guarda un agregado y descarta los menos usados si no cabe."""
+    global _aggregates_bytes
+
+    size = _nbytes(result)
+    budget = AGGREGATE_CACHE_BUDGET_MB * 1024 * 1024
+    if size > budget:
+        return
+
+    with _lock:
+        _aggregates[key] = (result, size)
+        _aggregates_bytes += size
+        while _aggregates_bytes > budget:
+            _, (_, evicted) = _aggregates.popitem(last=False)
+            _aggregates_bytes -= evicted
+            AGGREGATE_CACHE_STATS['evictions'] += 1
+
+
+def _nbytes(result):
+    """
+    Memoria aproximada de un agregado.
+
+    Recorre tuplas, listas y diccionarios; los objetos sin tamaño conocido
+    (p. ej. figuras o trazas de Plotly) se miden por su serialización.
+    """
+    if isinstance(result, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = result.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(result, pd.DataFrame) else usage)
+    if isinstance(result, (np.ndarray, np.generic)):
+        return result.nbytes
+    if isinstance(result, (tuple, list)):
+        return sys.getsizeof(result) + sum(_nbytes(item) for item in result)
+    if isinstance(result, dict):
+        return sys.getsizeof(result) + sum(
+            _nbytes(key) + _nbytes(value) for key, value in result.items()
+        )
+    if result is None or isinstance(result, (str, bytes, int, float)):
+        return sys.getsizeof(result)
+    try:
+        return len(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return sys.getsizeof(result)
+
+
+def get_aggregate_cache_stats():
+    """
+    Retorna los contadores y el tamaño de la caché de agregados.
+
+    Returns:
+        dict: Aciertos ('hits'), fallos ('misses'), esperas ('waits'),
+            descartes ('evictions'), número de agregados ('entries') y
+            memoria usada ('bytes')
+    """
+    with _lock:
+        return dict(AGGREGATE_CACHE_STATS, entries=len(_aggregates), bytes=_aggregates_bytes)
@@ -0,0 +1,523 @@
+"""
+Catalog Cache
+=============
+
+Caché columnar en disco para el catálogo ya preparado.
+Guarda el DataFrame transformado (con categorías y columnas derivadas) en
+archivos Parquet, junto con un manifiesto que identifica la versión exacta
+del CSV de origen: tamaño, fecha de modificación y hash de contenido.
+El manifiesto también conserva los metadatos del DataFrame (`df.attrs`).
+
+El catálogo se guarda como una lista de partes: la ingesta por bloques
+escribe una parte por bloque (o por fragmento, si el origen es una carpeta
+de CSV) y las filas añadidas al final del CSV se guardan como una parte
+nueva, sin reescribir las anteriores.
+
+Cada escritura usa nombres de parte nuevos y publica el manifiesto de forma
+atómica; solo después se borran las partes que ya no referencia. Un lector
+concurrente ve el manifiesto anterior con sus partes completas o el nuevo,
+nunca uno que apunte a partes borradas o a medio escribir.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+
+
+# ============================================================================
+# CONSTANTES
+# ============================================================================
+
+# Carpeta de la caché, junto a los datos originales
+CACHE_DIR = Path(__file__).parent.parent.parent / "data" / ".cache"
+
+# Nombres de los artefactos dentro de la carpeta de caché
+PART_FILE_TEMPLATE = "part-{}-{:05d}.parquet"
+MANIFEST_FILE_NAME = "manifest.json"
+QUARANTINE_FILE_NAME = "quarantine.parquet"
+
+# Versión del formato: incrementar cuando cambie prepare_data
+CACHE_VERSION = 5
+
+# Tamaño de bloque para el hash del archivo fuente (1 MiB)
+HASH_BLOCK_SIZE = 1 << 20
+
+# Patrón de los fragmentos cuando el origen es una carpeta
+SHARD_PATTERN = "*.csv"
+
+# Contadores de uso de la caché (compartidos por todo el proceso): un acierto
+# es una carga servida sin parsear el CSV; un fallo, una que tuvo que leerlo
+CACHE_STATS = {'hits': 0, 'misses': 0, 'writes': 0, 'appends': 0}
+
+_stats_lock = threading.Lock()
+
+
+# ============================================================================
+# HUELLA DEL ARCHIVO FUENTE
+# ============================================================================
+
+def list_shards(path):
+    """
+    Lista los fragmentos CSV de una carpeta, en orden de nombre.
+
+    Args:
+        path (Path): Carpeta de fragmentos
+
+    Returns:
+        list: Rutas de los fragmentos
+    """
+    return sorted(p for p in Path(path).glob(SHARD_PATTERN) if p.is_file())
+
+
+def file_content_hash(path, prefix_size=None):
+    """
+    Calcula el hash de contenido de un archivo leyéndolo por bloques.
+
+    Args:
+        path (Path): Ruta del archivo
+        prefix_size (int): Si se indica, calcula también el hash de los
+            primeros `prefix_size` bytes en la misma lectura
+
+    Returns:
+        str: Hash BLAKE2b (hex) del contenido, o la tupla
+            (hash_del_prefijo, hash_completo) si se indicó prefix_size
+    """
+    if Path(path).is_dir():
+        # Carpeta de fragmentos: hash de los nombres y hashes de cada uno
+        digest = hashlib.blake2b(digest_size=16)
+        for shard in list_shards(path):
+            digest.update(shard.name.encode('utf-8'))
+            digest.update(file_content_hash(shard).encode('ascii'))
+        return digest.hexdigest()
+
+    digest = hashlib.blake2b(digest_size=16)
+    prefix_digest = None
+    read = 0
+
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            if prefix_size is not None and prefix_digest is None:
+                if read + len(block) >= prefix_size:
+                    cut = prefix_size - read
+                    digest.update(block[:cut])
+                    prefix_digest = digest.copy()
+                    block = block[cut:]
+            digest.update(block)
+            read += len(block) if prefix_digest is None else 0
+
+    if prefix_size is None:
+        return digest.hexdigest()
+    if prefix_digest is None:
+        # El archivo es más corto que el prefijo pedido
+        return None, digest.hexdigest()
+    return prefix_digest.hexdigest(), digest.hexdigest()
+
+
+def file_fingerprint(path, with_hash=True):
+    """
+    Obtiene la huella de un archivo: tamaño, fecha de modificación y hash.
+
+    Para una carpeta de fragmentos, el tamaño es la suma de los fragmentos
+    y la fecha la más reciente entre ellos y la propia carpeta (que cambia
+    al añadir, quitar o renombrar fragmentos).
+
+    Args:
+        path (Path): Ruta del archivo o carpeta
+        with_hash (bool): Si es False, omite el hash (solo metadatos)
+
+    Returns:
+        dict: Diccionario con 'size', 'mtime_ns' y 'hash'
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    mtime_ns = stat.st_mtime_ns
+
+    if Path(path).is_dir():
+        shard_stats = [os.stat(shard) for shard in list_shards(path)]
+        size = sum(s.st_size for s in shard_stats)
+        mtime_ns = max([mtime_ns] + [s.st_mtime_ns for s in shard_stats])
+
+    return {
+        'size': size,
+        'mtime_ns': mtime_ns,
+        'hash': file_content_hash(path) if with_hash else None,
+    }
+
+
+# ============================================================================
+# MANIFIESTO
+# ============================================================================
+
+def record_cache_event(event):
+    """Incrementa un contador de CACHE_STATS de forma segura entre hilos."""
+    with _stats_lock:
+        CACHE_STATS[event] += 1
+
+
+def _read_manifest(cache_dir):
+    """Lee el manifiesto de la caché, o None si no existe o está dañado."""
+    try:
+        with open(cache_dir / MANIFEST_FILE_NAME, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(cache_dir, manifest):
+    """Escribe el manifiesto de forma atómica."""
+    tmp_path = cache_dir / (MANIFEST_FILE_NAME + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, cache_dir / MANIFEST_FILE_NAME)
+
+
+def _new_part_names():
+    """Nombres de parte que no coinciden con los de ninguna otra escritura."""
+    generation = uuid.uuid4().hex[:12]
+    index = 0
+    while True:
+        yield PART_FILE_TEMPLATE.format(generation, index)
+        index += 1
+
+
+def _clear_stale_parts(cache_dir):
+    """
+    Elimina las partes que no referencia el manifiesto publicado.
+
+    Se llama después de publicar el manifiesto nuevo, nunca antes.
+    """
+    manifest = _read_manifest(cache_dir)
+    keep = set(manifest.get('parts', [])) if manifest else set()
+    for part in cache_dir.glob('part-*.parquet'):
+        if part.name not in keep:
+            part.unlink(missing_ok=True)
+
+
+def is_cache_valid(source_path, cache_dir=CACHE_DIR):
+    """
+    Comprueba si la caché corresponde a la versión actual del archivo fuente.
+
+    Si el tamaño y la fecha de modificación coinciden se da por válida sin
+    leer el archivo. Si solo cambió la fecha, se compara el hash de
+    contenido y, si coincide, se actualiza el manifiesto.
+
+    Args:
+        source_path (Path): Ruta del CSV de origen
+        cache_dir (Path): Carpeta de la caché
+
+    Returns:
+        bool: True si la caché puede usarse
+    """
+    manifest = _read_manifest(cache_dir)
+    if manifest is None or manifest.get('version') != CACHE_VERSION:
+        return False
+    if not all((cache_dir / part).exists() for part in manifest.get('parts', [])):
+        return False
+
+    source = manifest.get('source', {})
+    current = file_fingerprint(source_path, with_hash=False)
+
+    if current['size'] != source.get('size'):
+        return False
+    if current['mtime_ns'] == source.get('mtime_ns'):
+        return True
+
+    # Archivo "tocado" pero quizá sin cambios reales: comparar contenido
+    if file_content_hash(source_path) != source.get('hash'):
+        return False
+
+    manifest['source']['mtime_ns'] = current['mtime_ns']
+    _write_manifest(cache_dir, manifest)
+    return True
+
+
+def valid_cache_source(source_path, cache_dir=CACHE_DIR):
+    """
+    Retorna la huella del CSV registrada en la caché si sigue vigente.
+
+    Permite localizar artefactos derivados de la caché (p. ej. el almacén
+    de columnas) con solo consultar metadatos del archivo.
+
+    Args:
+        source_path (Path): Ruta del CSV de origen
+        cache_dir (Path): Carpeta de la caché
+
+    Returns:
+        dict: Huella ('size', 'mtime_ns', 'hash'), o None si no es válida
+    """
+    if not is_cache_valid(source_path, cache_dir):
+        return None
+    return _read_manifest(cache_dir)['source']
+
+
+def detect_append(source_path, cache_dir=CACHE_DIR):
+    """
+    Detecta si el CSV de origen solo ha crecido por el final.
+
+    Compara, en una única lectura secuencial, el hash de los primeros bytes
+    del archivo actual con el hash guardado de la versión en caché. Solo se
+    aplica a un CSV único, no a carpetas de fragmentos.
+
+    Args:
+        source_path (Path): Ruta del CSV de origen
+        cache_dir (Path): Carpeta de la caché
+
+    Returns:
+        tuple: (offset, huella_nueva) donde offset es el byte donde empiezan
+            las filas nuevas, o None si no es un simple añadido
+    """
+    if Path(source_path).is_dir():
+        return None
+
+    manifest = _read_manifest(cache_dir)
+    if manifest is None or manifest.get('version') != CACHE_VERSION:
+        return None
+
+    source = manifest.get('source', {})
+    old_size = source.get('size')
+    current = file_fingerprint(source_path, with_hash=False)
+    if not old_size or current['size'] <= old_size:
+        return None
+
+    # La versión anterior debe terminar en un salto de línea completo
+    with open(source_path, 'rb') as f:
+        f.seek(old_size - 1)
+        if f.read(1) != b'\n':
+            return None
+
+    prefix_hash, full_hash = file_content_hash(source_path, prefix_size=old_size)
+    if prefix_hash != source.get('hash'):
+        return None
+
+    current['hash'] = full_hash
+    return old_size, current
+
+
+# ============================================================================
+# LECTURA Y ESCRITURA DE LA CACHÉ
+# ============================================================================
+
+def iter_cache_parts(cache_dir=CACHE_DIR):
+    """
+    Recorre las partes del catálogo en caché, de una en una.
+
+    Solo hay una parte en memoria a la vez; comprobar antes que la caché es
+    válida (ver valid_cache_source).
+
+    Args:
+        cache_dir (Path): Carpeta de la caché
+
+    Yields:
+        pd.DataFrame: Cada parte, en el orden del manifiesto
+    """
+    import pyarrow.parquet as pq
+
+    for part in _read_manifest(cache_dir)['parts']:
+        yield pq.read_table(cache_dir / part).to_pandas()
+
+
+def _write_part(df, path, schema=None):
+    """
+    Escribe un DataFrame como parte Parquet de forma atómica.
+
+    Returns:
+        pyarrow.Schema: Esquema escrito (para ajustar las partes siguientes)
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if schema is not None:
+        table = table.cast(schema)
+
+    tmp_path = path.with_name(path.name + '.tmp')
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+    return table.schema
+
+
+def write_cache(df, source_path, cache_dir=CACHE_DIR, source=None):
+    """
+    Guarda el catálogo preparado en la caché junto con su manifiesto.
+
+    Args:
+        df (pd.DataFrame): DataFrame ya preparado
+        source_path (Path): Ruta del CSV de origen
+        cache_dir (Path): Carpeta de la caché
+        source (dict): Huella del CSV tomada antes de leerlo (opcional)
+
+    Returns:
+        bool: True si la caché se escribió correctamente
+    """
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        if source is None:
+            source = file_fingerprint(source_path)
+
+        part = next(_new_part_names())
+        _write_part(df, cache_dir / part)
+
+        _write_manifest(cache_dir, {
+            'version': CACHE_VERSION,
+            'source': source,
+            'rows': len(df),
+            'parts': [part],
+            'attrs': df.attrs,
+        })
+        _clear_stale_parts(cache_dir)
+    except (OSError, ImportError, ValueError, TypeError):
+        return False
+
+    record_cache_event('writes')
+    return True
+
+
+def write_cache_stream(chunks, source_path, cache_dir=CACHE_DIR, attrs=None,
+                       source=None):
+    """
+    Escribe en la caché un catálogo que llega por bloques.
+
+    Cada bloque se guarda como una parte Parquet independiente, de modo que
+    nunca hay más de un bloque en memoria. Todas las partes se ajustan al
+    esquema de la primera.
+
+    Args:
+        chunks (iterable): Iterable de DataFrames ya preparados
+        source_path (Path): Ruta del CSV de origen
+        cache_dir (Path): Carpeta de la caché
+        attrs (dict): Metadatos a guardar en el manifiesto; se leen al
+            terminar de consumir los bloques, por lo que pueden rellenarse
+            durante la iteración
+        source (dict): Huella del origen tomada antes de leerlo (opcional)
+
+    Returns:
+        int: Número de filas escritas
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    if source is None:
+        source = file_fingerprint(source_path)
+
+    # Las partes nuevas no pisan las del manifiesto vigente, que sigue
+    # sirviendo hasta que se publica el nuevo
+    parts = []
+    schema = None
+    rows = 0
+    for chunk, part in zip(chunks, _new_part_names()):
+        schema = _write_part(chunk, cache_dir / part, schema)
+        parts.append(part)
+        rows += len(chunk)
+
+    if not parts:
+        raise ValueError(f"El archivo no contiene filas: {source_path}")
+
+    _write_manifest(cache_dir, {
+        'version': CACHE_VERSION,
+        'source': source,
+        'rows': rows,
+        'parts': parts,
+        'attrs': attrs or {},
+    })
+    _clear_stale_parts(cache_dir)
+
+    record_cache_event('writes')
+    return rows
+
+
+def append_cache(df_new, source, cache_dir=CACHE_DIR, attrs=None):
+    """
+    Añade filas nuevas a la caché como una parte adicional.
+
+    Args:
+        df_new (pd.DataFrame): Filas nuevas ya preparadas
+        source (dict): Huella de la nueva versión del CSV
+        cache_dir (Path): Carpeta de la caché
+        attrs (dict): Metadatos actualizados del catálogo
+
+    Returns:
+        bool: True si la parte se añadió; False si el esquema no es
+            compatible y hay que reconstruir la caché
+    """
+    import pyarrow.parquet as pq
+
+    manifest = _read_manifest(cache_dir)
+    if manifest is None:
+        return False
+
+    parts = list(manifest['parts'])
+    part = next(_new_part_names())
+    try:
+        schema = pq.read_schema(cache_dir / parts[0])
+        _write_part(df_new, cache_dir / part, schema)
+    except (OSError, ValueError, TypeError, NotImplementedError):
+        return False
+
+    parts.append(part)
+    manifest.update({
+        'source': source,
+        'rows': manifest['rows'] + len(df_new),
+        'parts': parts,
+        'attrs': attrs if attrs is not None else manifest.get('attrs', {}),
+    })
+    _write_manifest(cache_dir, manifest)
+
+    record_cache_event('appends')
+    return True
+
+
+def write_quarantine(df, cache_dir=CACHE_DIR):
+    """
+    Guarda las filas en cuarentena de la versión actual del catálogo.
+
+    Args:
+        df (pd.DataFrame): Filas rechazadas por la validación
+        cache_dir (Path): Carpeta de la caché
+
+    Returns:
+        bool: True si se escribió correctamente
+    """
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        _write_part(df, cache_dir / QUARANTINE_FILE_NAME)
+    except (OSError, ImportError, ValueError, TypeError):
+        return False
+    return True
+
+
+def read_quarantine(cache_dir=CACHE_DIR):
+    """
+    Lee las filas en cuarentena guardadas junto a la caché.
+
+    Returns:
+        pd.DataFrame: Filas rechazadas, o None si no hay cuarentena guardada
+    """
+    try:
+        import pyarrow.parquet as pq
+        return pq.read_table(cache_dir / QUARANTINE_FILE_NAME).to_pandas()
+    except (OSError, ImportError, ValueError):
+        return None
+
+
+def read_cache_attrs(cache_dir=CACHE_DIR):
+    """
+    Retorna los metadatos guardados del catálogo en caché.
+
+    Returns:
+        dict: `df.attrs` guardados en el manifiesto (vacío si no hay caché)
+    """
+    manifest = _read_manifest(cache_dir)
+    return manifest.get('attrs', {}) if manifest else {}
+
+
+def get_cache_stats():
+    """
+    Retorna una copia de los contadores de la caché.
+
+    Returns:
+        dict: Aciertos ('hits'), fallos ('misses'), escrituras completas
+            ('writes') y añadidos incrementales ('appends')
+    """
+    with _stats_lock:
+        return dict(CACHE_STATS)
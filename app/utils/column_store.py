@@ -0,0 +1,264 @@
+"""
+Column Store
+============
+
+Almacén del catálogo preparado en columnas mapeadas en memoria.
+Cada columna se guarda como un archivo `.npy` y un pequeño manifiesto JSON
+describe tipos, categorías y metadatos. Al abrirlo, las columnas se mapean
+con `mmap` sin copiarse: varios procesos de Streamlit que abren el mismo
+almacén comparten las mismas páginas físicas a través de la caché del
+sistema operativo, y el arranque no necesita parsear nada.
+
+Cada versión del CSV y del formato tiene su propia carpeta
+(`columns-v<versión>-<hash>`), de modo que publicar una versión nueva nunca
+sobrescribe archivos que otro proceso tenga mapeados, y un almacén de un
+formato anterior no se confunde con uno vigente.
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from utils.catalog_cache import CACHE_DIR
+
+
+# ============================================================================
+# CONSTANTES
+# ============================================================================
+
+# Prefijo de las carpetas del almacén (una por versión del CSV y del formato)
+STORE_PREFIX = "columns-"
+
+# Manifiesto dentro de cada carpeta
+STORE_MANIFEST_NAME = "columns.json"
+
+# Versión del formato del almacén
+STORE_VERSION = 2
+
+
+# ============================================================================
+# ESCRITURA
+# ============================================================================
+
+def store_path(source, cache_dir=CACHE_DIR):
+    """
+    Retorna la carpeta del almacén para una versión del CSV.
+
+    Incluye STORE_VERSION: al cambiar el formato, el almacén se vuelve a
+    publicar en otra carpeta y la anterior se elimina como obsoleta.
+
+    Args:
+        source (dict): Huella del CSV (ver catalog_cache.file_fingerprint)
+        cache_dir (Path): Carpeta de la caché
+
+    Returns:
+        Path: Carpeta `columns-v<versión>-<hash>`
+    """
+    return cache_dir / f"{STORE_PREFIX}v{STORE_VERSION}-{source['hash']}"
+
+
+def _column_meta(series, current=None):
+    """
+    Describe una columna, combinando la descripción con la de partes previas.
+
+    Las categorías se unen en orden de aparición y los tipos se promueven
+    (p. ej. int16 en una parte y float32 en otra dan float32). El texto y
+    los objetos se guardan como categoría.
+
+    Args:
+        series (pd.Series): Columna de una parte
+        current (dict): Descripción acumulada de las partes previas
+
+    Returns:
+        dict: Metadatos JSON de la columna
+    """
+    dtype = series.dtype
+
+    if pd.api.types.is_datetime64_any_dtype(dtype) or pd.api.types.is_numeric_dtype(dtype):
+        kind = 'datetime' if pd.api.types.is_datetime64_any_dtype(dtype) else 'numeric'
+        if current is not None:
+            dtype = np.result_type(current['dtype'], dtype)
+        return {'kind': kind, 'dtype': str(dtype)}
+
+    if not isinstance(dtype, pd.CategoricalDtype):
+        dtype = series.astype('category').dtype
+    categories = dtype.categories.tolist()
+    ordered = bool(dtype.ordered)
+    if current is not None:
+        known = set(current['categories'])
+        categories = current['categories'] + [c for c in categories if c not in known]
+        ordered = current['ordered']
+    return {
+        'kind': 'category',
+        'categories': categories,
+        'ordered': ordered,
+        'dtype': str(pd.Categorical([], categories=categories).codes.dtype),
+    }
+
+
+def _column_to_array(series, meta):
+    """
+    Convierte una columna en un array NumPy plano con el tipo de su descripción.
+
+    Returns:
+        np.ndarray: Valores (códigos para las categorías, int64 para las fechas)
+    """
+    if meta['kind'] == 'category':
+        dtype = pd.CategoricalDtype(meta['categories'], ordered=meta['ordered'])
+        return pd.Categorical(series, dtype=dtype).codes.astype(meta['dtype'], copy=False)
+
+    values = series.to_numpy().astype(meta['dtype'], copy=False)
+    return values.view('int64') if meta['kind'] == 'datetime' else values
+
+
+def write_column_store(parts, source, attrs=None, sort_by=None, cache_dir=CACHE_DIR):
+    """
+    Publica el catálogo como almacén de columnas para una versión del CSV.
+
+    El catálogo llega por partes y nunca se reúne en memoria: una primera
+    pasada reúne los tipos, el número de filas y la columna de orden; la
+    segunda escribe cada parte directamente en su posición final de los
+    archivos `.npy` (mapeados en memoria). La memoria necesaria es la de
+    una parte más 16 bytes por fila para la permutación del orden.
+
+    Se escribe en una carpeta temporal que se renombra al final, por lo que
+    los lectores solo ven almacenes completos. Las carpetas de versiones
+    anteriores se eliminan (los procesos que aún las tengan mapeadas
+    conservan el acceso hasta cerrarlas).
+
+    Args:
+        parts (callable): Función sin argumentos que retorna un iterable de
+            DataFrames con las partes del catálogo; se llama dos veces
+        source (dict): Huella del CSV de origen
+        attrs (dict): Metadatos del catálogo (`df.attrs`)
+        sort_by (str): Columna por la que se ordenan las filas de forma
+            descendente (None: en el orden de las partes)
+        cache_dir (Path): Carpeta de la caché
+
+    Returns:
+        Path: Carpeta del almacén publicado
+    """
+    target = store_path(source, cache_dir)
+    if (target / STORE_MANIFEST_NAME).exists():
+        return target
+
+    # Primera pasada: descripción de las columnas y clave de orden
+    columns = {}
+    lengths = []
+    keys = []
+    for part in parts():
+        for col in part.columns:
+            columns[col] = _column_meta(part[col], columns.get(col))
+        lengths.append(len(part))
+        if sort_by is not None:
+            keys.append(part[sort_by].to_numpy())
+    rows = sum(lengths)
+
+    # Posición final de cada fila (orden estable descendente)
+    positions = np.arange(rows)
+    if sort_by is not None:
+        order = np.argsort(np.concatenate(keys), kind='stable')[::-1]
+        positions[order] = np.arange(rows)
+    del keys
+
+    tmp_dir = cache_dir / f".{target.name}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    # Segunda pasada: cada parte se copia a su posición en los archivos
+    outputs = {}
+    for position, (col, meta) in enumerate(columns.items()):
+        meta['file'] = f"{position:03d}.npy"
+        dtype = 'int64' if meta['kind'] == 'datetime' else meta['dtype']
+        if rows > 0:
+            outputs[col] = np.lib.format.open_memmap(
+                tmp_dir / meta['file'], mode='w+', dtype=dtype, shape=(rows,))
+        else:
+            np.save(tmp_dir / meta['file'], np.empty(0, dtype=dtype))
+
+    offset = 0
+    for part, length in zip(parts(), lengths):
+        target_rows = positions[offset:offset + length]
+        for col, output in outputs.items():
+            output[target_rows] = _column_to_array(part[col], columns[col])
+        offset += length
+
+    for output in outputs.values():
+        output.flush()
+    del outputs
+
+    with open(tmp_dir / STORE_MANIFEST_NAME, 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': STORE_VERSION,
+            'source': source,
+            'rows': rows,
+            'columns': columns,
+            'attrs': attrs or {},
+        }, f, indent=2)
+
+    try:
+        os.replace(tmp_dir, target)
+    except OSError:
+        # Otro proceso publicó la misma versión a la vez
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    _remove_stale_stores(cache_dir, keep=target)
+    return target
+
+
+def _remove_stale_stores(cache_dir, keep):
+    """Elimina las carpetas de versiones anteriores del almacén."""
+    for path in cache_dir.glob(f"{STORE_PREFIX}*"):
+        if path != keep and path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+
+
+# ============================================================================
+# LECTURA
+# ============================================================================
+
+def open_column_store(source, cache_dir=CACHE_DIR):
+    """
+    Abre el almacén de una versión del CSV sin copiar los datos.
+
+    Las columnas quedan respaldadas por mapas de memoria de solo lectura:
+    el DataFrame devuelto no debe modificarse en su lugar.
+
+    Args:
+        source (dict): Huella del CSV de origen
+        cache_dir (Path): Carpeta de la caché
+
+    Returns:
+        pd.DataFrame: Catálogo mapeado en memoria, o None si no existe
+    """
+    target = store_path(source, cache_dir)
+    try:
+        with open(target / STORE_MANIFEST_NAME, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get('version') != STORE_VERSION:
+        return None
+
+    # Un archivo vacío no se puede mapear
+    mmap_mode = 'r' if manifest['rows'] > 0 else None
+
+    data = {}
+    for col, meta in manifest['columns'].items():
+        values = np.load(target / meta['file'], mmap_mode=mmap_mode)
+
+        if meta['kind'] == 'category':
+            dtype = pd.CategoricalDtype(meta['categories'], ordered=meta['ordered'])
+            data[col] = pd.Categorical.from_codes(values, dtype=dtype, validate=False)
+        elif meta['kind'] == 'datetime':
+            data[col] = values.view(meta['dtype'])
+        else:
+            data[col] = values
+
+    df = pd.DataFrame(data, copy=False)
+    df.attrs.update(manifest.get('attrs', {}))
+    return df
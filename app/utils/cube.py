@@ -0,0 +1,570 @@
+"""
+Cube
+====
+
+Cubo OLAP denso con los agregados del catálogo.
+
+Dimensiones: año × mes × tsunami × categoría de magnitud × categoría de
+profundidad × cuadrante (hemisferio norte/sur × este/oeste). Cada celda
+guarda el número de eventos y, para cada medida (magnitud, profundidad,
+significancia), el conteo de valores no nulos, la suma, la suma de
+cuadrados, el mínimo y el máximo.
+
+El cubo del catálogo se construye una vez por versión de los datos (huella)
+y responde cualquier agregación por esas dimensiones sumando celdas: el
+coste depende del tamaño del cubo, no del número de eventos. Si los filtros
+activos no se pueden expresar con las dimensiones del cubo (rangos de
+magnitud, profundidad o significancia, área personalizada, superficial,
+magnitud alta, solo eventos principales), se usa un cubo con solo las
+filas filtradas, con el mismo formato de resultado. Ese cubo se mantiene
+por diferencias: al mover un filtro solo se suman o restan las filas que
+entran o salen de la selección (ver filtered_cube).
+"""
+
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from utils.derived_columns import get_derived, is_available
+from utils.filter_engine import (
+    CATEGORY_FILTERS,
+    HEMISPHERES,
+    cached_filter_rows,
+    canonical_state,
+    range_predicates,
+)
+from utils.fingerprint import get_fingerprint
+from utils.indexes import get_range_index, pack_mask, popcount, range_bounds, test_rows
+from utils.regions import region_rows
+
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+# Dimensiones del cubo, en el orden de sus ejes
+CUBE_DIMENSIONS = ['Year', 'Month', 'tsunami', 'magnitude_category', 'depth_category', 'hemisphere']
+
+# Columnas numéricas agregadas en cada celda
+CUBE_MEASURES = ['magnitude', 'depth', 'sig']
+
+# Cuadrantes del eje 'hemisphere': (hemisferio N/S, hemisferio E/O)
+QUADRANTS = [("Norte", "Este"), ("Norte", "Oeste"), ("Sur", "Este"), ("Sur", "Oeste")]
+
+# Cubo del catálogo: {huella: cubo} (solo la última versión)
+_cubes = {}
+
+# Origen de los DataFrames de las páginas: {id(df): (ref. al catálogo, estado)}
+_sources = {}
+
+_lock = threading.Lock()
+
+# Cubos de selecciones recientes (ver filtered_cube), configurable
+SELECTION_CUBE_SLOTS = int(os.environ.get('EQ_SELECTION_CUBES', 4))
+
+# Cubos de selecciones: {(huella, estado canónico): (bitmap, cubo)}, del
+# menos al más recientemente usado
+_selections = OrderedDict()
+
+# Agregaciones respondidas con el cubo del catálogo, con el cubo de la
+# selección o con las filas; cubos de selección actualizados por
+# diferencias ('updates') o construidos de cero ('rebuilds')
+CUBE_STATS = {'cube': 0, 'selection': 0, 'rows': 0, 'updates': 0, 'rebuilds': 0}
+
+
+# ============================================================================
+# CONSTRUCCIÓN
+# ============================================================================
+
+def build_cube(df):
+    """
+    Construye el cubo de un DataFrame de eventos.
+
+    Args:
+        df (pd.DataFrame): Catálogo (o filas filtradas del catálogo)
+
+    Returns:
+        dict: {'labels': etiquetas de cada eje (None: sin categoría),
+            'shape': forma del cubo, 'count': eventos por celda,
+            'measures': {columna: {'count', 'sum', 'sumsq', 'min', 'max'}},
+            'cells': celda (índice plano) de cada fila}
+    """
+    codes, labels = _dimension_codes(df)
+    shape = tuple(len(axis) for axis in labels)
+    n_cells = int(np.prod(shape))
+    cells = np.ravel_multi_index(codes, shape) if n_cells else np.zeros(0, dtype=np.int64)
+
+    values = {
+        column: df[column].to_numpy(dtype=np.float64)
+        for column in CUBE_MEASURES if column in df.columns
+    }
+    cube = _aggregate_cells(cells, values, shape)
+    cube['labels'] = labels
+    cube['cells'] = cells
+    return cube
+
+
+def _aggregate_cells(cells, values, shape):
+    """
+    Agrega filas ya asignadas a celdas.
+
+    Args:
+        cells (np.ndarray): Celda (índice plano) de cada fila
+        values (dict): {medida: valores de cada fila}
+        shape (tuple): Forma del cubo
+
+    Returns:
+        dict: Cubo sin etiquetas (ver build_cube)
+    """
+    n_cells = int(np.prod(shape))
+    cube = {
+        'shape': shape,
+        'count': np.bincount(cells, minlength=n_cells).reshape(shape),
+        'measures': {},
+    }
+
+    for column, column_values in values.items():
+        valid = ~np.isnan(column_values)
+        measure_cells, column_values = cells[valid], column_values[valid]
+
+        # Mínimo y máximo por celda: filas ordenadas por celda y reduceat
+        minimum = np.full(n_cells, np.inf)
+        maximum = np.full(n_cells, -np.inf)
+        if len(column_values):
+            order = np.argsort(measure_cells, kind='stable')
+            sorted_cells, sorted_values = measure_cells[order], column_values[order]
+            starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+            minimum[sorted_cells[starts]] = np.minimum.reduceat(sorted_values, starts)
+            maximum[sorted_cells[starts]] = np.maximum.reduceat(sorted_values, starts)
+
+        cube['measures'][column] = {
+            'count': np.bincount(measure_cells, minlength=n_cells).reshape(shape),
+            'sum': np.bincount(measure_cells, weights=column_values, minlength=n_cells).reshape(shape),
+            'sumsq': np.bincount(measure_cells, weights=column_values * column_values,
+                                 minlength=n_cells).reshape(shape),
+            'min': minimum.reshape(shape),
+            'max': maximum.reshape(shape),
+        }
+
+    return cube
+
+
+def _dimension_codes(df):
+    """Retorna el índice de cada fila en cada eje y las etiquetas de los ejes."""
+    years = df['Year'].to_numpy().astype(np.int64)
+    first_year = int(years.min()) if len(years) else 0
+    year_labels = np.arange(first_year, int(years.max()) + 1 if len(years) else 0)
+
+    codes = [
+        years - first_year,
+        df['Month'].to_numpy().astype(np.int64) - 1,
+        df['tsunami'].to_numpy().astype(np.int64),
+    ]
+    labels = [year_labels, np.arange(1, 13), np.array([0, 1])]
+
+    # Categorías: las filas sin categoría van a un último índice (etiqueta None)
+    for column in ('magnitude_category', 'depth_category'):
+        values = get_derived(df, column)
+        category_codes = values.cat.codes.to_numpy().astype(np.int64)
+        n_categories = len(values.cat.categories)
+        codes.append(np.where(category_codes < 0, n_categories, category_codes))
+        labels.append(np.array(list(values.cat.categories) + [None], dtype=object))
+
+    south = df['latitude'].to_numpy() < 0
+    west = df['longitude'].to_numpy() < 0
+    codes.append(south.astype(np.int64) * 2 + west.astype(np.int64))
+    labels.append(np.array([f"{ns}-{ew}" for ns, ew in QUADRANTS], dtype=object))
+
+    return codes, labels
+
+
+def get_cube(catalog):
+    """
+    Retorna el cubo del catálogo, construyéndolo la primera vez.
+
+    Args:
+        catalog (pd.DataFrame): Catálogo completo
+
+    Returns:
+        dict: Cubo (ver build_cube)
+    """
+    fingerprint = get_fingerprint(catalog)
+    with _lock:
+        cube = _cubes.get(fingerprint)
+    if cube is not None:
+        return cube
+
+    cube = build_cube(catalog)
+    with _lock:
+        _cubes.clear()
+        _cubes[fingerprint] = cube
+    return cube
+
+
+# ============================================================================
+# CONSULTAS
+# ============================================================================
+
+def cube_selection(catalog, state):
+    """
+    Traduce un estado de filtros a una selección de celdas del cubo.
+
+    Los predicados que no excluyen ninguna fila (p. ej. un slider en su
+    rango completo) se ignoran.
+
+    Args:
+        catalog (pd.DataFrame): Catálogo completo
+        state (dict): Estado de los filtros
+
+    Returns:
+        list: Índices seleccionados en cada eje, o None si algún filtro
+            activo no se puede expresar con las dimensiones del cubo
+    """
+    cube = get_cube(catalog)
+    n_rows = len(catalog)
+    selection = [np.arange(size) for size in cube['shape']]
+
+    for column, lo, hi, hi_inclusive in range_predicates(catalog, state):
+        start, end = range_bounds(get_range_index(catalog, column), lo, hi, hi_inclusive)
+        if end - start == n_rows:
+            continue
+        if column != 'Year':
+            return None
+        years = cube['labels'][0]
+        keep = np.ones(len(years), dtype=bool)
+        if lo is not None:
+            keep &= years >= lo
+        if hi is not None:
+            keep &= years <= hi if hi_inclusive else years < hi
+        selection[0] = np.flatnonzero(keep)
+
+    if state.get('shallow_only') or state.get('high_mag_only') or state.get('mainshock_only'):
+        return None
+    if state.get('region') is not None and len(region_rows(catalog, state['region'])) < n_rows:
+        return None
+
+    if state.get('tsunami') is not None:
+        selection[2] = np.flatnonzero(cube['labels'][2] == state['tsunami'])
+
+    hemispheres = state.get('hemispheres', HEMISPHERES)
+    selection[5] = np.array([
+        i for i, (ns, ew) in enumerate(QUADRANTS) if ns in hemispheres and ew in hemispheres
+    ], dtype=np.int64)
+
+    for key, column in CATEGORY_FILTERS.items():
+        categories = state.get(key)
+        if categories and is_available(catalog, column):
+            axis = CUBE_DIMENSIONS.index(column)
+            selection[axis] = np.array([
+                i for i, label in enumerate(cube['labels'][axis])
+                if label is not None and label in categories
+            ], dtype=np.int64)
+
+    return selection
+
+
+def rollup(cube, selection, by):
+    """
+    Agrega las celdas seleccionadas del cubo por algunas dimensiones.
+
+    Args:
+        cube (dict): Cubo (ver build_cube)
+        selection (list): Índices seleccionados en cada eje
+        by (list): Dimensiones del resultado (ver CUBE_DIMENSIONS)
+
+    Returns:
+        pd.DataFrame: Una fila por combinación con eventos, con las
+            dimensiones de `by`, 'count', 'tsunami_count' y, por cada medida,
+            '<medida>_count', '_sum', '_mean', '_std', '_min' y '_max'
+    """
+    by_axes = [CUBE_DIMENSIONS.index(dimension) for dimension in by]
+    other_axes = tuple(axis for axis in range(len(CUBE_DIMENSIONS)) if axis not in by_axes)
+    # Tras reducir, los ejes de `by` quedan en orden de eje: se reordenan
+    permutation = [sorted(by_axes).index(axis) for axis in by_axes]
+
+    def reduce(values, func):
+        reduced = func(values[np.ix_(*selection)], axis=other_axes)
+        return np.transpose(reduced, permutation).reshape(-1)
+
+    # Eventos con tsunami: el eje 'tsunami' (2) con peso 1 solo en la etiqueta 1
+    with_tsunami = cube['count'] * (cube['labels'][2] == 1)[:, None, None, None]
+
+    grid = np.meshgrid(*[cube['labels'][axis][selection[axis]] for axis in by_axes], indexing='ij')
+    result = {dimension: values.reshape(-1) for dimension, values in zip(by, grid)}
+    result['count'] = reduce(cube['count'], np.sum)
+    result['tsunami_count'] = reduce(with_tsunami, np.sum)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for column, measure in cube['measures'].items():
+            count = reduce(measure['count'], np.sum)
+            total = reduce(measure['sum'], np.sum)
+            variance = (reduce(measure['sumsq'], np.sum) - total * total / count) / (count - 1)
+            result[f'{column}_count'] = count
+            result[f'{column}_sum'] = total
+            result[f'{column}_mean'] = total / count
+            result[f'{column}_std'] = np.where(count > 1, np.sqrt(np.maximum(variance, 0)), np.nan)
+            minimum = reduce(measure['min'], partial(np.min, initial=np.inf))
+            maximum = reduce(measure['max'], partial(np.max, initial=-np.inf))
+            result[f'{column}_min'] = np.where(np.isfinite(minimum), minimum, np.nan)
+            result[f'{column}_max'] = np.where(np.isfinite(maximum), maximum, np.nan)
+
+    table = pd.DataFrame(result)
+    return table[table['count'] > 0].reset_index(drop=True)
+
+
+# ============================================================================
+# CUBOS DE SELECCIONES (INCREMENTALES)
+# ============================================================================
+
+def filtered_cube(catalog, state):
+    """
+    Retorna el cubo de las filas que dejan unos filtros, por diferencias.
+
+    El cubo tiene la forma del cubo del catálogo. Se parte de la selección
+    reciente más parecida (o del catálogo completo): las filas que entran o
+    salen se obtienen con un XOR de los bitmaps de ambas selecciones, y
+    solo esas filas actualizan conteos, sumas y sumas de cuadrados. El
+    mínimo y el máximo de una celda se recalculan, con las filas de esa
+    celda, solo si sale la fila que los definía. Mover un poco un filtro
+    cuesta en proporción a las filas que cambian, no al tamaño de la
+    selección.
+
+    Args:
+        catalog (pd.DataFrame): Catálogo completo
+        state (dict): Estado de los filtros
+
+    Returns:
+        dict: Cubo (ver build_cube, sin 'cells'; de solo lectura)
+    """
+    fingerprint = get_fingerprint(catalog)
+    key = (fingerprint, canonical_state(state))
+    with _lock:
+        entry = _selections.get(key)
+        if entry is not None:
+            _selections.move_to_end(key)
+            return entry[1]
+        bases = [value for other, value in _selections.items() if other[0] == fingerprint]
+
+    catalog_cube = get_cube(catalog)
+    n_rows = len(catalog)
+    rows = cached_filter_rows(catalog, state)
+    mask = np.zeros(n_rows, dtype=bool)
+    mask[rows] = True
+    bitmap = pack_mask(mask)
+
+    # Base: la selección con menos filas distintas; el catálogo completo
+    # difiere en las filas excluidas
+    base_bitmap, base_cube, n_changed = None, catalog_cube, n_rows - len(rows)
+    for other_bitmap, other_cube in bases:
+        changed = popcount(np.bitwise_xor(bitmap, other_bitmap))
+        if changed < n_changed:
+            base_bitmap, base_cube, n_changed = other_bitmap, other_cube, changed
+
+    if n_changed < len(rows):
+        _record('updates')
+        if base_bitmap is None:
+            changed = np.flatnonzero(~mask)
+        else:
+            changed = _changed_rows(bitmap, base_bitmap, n_rows)
+        cube = _apply_delta(catalog, catalog_cube, base_cube, bitmap, changed)
+    else:
+        _record('rebuilds')
+        values = {
+            column: catalog[column].to_numpy()[rows].astype(np.float64)
+            for column in catalog_cube['measures']
+        }
+        cube = _aggregate_cells(catalog_cube['cells'][rows], values, catalog_cube['shape'])
+        cube['labels'] = catalog_cube['labels']
+
+    with _lock:
+        for stale in [other for other in _selections if other[0] != fingerprint]:
+            del _selections[stale]
+        _selections[key] = (bitmap, cube)
+        while len(_selections) > SELECTION_CUBE_SLOTS:
+            _selections.popitem(last=False)
+    return cube
+
+
+def _changed_rows(bitmap, other, n_rows):
+    """Posiciones cuyo bit difiere entre dos bitmaps (solo se desempaquetan los bytes distintos)."""
+    diff = np.bitwise_xor(bitmap, other)
+    changed_bytes = np.flatnonzero(diff)
+    bits = np.unpackbits(diff[changed_bytes][:, None], axis=1, bitorder='little')
+    byte_index, bit = np.nonzero(bits)
+    rows = changed_bytes[byte_index] * 8 + bit
+    return rows[rows < n_rows]
+
+
+def _apply_delta(catalog, catalog_cube, base, bitmap, changed):
+    """
+    Aplica a una copia del cubo `base` las filas que entran o salen.
+
+    Args:
+        catalog (pd.DataFrame): Catálogo completo
+        catalog_cube (dict): Cubo del catálogo (celda de cada fila)
+        base (dict): Cubo de la selección de partida
+        bitmap (np.ndarray): Bitmap de la nueva selección
+        changed (np.ndarray): Filas que difieren entre ambas selecciones
+
+    Returns:
+        dict: Cubo de la nueva selección
+    """
+    entering = test_rows(bitmap, changed)
+    sign = np.where(entering, 1, -1)
+    cells = catalog_cube['cells'][changed]
+
+    cube = {
+        'labels': base['labels'],
+        'shape': base['shape'],
+        'count': base['count'].copy(),
+        'measures': {},
+    }
+    np.add.at(cube['count'].reshape(-1), cells, sign)
+
+    for column, base_measure in base['measures'].items():
+        measure = {name: values.copy() for name, values in base_measure.items()}
+        cube['measures'][column] = measure
+        flat = {name: values.reshape(-1) for name, values in measure.items()}
+
+        values = catalog[column].to_numpy()[changed].astype(np.float64)
+        valid = ~np.isnan(values)
+        value_cells, value_sign, values, value_entering = (
+            cells[valid], sign[valid], values[valid], entering[valid]
+        )
+        np.add.at(flat['count'], value_cells, value_sign)
+        np.add.at(flat['sum'], value_cells, value_sign * values)
+        np.add.at(flat['sumsq'], value_cells, value_sign * values * values)
+        np.minimum.at(flat['min'], value_cells[value_entering], values[value_entering])
+        np.maximum.at(flat['max'], value_cells[value_entering], values[value_entering])
+
+        # Celdas que pierden su mínimo o su máximo: se recalculan
+        leaving = ~value_entering
+        dirty = np.unique(value_cells[leaving][
+            (values[leaving] <= flat['min'][value_cells[leaving]])
+            | (values[leaving] >= flat['max'][value_cells[leaving]])
+        ])
+        if len(dirty):
+            _recompute_extremes(catalog, catalog_cube, column, bitmap, dirty, flat)
+
+        # Celdas vacías: sin residuos de redondeo en las sumas
+        emptied = value_cells[flat['count'][value_cells] == 0]
+        flat['sum'][emptied] = 0.0
+        flat['sumsq'][emptied] = 0.0
+
+    return cube
+
+
+def _recompute_extremes(catalog, catalog_cube, column, bitmap, dirty, flat):
+    """Recalcula el mínimo y el máximo de unas celdas con sus filas seleccionadas."""
+    order, offsets = _cell_index(catalog_cube)
+    members = np.concatenate([order[offsets[cell]:offsets[cell + 1]] for cell in dirty])
+    members = members[test_rows(bitmap, members)]
+    values = catalog[column].to_numpy()[members].astype(np.float64)
+    valid = ~np.isnan(values)
+    members, values = members[valid], values[valid]
+
+    flat['min'][dirty] = np.inf
+    flat['max'][dirty] = -np.inf
+    member_cells = catalog_cube['cells'][members]
+    np.minimum.at(flat['min'], member_cells, values)
+    np.maximum.at(flat['max'], member_cells, values)
+
+
+def _cell_index(catalog_cube):
+    """Filas del catálogo agrupadas por celda (formato CSR), calculadas una vez."""
+    index = catalog_cube.get('cell_index')
+    if index is None:
+        cells = catalog_cube['cells']
+        order = np.argsort(cells, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(cells, minlength=catalog_cube['count'].size))])
+        index = catalog_cube['cell_index'] = (order, offsets)
+    return index
+
+
+# ============================================================================
+# AGREGACIONES DE LAS PÁGINAS
+# ============================================================================
+
+def set_cube_source(df, catalog, state):
+    """
+    Registra de qué catálogo y filtros salen los datos de una página.
+
+    Con el origen registrado, cube_rollup responde con el cubo del catálogo;
+    el registro se olvida cuando el DataFrame deja de existir.
+
+    Args:
+        df (pd.DataFrame): Datos de la página
+        catalog (pd.DataFrame): Catálogo completo
+        state (dict): Estado de los filtros aplicado
+
+    Returns:
+        pd.DataFrame: El mismo DataFrame
+    """
+    key = id(df)
+    with _lock:
+        if key not in _sources:
+            weakref.finalize(df, _forget, key)
+        _sources[key] = (weakref.ref(catalog), dict(state))
+    return df
+
+
+def _forget(key):
+    """Elimina el origen de un DataFrame liberado."""
+    with _lock:
+        _sources.pop(key, None)
+
+
+def cube_rollup(df, by):
+    """
+    Agrega los datos de una página por dimensiones del cubo.
+
+    Usa el cubo del catálogo si el origen de `df` está registrado (ver
+    set_cube_source) y sus filtros se pueden expresar con el cubo; si no,
+    el cubo de la selección (ver filtered_cube) o, sin origen registrado,
+    el cubo de las filas de `df`.
+
+    Args:
+        df (pd.DataFrame): Datos de la página
+        by (list): Dimensiones del resultado (ver CUBE_DIMENSIONS)
+
+    Returns:
+        pd.DataFrame: Agregados (ver rollup)
+    """
+    with _lock:
+        source = _sources.get(id(df))
+    catalog = source[0]() if source else None
+
+    if catalog is not None:
+        selection = cube_selection(catalog, source[1])
+        if selection is not None:
+            _record('cube')
+            return rollup(get_cube(catalog), selection, by)
+        _record('selection')
+        cube = filtered_cube(catalog, source[1])
+        return rollup(cube, [np.arange(size) for size in cube['shape']], by)
+
+    _record('rows')
+    cube = build_cube(df)
+    return rollup(cube, [np.arange(size) for size in cube['shape']], by)
+
+
+def _record(counter):
+    """Incrementa un contador de CUBE_STATS bajo el lock del módulo."""
+    with _lock:
+        CUBE_STATS[counter] += 1
+
+
+def get_cube_stats():
+    """
+    Retorna una copia coherente de los contadores del cubo.
+
+    Returns:
+        dict: CUBE_STATS
+    """
+    with _lock:
+        return dict(CUBE_STATS)
@@ -6,52 +6,199 @@ Módulo para cargar y preparar los datos del dataset de terremotos.
 Incluye funciones de carga, validación y transformación de datos.
 """
 
+import copy
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 import numpy as np
 import streamlit as st
 from pathlib import Path
 
+from utils.catalog_cache import (
+    CACHE_VERSION,
+    append_cache,
+    detect_append,
+    file_fingerprint,
+    iter_cache_parts,
+    list_shards,
+    read_cache_attrs,
+    read_quarantine,
+    record_cache_event,
+    valid_cache_source,
+    write_cache,
+    write_cache_stream,
+    write_quarantine,
+)
+from utils.column_store import STORE_VERSION, open_column_store, write_column_store
+from utils.declustering import decluster
+from utils.derived_columns import derived_column, get_derived
+from utils.fingerprint import combine_fingerprints, set_fingerprint
+from utils.validation import (
+    QUARANTINE_RULES_COLUMN,
+    merge_reports,
+    new_report,
+    validate_rows,
+)
+
 
 # ============================================================================
 # CONSTANTES
 # ============================================================================
 
-# Ruta relativa al archivo CSV desde la carpeta app
-DATA_PATH = Path(__file__).parent.parent.parent / "data" / "earthquake_data_tsunami.csv"
+# Ruta relativa al archivo CSV desde la carpeta app. Puede sustituirse con la
+# variable de entorno EQ_DATA_PATH por un CSV o por una carpeta de fragmentos
+# CSV (p. ej. uno por año o por agencia), que se cargan en paralelo.
+DATA_PATH = Path(os.environ.get(
+    'EQ_DATA_PATH',
+    Path(__file__).parent.parent.parent / "data" / "earthquake_data_tsunami.csv"
+))
+
+# Hilos para leer y preparar fragmentos en paralelo
+MAX_LOAD_WORKERS = min(8, os.cpu_count() or 1)
+
+# Columnas mínimas que debe contener el dataset
+REQUIRED_COLUMNS = [
+    'magnitude', 'depth', 'latitude', 'longitude', 
+    'tsunami', 'Year', 'Month', 'sig'
+]
+
+# Límite de memoria para la ingesta (MB), configurable por variable de entorno.
+# Los CSV mayores que una fracción de este límite se leen por bloques.
+MEMORY_LIMIT_MB = int(os.environ.get('EQ_MEMORY_LIMIT_MB', 2048))
+STREAMING_FRACTION = 0.25
+
+# Tipos fijos para la lectura por bloques (evita esquemas distintos entre bloques).
+# Año, mes y tsunami se leen como float para que los valores faltantes lleguen
+# a la validación en lugar de romper la lectura.
+CSV_DTYPES = {
+    'magnitude': 'float64', 'cdi': 'float64', 'mmi': 'float64',
+    'sig': 'int64', 'nst': 'float64', 'dmin': 'float64', 'gap': 'float64',
+    'depth': 'float64', 'latitude': 'float64', 'longitude': 'float64',
+    'Year': 'float64', 'Month': 'float64', 'tsunami': 'float64',
+}
+
+# Categorías de magnitud y profundidad
+MAGNITUDE_BINS = [0, 6.5, 7.0, 7.5, 10]
+MAGNITUDE_LABELS = ['< 6.5', '6.5-7.0', '7.0-7.5', '> 7.5']
+DEPTH_BINS = [0, 50, 150, 300, 700]
+DEPTH_LABELS = ['Superficial (0-50km)', 'Intermedia (50-150km)', 
+                'Profunda (150-300km)', 'Muy Profunda (>300km)']
+
+# Columnas normalizadas para el índice de calidad de monitoreo
+MONITORING_COLUMNS = ['nst', 'gap', 'dmin']
+
+# Etiquetas de tsunami como categoría (2 valores en lugar de cadenas Python)
+TSUNAMI_LABEL_DTYPE = pd.CategoricalDtype(['Sin Tsunami', 'Con Tsunami'])
+
+# Esquema compacto del catálogo preparado
+COMPACT_SCHEMA = {
+    # Medidas continuas (float32: ~7 cifras significativas, suficiente)
+    'magnitude': 'float32',
+    'depth': 'float32',
+    'latitude': 'float32',
+    'longitude': 'float32',
+    'cdi': 'float32',
+    'mmi': 'float32',
+    'nst': 'float32',
+    'dmin': 'float32',
+    'gap': 'float32',
+    'impact_level': 'float32',
+    'nst_norm': 'float32',
+    'gap_norm': 'float32',
+    'dmin_norm': 'float32',
+    'monitoring_quality': 'float32',
+    # Enteros pequeños
+    'sig': 'int16',
+    'Year': 'int16',
+    'Month': 'int8',
+    'tsunami': 'int8',
+    # Indicadores binarios
+    'is_shallow': 'bool',
+    'high_mag': 'bool',
+    'oceanic_event': 'bool',
+    # Etiquetas
+    'tsunami_label': TSUNAMI_LABEL_DTYPE,
+}
 
 
 # ============================================================================
 # FUNCIÓN DE CARGA DE DATOS
 # ============================================================================
 
-@st.cache_data
 def load_data():
     """
     Carga el dataset de terremotos desde el archivo CSV.
-    Utiliza caché de Streamlit para optimizar el rendimiento.
+    Utiliza caché de Streamlit para optimizar el rendimiento y, por debajo,
+    una caché columnar en disco con el DataFrame ya preparado, que se
+    reconstruye automáticamente cuando cambia el CSV.
+    
+    Si al CSV solo se le han añadido filas al final, únicamente se leen y
+    preparan las filas nuevas. Los archivos grandes (ver MEMORY_LIMIT_MB)
+    se ingieren por bloques directamente en la caché en disco.
+    
+    El catálogo devuelto tiene registrada su huella de contenido
+    (`utils.fingerprint.get_fingerprint(df)`), que cambia exactamente cuando
+    cambian los datos y sirve como clave para las cachés de las páginas.
     
     Returns:
         pd.DataFrame: DataFrame con los datos de terremotos, o None si hay error
     """
     try:
-        # Cargar el CSV
-        df = pd.read_csv(DATA_PATH)
-        
-        # Validar columnas requeridas
-        required_columns = [
-            'magnitude', 'depth', 'latitude', 'longitude', 
-            'tsunami', 'Year', 'Month', 'sig'
-        ]
+        source = file_fingerprint(DATA_PATH, with_hash=False)
+    except FileNotFoundError:
+        st.error(f"❌ No se encontró el archivo: {DATA_PATH}")
+        return None
+    
+    # Tamaño y fecha identifican la versión del CSV: si cambian, Streamlit
+    # vuelve a ejecutar la carga (que a su vez reutiliza la caché en disco)
+    return _load_catalog(source['size'], source['mtime_ns'])
+
+
+@st.cache_resource(max_entries=1)
+def _load_catalog(source_size, source_mtime_ns):
+    """
+    Carga el catálogo para una versión concreta del CSV.
+    
+    Se sirve desde el almacén de columnas mapeadas en memoria
+    (utils/column_store.py); si aún no existe para esta versión, se
+    construye parte a parte a partir de la caché Parquet (que a su vez se
+    actualiza desde el CSV si hace falta) y se publica. El catálogo
+    completo nunca se reúne en memoria fuera del almacén. Se usa
+    `st.cache_resource` para devolver siempre el mismo objeto sin copiarlo:
+    el DataFrame es de solo lectura.
+    
+    Args:
+        source_size (int): Tamaño del CSV (solo como clave de caché)
+        source_mtime_ns (int): Fecha de modificación (solo como clave de caché)
         
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            st.error(f"Columnas faltantes en el dataset: {missing_columns}")
-            return None
+    Returns:
+        pd.DataFrame: Catálogo preparado, o None si hay error
+    """
+    try:
+        # Acierto si la caché sirve sin parsear el CSV; fallo si hay que
+        # leerlo (completo o solo las filas añadidas)
+        source = valid_cache_source(DATA_PATH)
+        record_cache_event('hits' if source is not None else 'misses')
+        if source is None:
+            df = _ingest(DATA_PATH)
+            source = valid_cache_source(DATA_PATH)
+            if source is None:
+                # Sin caché en disco (p. ej. sin motor Parquet): copia en memoria
+                return None if df is None else finalize_catalog(df)
         
-        # Transformaciones básicas
-        df = prepare_data(df)
+        df = open_column_store(source)
+        if df is None:
+            # Publicar el almacén y servir la versión mapeada, compartida
+            # entre procesos
+            publish_column_store(source)
+            df = open_column_store(source)
+        if df is None:
+            # Almacén ilegible: se prepara el CSV de nuevo en memoria
+            df = _ingest(DATA_PATH, in_memory=True)
+            return None if df is None else finalize_catalog(df)
         
-        return df
+        return set_fingerprint(df, catalog_fingerprint(source))
     
     except FileNotFoundError:
         st.error(f"❌ No se encontró el archivo: {DATA_PATH}")
@@ -62,6 +209,383 @@ def load_data():
         return None
 
 
+def publish_column_store(source):
+    """
+    Construye el almacén de columnas a partir de las partes de la caché.
+    
+    Las partes se leen de una en una con el esquema compacto y el almacén
+    queda ordenado por fecha descendente, como el catálogo preparado.
+    
+    Args:
+        source (dict): Huella del CSV registrada en la caché
+        
+    Returns:
+        Path: Carpeta del almacén publicado
+    """
+    def parts():
+        return (apply_compact_schema(part) for part in iter_cache_parts())
+    
+    return write_column_store(parts, source, attrs=read_cache_attrs(), sort_by='Date')
+
+
+def catalog_fingerprint(source):
+    """
+    Calcula la huella de contenido del catálogo preparado.
+    
+    Combina el hash del contenido del CSV (ya calculado para validar la
+    caché en disco) con las versiones del formato de preparación, sin volver
+    a recorrer los datos.
+    
+    Args:
+        source (dict): Huella del CSV (ver catalog_cache.file_fingerprint)
+        
+    Returns:
+        str: Huella hexadecimal de 32 caracteres
+    """
+    return combine_fingerprints(source['hash'], CACHE_VERSION, STORE_VERSION)
+
+
+def load_quarantine():
+    """
+    Carga las filas del CSV rechazadas por la validación.
+    
+    Se guardan en la caché en disco junto al catálogo de la misma versión
+    del CSV, por lo que no se vuelve a validar nada al consultarlas.
+    
+    Returns:
+        pd.DataFrame: Filas en cuarentena con la columna 'reglas', o None si
+            no hay cuarentena guardada
+    """
+    source = file_fingerprint(DATA_PATH, with_hash=False)
+    return _load_quarantine(source['size'], source['mtime_ns'])
+
+
+@st.cache_data(max_entries=1, show_spinner=False)
+def _load_quarantine(source_size, source_mtime_ns):
+    """Lee la cuarentena de una versión concreta del CSV (ver load_quarantine)."""
+    return read_quarantine()
+
+
+def _ingest(path, in_memory=False):
+    """
+    Reconstruye o actualiza la caché en disco a partir del CSV.
+    
+    Una carpeta de fragmentos se ingiere en paralelo. Para un CSV único se
+    prueba primero la actualización incremental; si no es un simple
+    añadido, se ingiere completo (por bloques o en memoria según su tamaño).
+    
+    Args:
+        path (Path): Ruta del CSV o carpeta de fragmentos
+        in_memory (bool): Preparar el CSV completo en memoria y devolverlo
+            sin pasar por la caché (respaldo si el almacén no se puede abrir)
+        
+    Returns:
+        pd.DataFrame: Catálogo preparado solo si no pudo guardarse en la
+            caché en disco (o con `in_memory`); None si la caché quedó
+            actualizada o si faltan columnas
+    """
+    if path.is_dir():
+        if in_memory:
+            raise OSError(f"No se pudo abrir el almacén de columnas de {path}")
+        ingest_shards(path)
+        return None
+    
+    if in_memory:
+        prepared = _read_and_prepare()
+        return None if prepared is None else prepared[0]
+    
+    if ingest_appended_rows(path):
+        return None
+    
+    if should_stream(path):
+        ingest_csv_streaming(path)
+        return None
+    
+    # Huella tomada antes de leer: si el CSV cambia durante la construcción,
+    # la siguiente carga detectará la diferencia
+    source = file_fingerprint(path)
+    prepared = _read_and_prepare()
+    if prepared is None:
+        return None
+    
+    df, quarantine = prepared
+    write_quarantine(quarantine)
+    if write_cache(df, path, source=source):
+        return None
+    return df
+
+
+def _missing_columns(df):
+    """Retorna la lista de columnas requeridas que faltan en el DataFrame."""
+    return [col for col in REQUIRED_COLUMNS if col not in df.columns]
+
+
+def _read_and_prepare():
+    """
+    Lee el CSV, valida las columnas requeridas y las filas, y prepara el
+    DataFrame. El reporte de validación queda en `df.attrs['validation']`.
+    
+    Returns:
+        tuple: (DataFrame preparado, filas en cuarentena), o None si faltan
+            columnas
+    """
+    # Cargar el CSV
+    df = pd.read_csv(DATA_PATH)
+    
+    # Validar columnas requeridas
+    missing_columns = _missing_columns(df)
+    if missing_columns:
+        st.error(f"Columnas faltantes en el dataset: {missing_columns}")
+        return None
+    
+    # Apartar las filas inválidas
+    report = new_report()
+    df, quarantine = validate_rows(df, report)
+    
+    # Transformaciones básicas
+    df = prepare_data(df)
+    df.attrs['validation'] = report
+    return df, quarantine
+
+
+# ============================================================================
+# INGESTA POR BLOQUES
+# ============================================================================
+
+def should_stream(path, memory_limit_mb=MEMORY_LIMIT_MB):
+    """
+    Decide si un CSV debe ingerirse por bloques según su tamaño.
+    
+    Args:
+        path (Path): Ruta del CSV
+        memory_limit_mb (int): Límite de memoria de la ingesta (MB)
+        
+    Returns:
+        bool: True si el archivo supera la fracción permitida del límite
+    """
+    limit_bytes = memory_limit_mb * 1024 * 1024
+    return os.path.getsize(path) > limit_bytes * STREAMING_FRACTION
+
+
+def estimate_chunk_rows(path, memory_limit_mb=MEMORY_LIMIT_MB, sample_rows=10_000):
+    """
+    Estima cuántas filas caben en un bloque sin superar el límite de memoria.
+    
+    Mide el uso real de memoria de una muestra ya preparada y reserva margen
+    para el bloque leído, el preparado y su conversión a Arrow.
+    
+    Args:
+        path (Path): Ruta del CSV
+        memory_limit_mb (int): Límite de memoria de la ingesta (MB)
+        sample_rows (int): Filas de la muestra
+        
+    Returns:
+        int: Número de filas por bloque
+    """
+    sample = pd.read_csv(path, nrows=sample_rows, dtype=CSV_DTYPES)
+    if sample.empty:
+        return sample_rows
+    
+    sample = prepare_chunk(validate_rows(sample)[0])
+    bytes_per_row = sample.memory_usage(deep=True).sum() / len(sample)
+    
+    # Bloque crudo + bloque preparado + tabla Arrow
+    overhead_factor = 4
+    rows = int(memory_limit_mb * 1024 * 1024 / (bytes_per_row * overhead_factor))
+    return max(rows, 1_000)
+
+
+def iter_prepared_chunks(path, chunk_rows, extremes=None, report=None,
+                         quarantine=None):
+    """
+    Lee el CSV por bloques, aparta las filas inválidas y aplica las
+    transformaciones fila a fila.
+    
+    Args:
+        path (Path): Ruta del CSV
+        chunk_rows (int): Filas por bloque
+        extremes (dict): Si se indica, se actualiza con los mínimos y máximos
+            de las columnas de monitoreo vistos hasta el momento
+        report (dict): Si se indica, acumula los conteos de validación
+        quarantine (list): Si se indica, recibe las filas en cuarentena de
+            cada bloque
+        
+    Yields:
+        pd.DataFrame: Bloque preparado (sin columnas de normalización global)
+    """
+    reader = pd.read_csv(path, chunksize=chunk_rows, dtype=CSV_DTYPES)
+    for chunk in reader:
+        missing_columns = _missing_columns(chunk)
+        if missing_columns:
+            raise ValueError(f"Columnas faltantes en el dataset: {missing_columns}")
+        
+        chunk, rejected = validate_rows(chunk, report)
+        if quarantine is not None and not rejected.empty:
+            quarantine.append(rejected)
+        
+        chunk = prepare_chunk(chunk)
+        if extremes is not None:
+            merge_extremes(extremes, column_extremes(chunk))
+        yield chunk
+
+
+def ingest_csv_streaming(path, memory_limit_mb=MEMORY_LIMIT_MB):
+    """
+    Ingiere un CSV por bloques y lo escribe directamente en la caché en disco.
+    
+    La memoria máxima queda acotada por el tamaño de bloque. Los extremos de
+    monitoreo acumulados durante la lectura se guardan en el manifiesto para
+    las normalizaciones globales (ver columnas derivadas), junto con el
+    reporte de validación.
+    
+    Args:
+        path (Path): Ruta del CSV
+        memory_limit_mb (int): Límite de memoria de la ingesta (MB)
+        
+    Returns:
+        int: Número de filas ingeridas
+    """
+    chunk_rows = estimate_chunk_rows(path, memory_limit_mb)
+    extremes = {}
+    report = new_report()
+    quarantine = []
+    chunks = iter_prepared_chunks(path, chunk_rows, extremes=extremes,
+                                  report=report, quarantine=quarantine)
+    rows = write_cache_stream(chunks, path,
+                              attrs={'extremes': extremes, 'validation': report})
+    write_quarantine(_concat_quarantine(quarantine))
+    return rows
+
+
+def _concat_quarantine(frames):
+    """Une las filas en cuarentena de varios bloques en un DataFrame."""
+    frames = [frame for frame in frames if frame is not None and not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=[QUARANTINE_RULES_COLUMN])
+    return pd.concat(frames, ignore_index=True)
+
+
+# ============================================================================
+# INGESTA DE FRAGMENTOS EN PARALELO
+# ============================================================================
+
+def _read_shard(path):
+    """
+    Lee un fragmento CSV, aparta sus filas inválidas y aplica las
+    transformaciones fila a fila.
+    
+    Args:
+        path (Path): Ruta del fragmento
+        
+    Returns:
+        tuple: (fragmento preparado, filas en cuarentena, reporte de validación)
+    """
+    df = pd.read_csv(path, dtype=CSV_DTYPES)
+    
+    missing_columns = _missing_columns(df)
+    if missing_columns:
+        raise ValueError(f"Columnas faltantes en {path.name}: {missing_columns}")
+    
+    report = new_report()
+    df, quarantine = validate_rows(df, report)
+    return prepare_chunk(df), quarantine, report
+
+
+def ingest_shards(path, max_workers=MAX_LOAD_WORKERS):
+    """
+    Lee y prepara en paralelo los fragmentos CSV de una carpeta.
+    
+    Cada hilo lee y prepara su fragmento sin copias intermedias. Los
+    fragmentos se guardan como partes de la caché en disco a medida que se
+    recogen, en orden, acumulando los extremos de monitoreo y el reporte de
+    validación; no se concatenan.
+    
+    Args:
+        path (Path): Carpeta de fragmentos
+        max_workers (int): Número de hilos
+        
+    Returns:
+        int: Número de filas ingeridas
+    """
+    shards = list_shards(path)
+    if not shards:
+        raise FileNotFoundError(f"No hay archivos CSV en {path}")
+    
+    source = file_fingerprint(path)
+    extremes = {}
+    report = new_report()
+    quarantine = []
+    
+    def prepared_parts(results):
+        for part, rejected, part_report in results:
+            merge_extremes(extremes, column_extremes(part))
+            merge_reports(report, part_report)
+            quarantine.append(rejected)
+            yield part
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        rows = write_cache_stream(prepared_parts(pool.map(_read_shard, shards)), path,
+                                  attrs={'extremes': extremes, 'validation': report},
+                                  source=source)
+    
+    write_quarantine(_concat_quarantine(quarantine))
+    return rows
+
+
+# ============================================================================
+# INGESTA INCREMENTAL
+# ============================================================================
+
+def ingest_appended_rows(path):
+    """
+    Añade a la caché solo las filas agregadas al final del CSV.
+    
+    Las filas nuevas se leen con los mismos tipos que los bloques
+    (CSV_DTYPES), se validan y preparan solas y se guardan como una parte
+    nueva; los extremos de monitoreo (nst, gap, dmin) y el reporte de
+    validación del manifiesto se actualizan con los de las filas nuevas, sin
+    volver a leer el resto del catálogo. Las columnas normalizadas no se
+    guardan: se derivan bajo demanda de esos extremos en cada catálogo.
+    
+    Args:
+        path (Path): Ruta del CSV
+        
+    Returns:
+        bool: True si la caché quedó actualizada; False si el CSV no es un
+            simple añadido y hay que reconstruir la caché
+    """
+    found = detect_append(path)
+    if found is None:
+        return False
+    
+    offset, source = found
+    columns = pd.read_csv(path, nrows=0).columns
+    try:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            df_new = pd.read_csv(f, header=None, names=columns, dtype=CSV_DTYPES)
+    except ValueError:
+        # Tipos incompatibles (p. ej. 'sig' vacío): se reconstruye completa
+        return False
+    
+    if df_new.empty or _missing_columns(df_new):
+        return False
+    
+    attrs = copy.deepcopy(read_cache_attrs())
+    df_new, rejected = validate_rows(df_new, attrs.setdefault('validation', new_report()))
+    
+    df_new = prepare_chunk(df_new)
+    df_new = df_new.sort_values('Date', ascending=False)
+    merge_extremes(attrs.setdefault('extremes', {}), column_extremes(df_new))
+    
+    if not append_cache(df_new, source, attrs=attrs):
+        return False
+    
+    if not rejected.empty:
+        write_quarantine(_concat_quarantine([read_quarantine(), rejected]))
+    return True
+
+
 # ============================================================================
 # PREPARACIÓN DE DATOS
 # ============================================================================
@@ -69,7 +593,9 @@ def load_data():
 def prepare_data(df):
     """
     Prepara y transforma el DataFrame para su uso en la aplicación.
-    Añade columnas calculadas y limpia datos.
+    Añade las columnas básicas, limpia datos y aplica el esquema compacto
+    (COMPACT_SCHEMA). Las columnas más costosas o menos usadas se calculan
+    bajo demanda (ver COLUMNAS DERIVADAS BAJO DEMANDA).
     
     Args:
         df (pd.DataFrame): DataFrame original
@@ -80,6 +606,29 @@ def prepare_data(df):
     # Crear copia para evitar modificar el original
     df = df.copy()
     
+    # Columnas derivadas fila a fila
+    df = prepare_chunk(df)
+    
+    # Extremos globales para las normalizaciones bajo demanda
+    df.attrs['extremes'] = column_extremes(df)
+    
+    # Ordenar por fecha descendente
+    df = df.sort_values('Date', ascending=False)
+    
+    return df
+
+
+def prepare_chunk(df):
+    """
+    Añade las columnas básicas, que solo dependen de cada fila.
+    Modifica el DataFrame recibido (pensado para bloques ya propios).
+    
+    Args:
+        df (pd.DataFrame): DataFrame o bloque original
+        
+    Returns:
+        pd.DataFrame: DataFrame con las columnas básicas
+    """
     # Crear columnas de fecha
     df['Date'] = pd.to_datetime(df[['Year', 'Month']].assign(day=1))
     
@@ -91,49 +640,203 @@ def prepare_data(df):
     # Crear etiquetas para tsunami
     df['tsunami_label'] = df['tsunami'].map({0: 'Sin Tsunami', 1: 'Con Tsunami'})
     
-    # Crear categorías de magnitud
-    df['magnitude_category'] = pd.cut(
-        df['magnitude'],
-        bins=[0, 6.5, 7.0, 7.5, 10],
-        labels=['< 6.5', '6.5-7.0', '7.0-7.5', '> 7.5']
-    )
-    
-    # Crear categorías de profundidad
-    df['depth_category'] = pd.cut(
-        df['depth'],
-        bins=[0, 50, 150, 300, 700],
-        labels=['Superficial (0-50km)', 'Intermedia (50-150km)', 
-                'Profunda (150-300km)', 'Muy Profunda (>300km)']
-    )
-    
-    # Calcular índice de calidad de monitoreo (si las columnas existen)
-    if all(col in df.columns for col in ['nst', 'gap', 'dmin']):
-        # Normalizar cada componente (0-1)
-        df['nst_norm'] = (df['nst'] - df['nst'].min()) / (df['nst'].max() - df['nst'].min())
-        df['gap_norm'] = 1 - ((df['gap'] - df['gap'].min()) / (df['gap'].max() - df['gap'].min()))
-        df['dmin_norm'] = 1 - ((df['dmin'] - df['dmin'].min()) / (df['dmin'].max() - df['dmin'].min()))
-        
-        # Índice combinado (promedio ponderado)
-        df['monitoring_quality'] = (
-            0.4 * df['nst_norm'] + 
-            0.3 * df['gap_norm'] + 
-            0.3 * df['dmin_norm']
-        )
-    else:
-        df['monitoring_quality'] = 0.5  # Valor neutral si no hay datos
-    
-    # Calcular nivel de impacto (si existe CDI)
+    return apply_compact_schema(df)
+
+
+def column_extremes(df):
+    """
+    Calcula mínimo y máximo de las columnas de monitoreo presentes.
+    
+    Args:
+        df (pd.DataFrame): DataFrame o bloque
+        
+    Returns:
+        dict: {columna: [mínimo, máximo]}
+    """
+    return {
+        col: [float(df[col].min()), float(df[col].max())]
+        for col in MONITORING_COLUMNS if col in df.columns
+    }
+
+
+def merge_extremes(extremes, other):
+    """
+    Combina en `extremes` los mínimos y máximos de `other`.
+    
+    Args:
+        extremes (dict): Extremos acumulados (se modifica)
+        other (dict): Extremos de un nuevo bloque
+    """
+    for col, (lo, hi) in other.items():
+        if col not in extremes:
+            extremes[col] = [lo, hi]
+            continue
+        
+        current = extremes[col]
+        if lo < current[0] or (np.isnan(current[0]) and not np.isnan(lo)):
+            current[0] = lo
+        if hi > current[1] or (np.isnan(current[1]) and not np.isnan(hi)):
+            current[1] = hi
+
+
+def finalize_catalog(df):
+    """
+    Completa un catálogo preparado que se sirve en memoria (sin almacén).
+    
+    Restaura los tipos del esquema compacto (las partes pueden traer las
+    categorías en otro orden) y ordena por fecha si hace falta. Es
+    idempotente: sobre un catálogo ya completo no hace nada costoso.
+    
+    Args:
+        df (pd.DataFrame): Catálogo leído de la caché
+        
+    Returns:
+        pd.DataFrame: Catálogo listo para la aplicación
+    """
+    df = apply_compact_schema(df)
+    
+    if not df['Date'].is_monotonic_decreasing:
+        df = df.sort_values('Date', ascending=False)
+    
+    return df
+
+
+# ============================================================================
+# COLUMNAS DERIVADAS BAJO DEMANDA
+# ============================================================================
+# Se calculan sobre el catálogo completo la primera vez que una página o un
+# filtro las pide (utils/derived_columns.py) y quedan memorizadas.
+
+@derived_column('magnitude_category', requires=['magnitude'],
+                description='Categoría de magnitud')
+def _magnitude_category(df):
+    """Crear categorías de magnitud."""
+    return pd.cut(df['magnitude'], bins=MAGNITUDE_BINS, labels=MAGNITUDE_LABELS)
+
+
+@derived_column('depth_category', requires=['depth'],
+                description='Categoría de profundidad')
+def _depth_category(df):
+    """Crear categorías de profundidad."""
+    return pd.cut(df['depth'], bins=DEPTH_BINS, labels=DEPTH_LABELS)
+
+
+@derived_column('impact_level', description='Nivel de impacto en comunidades')
+def _impact_level(df):
+    """Calcular nivel de impacto (si existe CDI)."""
     if 'cdi' in df.columns:
-        df['impact_level'] = df['cdi'].fillna(0)
-    else:
-        df['impact_level'] = 0
+        return df['cdi'].fillna(0).astype('float32')
+    return pd.Series(0, index=df.index, dtype='float32')
+
+
+def _normalized(df, col):
+    """
+    Normaliza una columna de monitoreo a 0-1 con los extremos del catálogo.
     
-    # Ordenar por fecha descendente
-    df = df.sort_values('Date', ascending=False)
+    Usa los extremos guardados en `df.attrs` (mantenidos por la ingesta
+    incremental) y solo recorre la columna si no están disponibles.
+    """
+    extremes = df.attrs.get('extremes', {}).get(col)
+    lo, hi = extremes if extremes else (df[col].min(), df[col].max())
+    return ((df[col] - lo) / (hi - lo)).astype('float32')
+
+
+@derived_column('nst_norm', requires=['nst'])
+def _nst_norm(df):
+    """Número de estaciones normalizado (más es mejor)."""
+    return _normalized(df, 'nst')
+
+
+@derived_column('gap_norm', requires=['gap'])
+def _gap_norm(df):
+    """Brecha azimutal normalizada e invertida (menos es mejor)."""
+    return (1 - _normalized(df, 'gap')).astype('float32')
+
+
+@derived_column('dmin_norm', requires=['dmin'])
+def _dmin_norm(df):
+    """Distancia mínima normalizada e invertida (menos es mejor)."""
+    return (1 - _normalized(df, 'dmin')).astype('float32')
+
+
+@derived_column('monitoring_quality', description='Índice de calidad de monitoreo (0-1)')
+def _monitoring_quality(df):
+    """Índice combinado (promedio ponderado), o 0.5 si no hay datos."""
+    if not all(col in df.columns for col in MONITORING_COLUMNS):
+        return pd.Series(0.5, index=df.index, dtype='float32')  # Valor neutral
+    
+    return (
+        0.4 * get_derived(df, 'nst_norm') + 
+        0.3 * get_derived(df, 'gap_norm') + 
+        0.3 * get_derived(df, 'dmin_norm')
+    ).astype('float32')
+
+
+@derived_column('is_mainshock', requires=['latitude', 'longitude', 'magnitude', 'Year', 'Month'],
+                description='Evento principal (no es réplica ni premonitor)')
+def _is_mainshock(df):
+    """Declustering de Gardner-Knopoff (ver utils/declustering.py)."""
+    mainshock = decluster(df)
+    return pd.Series(mainshock == np.arange(len(df)), index=df.index)
+
+
+# ============================================================================
+# ESQUEMA COMPACTO
+# ============================================================================
+
+def apply_compact_schema(df, schema=COMPACT_SCHEMA):
+    """
+    Convierte las columnas presentes a los tipos compactos del esquema.
+    
+    Las columnas enteras con valores faltantes se guardan como float32,
+    ya que los enteros de NumPy no admiten NaN.
+    
+    Args:
+        df (pd.DataFrame): DataFrame preparado
+        schema (dict): {columna: dtype}
+        
+    Returns:
+        pd.DataFrame: DataFrame con tipos compactos
+    """
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        
+        target = pd.api.types.pandas_dtype(dtype)
+        if target.kind in 'iu' and df[col].isna().any():
+            target = np.dtype('float32')
+        
+        if df[col].dtype != target:
+            df[col] = df[col].astype(target)
     
     return df
 
 
+def memory_report(df):
+    """
+    Genera un informe de uso de memoria por columna.
+    
+    Args:
+        df (pd.DataFrame): DataFrame a analizar
+        
+    Returns:
+        pd.DataFrame: Tipo, bytes, MB y porcentaje del total por columna,
+            ordenado de mayor a menor consumo
+    """
+    usage = df.memory_usage(deep=True, index=False)
+    total = usage.sum()
+    
+    report = pd.DataFrame({
+        'dtype': df.dtypes.astype(str),
+        'bytes': usage,
+        'MB': usage / (1024 ** 2),
+        '% del total': (usage / total * 100) if total else 0.0,
+    })
+    report.index.name = 'columna'
+    
+    return report.sort_values('bytes', ascending=False)
+
+
 # ============================================================================
 # INFORMACIÓN DEL DATASET
 # ============================================================================
@@ -189,6 +892,7 @@ def get_variable_descriptions():
         'high_mag': 'Magnitud alta (≥ 7.0)',
         'oceanic_event': 'Evento oceánico (dmin > 5°)',
         'monitoring_quality': 'Índice de calidad de monitoreo (0-1)',
+        'is_mainshock': 'Evento principal (no es réplica ni premonitor)',
         'impact_level': 'Nivel de impacto en comunidades',
     }
     
@@ -0,0 +1,323 @@
+"""
+Declustering
+============
+
+Separación de eventos principales y réplicas con ventanas espacio-temporales
+de Gardner y Knopoff (1974).
+
+Los eventos se recorren de mayor a menor magnitud: cada evento aún sin
+asignar es un evento principal, y los eventos sin asignar dentro de su
+ventana (distancia L(M) y tiempo T(M) posteriores, o anteriores para las
+premonitoras) pasan a ser sus réplicas.
+
+Para no comparar todos los pares (O(n²)), los eventos se ordenan por celda
+de la rejilla lat/lon (GRID_CELL_DEGREES, como el índice de
+utils/indexes.py) y por mes. En cada celda que toca el círculo de un evento,
+las candidatas de su ventana de tiempo son una porción contigua de ese orden
+que se obtiene con dos búsquedas binarias; solo sobre esas filas se calculan
+distancias. Las búsquedas y distancias de todos los eventos se resuelven a
+la vez, por lotes.
+
+El recorrido voraz se resuelve después por rondas sobre los pares
+obtenidos: un evento es principal si ningún evento principal anterior en
+el recorrido lo contiene en su ventana, y cada réplica pertenece al primero
+de ellos. Cada ronda decide al menos el primer evento pendiente, y en la
+práctica bastan unas pocas.
+
+El catálogo solo tiene año y mes, así que los tiempos se miden en meses y
+los eventos del mismo mes se consideran simultáneos.
+"""
+
+import numpy as np
+
+from utils.indexes import GRID_CELL_DEGREES
+
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+# Radio medio de la Tierra (km)
+EARTH_RADIUS_KM = 6371.0
+
+# Kilómetros por grado de latitud
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+
+# Días por mes (medio)
+DAYS_PER_MONTH = 365.25 / 12
+
+# Fracción de la ventana de tiempo que se aplica antes del evento principal
+# (premonitoras); 0 solo marca réplicas posteriores
+FORESHOCK_TIME_FRACTION = 1.0
+
+# Filas y columnas de la rejilla lat/lon
+GRID_ROWS = int(round(180 / GRID_CELL_DEGREES))
+GRID_COLUMNS = int(round(360 / GRID_CELL_DEGREES))
+
+# Pares candidatos que se expanden a la vez (acota la memoria)
+PAIR_BATCH = 1 << 21
+
+# Estados del recorrido voraz
+PENDING, MAINSHOCK, AFTERSHOCK = 0, 1, 2
+
+
+# ============================================================================
+# VENTANAS
+# ============================================================================
+
+def gardner_knopoff_windows(magnitude):
+    """
+    Ventanas de Gardner-Knopoff para cada magnitud.
+
+    Args:
+        magnitude (np.ndarray): Magnitudes
+
+    Returns:
+        tuple: (distancia en km, tiempo en días)
+    """
+    magnitude = np.asarray(magnitude, dtype=np.float64)
+    distance_km = 10 ** (0.1238 * magnitude + 0.983)
+    time_days = np.where(
+        magnitude >= 6.5,
+        10 ** (0.032 * magnitude + 2.7389),
+        10 ** (0.5409 * magnitude - 0.547)
+    )
+    return distance_km, time_days
+
+
+def haversine_km(lat, lon, lats, lons):
+    """
+    Distancia de círculo máximo entre un punto y varios puntos (o entre
+    pares de puntos, si `lat` y `lon` también son arrays).
+
+    Args:
+        lat, lon (float o np.ndarray): Punto(s) de referencia (grados)
+        lats, lons (np.ndarray): Puntos (grados)
+
+    Returns:
+        np.ndarray: Distancias en km
+    """
+    lat, lon, lats, lons = (np.radians(value) for value in (lat, lon, lats, lons))
+    a = (np.sin((lats - lat) / 2) ** 2
+         + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+# ============================================================================
+# DECLUSTERING
+# ============================================================================
+
+def decluster(df):
+    """
+    Asigna cada evento del catálogo a un grupo (evento principal + réplicas).
+
+    Equivale a recorrer los eventos de mayor a menor magnitud (a igual
+    magnitud, primero el más antiguo) asignando a cada evento principal los
+    eventos aún libres de su ventana. Los eventos sin magnitud, posición o
+    fecha quedan como eventos principales de su propio grupo.
+
+    Args:
+        df (pd.DataFrame): Catálogo completo ('latitude', 'longitude',
+            'magnitude', 'Year', 'Month')
+
+    Returns:
+        np.ndarray: Posición del evento principal de cada fila (igual a la
+            propia posición para los eventos principales)
+    """
+    latitude = df['latitude'].to_numpy(dtype=np.float64)
+    longitude = df['longitude'].to_numpy(dtype=np.float64)
+    magnitude = df['magnitude'].to_numpy(dtype=np.float64)
+    months = df['Year'].to_numpy(dtype=np.float64) * 12 + df['Month'].to_numpy(dtype=np.float64)
+
+    mainshock = np.arange(len(df))
+    valid = ~(np.isnan(latitude) | np.isnan(longitude) | np.isnan(magnitude) | np.isnan(months))
+    events = np.flatnonzero(valid)
+    if len(events) == 0:
+        return mainshock
+
+    latitude, longitude, magnitude, months = (
+        values[events] for values in (latitude, longitude, magnitude, months)
+    )
+
+    # Rango de cada evento en el recorrido voraz
+    rank = np.empty(len(events), dtype=np.int64)
+    rank[np.lexsort((months, -magnitude))] = np.arange(len(events))
+
+    # A partir de aquí, los eventos van en el orden de la rejilla (celda y mes)
+    by_key = np.argsort(_grid_keys(latitude, longitude, months)[0], kind='stable')
+    events, latitude, longitude, magnitude, months, rank = (
+        values[by_key] for values in (events, latitude, longitude, magnitude, months, rank)
+    )
+    order = np.empty(len(events), dtype=np.int64)
+    order[rank] = np.arange(len(events))
+
+    distance_km, time_days = gardner_knopoff_windows(magnitude)
+    after = time_days / DAYS_PER_MONTH
+    before = after * FORESHOCK_TIME_FRACTION
+
+    src, dst = _window_pairs(latitude, longitude, months, distance_km, before, after, rank)
+    mainshock[events] = events[_resolve_groups(src, dst, rank, order)]
+    return mainshock
+
+
+def _grid_keys(latitude, longitude, months):
+    """
+    Clave (celda de la rejilla, mes) de cada evento.
+
+    Returns:
+        tuple: (claves, primer mes, número de meses)
+    """
+    first_month = np.floor(months.min())
+    month_bins = (np.floor(months) - first_month).astype(np.int64)
+    span = int(month_bins.max()) + 1
+    cell_rows = np.clip(np.floor((latitude + 90) / GRID_CELL_DEGREES), 0, GRID_ROWS - 1).astype(np.int64)
+    cell_cols = np.floor((longitude + 180) / GRID_CELL_DEGREES).astype(np.int64) % GRID_COLUMNS
+    return (cell_rows * GRID_COLUMNS + cell_cols) * span + month_bins, first_month, span
+
+
+def _window_pairs(latitude, longitude, months, distance_km, before, after, rank):
+    """
+    Pares (evento, evento de su ventana posterior en el recorrido).
+
+    Los eventos llegan en el orden de _grid_keys, así que las candidatas de
+    cada celda y ventana de tiempo son filas contiguas.
+
+    Args:
+        latitude, longitude, months (np.ndarray): Eventos válidos
+        distance_km, before, after (np.ndarray): Ventana de cada evento
+            (km y meses antes y después)
+        rank (np.ndarray): Posición de cada evento en el recorrido
+
+    Returns:
+        tuple: (src, dst) posiciones de los pares
+    """
+    keys, first_month, span = _grid_keys(latitude, longitude, months)
+
+    # Meses de cada ventana (un mes de margen: el filtro exacto va después)
+    month_lo = np.clip(np.floor(months - before) - first_month - 1, 0, span - 1).astype(np.int64)
+    month_hi = np.clip(np.floor(months + after) - first_month + 1, 0, span - 1).astype(np.int64)
+
+    row_lo, row_hi, col_lo, width = _cell_ranges(latitude, longitude, distance_km)
+    height = row_hi - row_lo + 1
+
+    # Porciones de cada celda tocada; se recorren los desplazamientos de
+    # columna y fila y solo participan los eventos que los alcanzan. Dentro
+    # de cada ancho, los eventos siguen en orden de celda y mes: las
+    # búsquedas binarias avanzan casi en orden y no saltan por todo `keys`.
+    owners, starts, counts = [], [], []
+    by_width = np.argsort(-width, kind='stable')
+    sorted_width = -width[by_width]
+    for dx in range(int(width.max())):
+        reach = by_width[:np.searchsorted(sorted_width, -dx, side='left')]
+        for dy in range(int(height[reach].max())):
+            k = reach[height[reach] > dy]
+            cells = (row_lo[k] + dy) * GRID_COLUMNS + (col_lo[k] + dx) % GRID_COLUMNS
+            start = np.searchsorted(keys, cells * span + month_lo[k], side='left')
+            end = np.searchsorted(keys, cells * span + month_hi[k], side='right')
+            nonempty = end > start
+            owners.append(k[nonempty])
+            starts.append(start[nonempty])
+            counts.append((end - start)[nonempty])
+
+    owners, starts, counts = (np.concatenate(values) for values in (owners, starts, counts))
+
+    # Expansión por lotes de PAIR_BATCH candidatas y filtro exacto
+    src, dst = [], []
+    cumulative = np.cumsum(counts)
+    total = int(cumulative[-1]) if len(counts) else 0
+    bounds = np.searchsorted(cumulative, np.arange(PAIR_BATCH, total, PAIR_BATCH))
+    for batch in np.split(np.arange(len(counts)), bounds):
+        if len(batch) == 0:
+            continue
+        n_pairs = counts[batch]
+        offsets = np.arange(n_pairs.sum()) - np.repeat(np.cumsum(n_pairs) - n_pairs, n_pairs)
+        event = np.repeat(owners[batch], n_pairs)
+        other = np.repeat(starts[batch], n_pairs) + offsets
+
+        delta = months[other] - months[event]
+        keep = (rank[other] > rank[event]) & (delta >= -before[event]) & (delta <= after[event])
+        event, other = event[keep], other[keep]
+        near = haversine_km(latitude[event], longitude[event], latitude[other], longitude[other]) \
+            <= distance_km[event]
+        src.append(event[near])
+        dst.append(other[near])
+
+    if not src:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(src), np.concatenate(dst)
+
+
+def _cell_ranges(latitude, longitude, distance_km):
+    """
+    Celdas de la rejilla que contienen el círculo de cada evento.
+
+    Cerca de los polos el círculo abarca todas las longitudes.
+
+    Returns:
+        tuple: (fila inicial, fila final, columna inicial, número de
+            columnas); las columnas se cuentan módulo GRID_COLUMNS
+    """
+    delta_lat = distance_km / KM_PER_DEGREE
+    south = np.maximum(latitude - delta_lat, -90.0)
+    north = np.minimum(latitude + delta_lat, 90.0)
+    row_lo = np.clip(np.floor((south + 90) / GRID_CELL_DEGREES), 0, GRID_ROWS - 1).astype(np.int64)
+    row_hi = np.clip(np.floor((north + 90) / GRID_CELL_DEGREES), 0, GRID_ROWS - 1).astype(np.int64)
+
+    cos_lat = np.cos(np.radians(np.maximum(np.abs(south), np.abs(north))))
+    polar = (north >= 90.0) | (south <= -90.0) | (delta_lat >= 180 * cos_lat)
+    with np.errstate(divide='ignore'):
+        delta_lon = np.where(polar, 180.0, delta_lat / cos_lat)
+    col_lo = np.floor((longitude - delta_lon + 180) / GRID_CELL_DEGREES).astype(np.int64)
+    col_hi = np.floor((longitude + delta_lon + 180) / GRID_CELL_DEGREES).astype(np.int64)
+
+    width = col_hi - col_lo + 1
+    everywhere = polar | (width >= GRID_COLUMNS)
+    col_lo = np.where(everywhere, 0, col_lo % GRID_COLUMNS)
+    width = np.where(everywhere, GRID_COLUMNS, width)
+    return row_lo, row_hi, col_lo, width
+
+
+def _resolve_groups(src, dst, rank, order):
+    """
+    Resuelve el recorrido voraz sobre los pares de ventanas.
+
+    Un evento es principal si ningún evento principal anterior lo contiene
+    en su ventana; si no, es réplica del primero (en el recorrido) que lo
+    contiene. Se decide por rondas: en cada una, los eventos pendientes con
+    algún principal que los contiene pasan a réplicas y los que ya no
+    dependen de ningún pendiente, a principales.
+
+    Args:
+        src, dst (np.ndarray): Pares (evento, evento de su ventana)
+        rank (np.ndarray): Posición de cada evento en el recorrido
+        order (np.ndarray): Evento en cada posición del recorrido
+
+    Returns:
+        np.ndarray: Evento principal de cada evento
+    """
+    n_events = len(rank)
+    status = np.where(np.bincount(dst, minlength=n_events) > 0, PENDING, MAINSHOCK)
+
+    pending_src, pending_dst = src, dst
+    while len(pending_dst):
+        source_status = status[pending_src]
+        claimed = np.zeros(n_events, dtype=bool)
+        claimed[pending_dst[source_status == MAINSHOCK]] = True
+        blocked = np.zeros(n_events, dtype=bool)
+        blocked[pending_dst[source_status == PENDING]] = True
+
+        status[pending_dst[claimed[pending_dst]]] = AFTERSHOCK
+        status[pending_dst[~claimed[pending_dst] & ~blocked[pending_dst]]] = MAINSHOCK
+
+        still = status[pending_dst] == PENDING
+        pending_src, pending_dst = pending_src[still], pending_dst[still]
+
+    # Cada réplica, al principal de menor rango que la contiene
+    first = np.full(n_events, n_events, dtype=np.int64)
+    claims = (status[src] == MAINSHOCK) & (status[dst] == AFTERSHOCK)
+    np.minimum.at(first, dst[claims], rank[src[claims]])
+
+    group = np.arange(n_events)
+    aftershocks = status == AFTERSHOCK
+    group[aftershocks] = order[first[aftershocks]]
+    return group
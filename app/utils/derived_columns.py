@@ -0,0 +1,143 @@
+"""
+Derived Columns
+===============
+
+Registro de columnas derivadas que se calculan bajo demanda.
+Cada columna se declara con un decorador y solo se materializa la primera
+vez que alguien la pide; el resultado se memoriza por catálogo, así que
+las columnas costosas no retrasan el arranque si ninguna página las usa.
+"""
+
+import threading
+import weakref
+
+import pandas as pd
+
+
+# ============================================================================
+# REGISTRO
+# ============================================================================
+
+# {nombre: {'func', 'requires', 'description'}}
+DERIVED_COLUMNS = {}
+
+# Columnas ya calculadas: {id(catálogo): {nombre: pd.Series}}
+_materialized = {}
+
+# Reentrante: una columna puede pedir otras columnas derivadas
+_lock = threading.RLock()
+
+
+def derived_column(name, requires=(), description=None):
+    """
+    Decorador que registra una función como columna derivada.
+
+    La función recibe el catálogo completo y retorna una Serie alineada
+    con su índice. Para depender de otra columna derivada debe usar
+    `get_derived(catalog, nombre)`.
+
+    Args:
+        name (str): Nombre de la columna
+        requires (list): Columnas originales necesarias; si falta alguna,
+            la columna no está disponible para ese catálogo
+        description (str): Descripción breve (opcional)
+
+    Returns:
+        callable: Decorador
+    """
+    def decorator(func):
+        DERIVED_COLUMNS[name] = {
+            'func': func,
+            'requires': list(requires),
+            'description': description,
+        }
+        return func
+    return decorator
+
+
+def is_available(catalog, name):
+    """
+    Indica si una columna puede obtenerse para un catálogo.
+
+    Args:
+        catalog (pd.DataFrame): Catálogo completo
+        name (str): Nombre de la columna
+
+    Returns:
+        bool: True si ya existe o si sus columnas requeridas están presentes
+    """
+    if name in catalog.columns:
+        return True
+    spec = DERIVED_COLUMNS.get(name)
+    return spec is not None and all(col in catalog.columns for col in spec['requires'])
+
+
+# ============================================================================
+# MATERIALIZACIÓN
+# ============================================================================
+
+def _memo_for(catalog):
+    """Retorna el diccionario de columnas calculadas para un catálogo."""
+    key = id(catalog)
+    if key not in _materialized:
+        _materialized[key] = {}
+        # Liberar la memoria cuando el catálogo deje de existir
+        weakref.finalize(catalog, _materialized.pop, key, None)
+    return _materialized[key]
+
+
+def get_derived(catalog, name):
+    """
+    Retorna una columna del catálogo, calculándola la primera vez.
+
+    El catálogo no se modifica (puede ser de solo lectura y compartido
+    entre sesiones): la columna calculada se guarda aparte.
+
+    Args:
+        catalog (pd.DataFrame): Catálogo completo
+        name (str): Nombre de la columna
+
+    Returns:
+        pd.Series: Columna alineada con el índice del catálogo
+    """
+    if name in catalog.columns:
+        return catalog[name]
+
+    with _lock:
+        memo = _memo_for(catalog)
+        if name not in memo:
+            memo[name] = DERIVED_COLUMNS[name]['func'](catalog)
+        return memo[name]
+
+
+def with_derived_columns(df, catalog, names):
+    """
+    Añade a un DataFrame (p. ej. ya filtrado) las columnas derivadas pedidas.
+
+    Las columnas se calculan sobre el catálogo completo, de modo que las
+    normalizaciones globales no dependen del filtro, y se alinean por
+    índice con `df`. Las columnas no disponibles se omiten. Las columnas de
+    `df` no se copian (puede ser el catálogo mapeado en memoria): el
+    resultado comparte sus datos y es igual de solo lectura.
+
+    Args:
+        df (pd.DataFrame): Subconjunto del catálogo
+        catalog (pd.DataFrame): Catálogo completo
+        names (list): Columnas derivadas a añadir
+
+    Returns:
+        pd.DataFrame: Nuevo DataFrame con las columnas añadidas (el propio
+            `df` si no falta ninguna)
+    """
+    missing = [
+        name for name in names
+        if name not in df.columns and is_available(catalog, name)
+    ]
+    if not missing:
+        return df
+
+    data = {col: df[col] for col in df.columns}
+    data.update((name, get_derived(catalog, name)) for name in missing)
+    augmented = pd.DataFrame(data, index=df.index, copy=False)
+    augmented.attrs.update(df.attrs)
+    return augmented
@@ -0,0 +1,470 @@
+"""
+Filter Engine
+=============
+
+Motor de filtrado del catálogo, separado de los widgets.
+El estado de los filtros es un diccionario plano (ver DEFAULT_FILTER_STATE);
+`filter_rows` lo convierte en las posiciones de las filas que cumplen todos
+los predicados, usando índices ordenados para los rangos numéricos y bitmaps
+empaquetados para los predicados de baja cardinalidad, y `filter_catalog`
+selecciona las filas resultantes una sola vez, sin DataFrames intermedios.
+`count_filtered` responde los conteos sin seleccionar ninguna fila.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from functools import partial
+
+import numpy as np
+
+from utils.derived_columns import get_derived, is_available
+from utils.fingerprint import get_fingerprint
+from utils.indexes import (
+    bitmap_and,
+    bitmap_rows,
+    category_bitmap,
+    get_bitmap,
+    get_range_index,
+    popcount,
+    range_bounds,
+    range_rows,
+    test_rows,
+)
+from utils.regions import region_rows
+
+
+# ============================================================================
+# ESTADO DE LOS FILTROS
+# ============================================================================
+
+# Hemisferios seleccionables en el filtro de región
+HEMISPHERES = ["Norte", "Sur", "Este", "Oeste"]
+
+# Filtros por categoría: clave del estado -> columna (derivada) categórica
+CATEGORY_FILTERS = {
+    'magnitude_categories': 'magnitude_category',
+    'depth_categories': 'depth_category',
+}
+
+# Estado sin restricciones. Los rangos son tuplas (mínimo, máximo) inclusivas;
+# None significa "sin filtro". La región es un rectángulo o polígono de
+# utils/regions.py.
+DEFAULT_FILTER_STATE = {
+    'year_range': None,
+    'mag_range': None,
+    'max_depth': None,
+    'tsunami': None,
+    'hemispheres': list(HEMISPHERES),
+    'region': None,
+    'magnitude_categories': None,
+    'depth_categories': None,
+    'min_sig': None,
+    'shallow_only': False,
+    'high_mag_only': False,
+    'mainshock_only': False,
+}
+
+
+# Presupuesto de memoria de la caché de resultados (MB), configurable
+FILTER_CACHE_BUDGET_MB = float(os.environ.get('EQ_FILTER_CACHE_MB', 64))
+
+# Resultados recientes: {(huella, estado canónico): posiciones}, del menos
+# al más recientemente usado. Compartidos por todas las sesiones del proceso.
+_results = OrderedDict()
+_results_bytes = 0
+_results_lock = threading.Lock()
+
+# Contadores de la caché de resultados
+FILTER_CACHE_STATS = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+# ============================================================================
+# PREDICADOS
+# ============================================================================
+
+def range_predicates(df, state):
+    """
+    Traduce los filtros numéricos del estado a predicados de rango.
+    
+    Args:
+        df (pd.DataFrame): Catálogo completo
+        state (dict): Estado de los filtros
+        
+    Returns:
+        list: Tuplas (columna, mínimo inclusivo o None, máximo o None,
+            máximo inclusivo), con los límites ya en el tipo de la columna
+    """
+    predicates = []
+    
+    def add(column, lo=None, hi=None, hi_inclusive=True):
+        predicates.append((
+            column,
+            None if lo is None else as_column_type(df, column, lo),
+            None if hi is None else as_column_type(df, column, hi),
+            hi_inclusive,
+        ))
+    
+    if state.get('year_range') is not None:
+        add('Year', *state['year_range'])
+    if state.get('mag_range') is not None:
+        add('magnitude', *state['mag_range'])
+    if state.get('max_depth') is not None:
+        add('depth', hi=state['max_depth'])
+    if state.get('min_sig') is not None and 'sig' in df.columns:
+        add('sig', lo=state['min_sig'])
+    
+    return predicates
+
+
+def bitmap_predicates(df, state):
+    """
+    Traduce los filtros de baja cardinalidad del estado a bitmaps.
+    
+    Cada bitmap se construye una vez por versión del catálogo
+    (utils/indexes.py); las selecciones múltiples se combinan con OR.
+    
+    Args:
+        df (pd.DataFrame): Catálogo completo
+        state (dict): Estado de los filtros
+        
+    Returns:
+        list: Bitmaps empaquetados que deben cumplirse todos (AND)
+    """
+    bitmaps = []
+    
+    def flag(name, condition):
+        bitmaps.append(get_bitmap(df, name, condition))
+    
+    if state.get('tsunami') is not None:
+        value = state['tsunami']
+        flag(('tsunami', value), lambda d: d['tsunami'].to_numpy() == value)
+    
+    hemispheres = state.get('hemispheres', HEMISPHERES)
+    if "Norte" not in hemispheres:
+        flag('south', lambda d: d['latitude'].to_numpy() < 0)
+    if "Sur" not in hemispheres:
+        flag('north', lambda d: d['latitude'].to_numpy() >= 0)
+    if "Este" not in hemispheres:
+        flag('west', lambda d: d['longitude'].to_numpy() < 0)
+    if "Oeste" not in hemispheres:
+        flag('east', lambda d: d['longitude'].to_numpy() >= 0)
+    
+    if state.get('shallow_only'):
+        flag('is_shallow', lambda d: d['is_shallow'].to_numpy().astype(bool))
+    if state.get('high_mag_only'):
+        flag('high_mag', lambda d: d['high_mag'].to_numpy().astype(bool))
+    if state.get('mainshock_only') and is_available(df, 'is_mainshock'):
+        flag('is_mainshock', lambda d: get_derived(d, 'is_mainshock').to_numpy())
+    
+    for key, column in CATEGORY_FILTERS.items():
+        categories = state.get(key)
+        if categories and is_available(df, column):
+            bitmaps.append(category_bitmap(df, column, get_derived(df, column), categories))
+    
+    return bitmaps
+
+
+def tsunami_bitmap(df):
+    """Retorna el bitmap de los eventos con tsunami."""
+    return get_bitmap(df, ('tsunami', 1), lambda d: d['tsunami'].to_numpy() == 1)
+
+
+# ============================================================================
+# SELECCIÓN DE FILAS
+# ============================================================================
+
+def _plan(df, state):
+    """
+    Resuelve los filtros en una selección sin materializar filas.
+    
+    Se cuenta con búsqueda binaria cuántas filas deja cada predicado de
+    rango (y la región, con el índice de rejilla) y se toman las del más
+    selectivo como candidatas; los predicados que no excluyen ninguna fila
+    (p. ej. un slider en su rango completo) se omiten. Los predicados de
+    baja cardinalidad se combinan en un bitmap.
+    
+    Returns:
+        tuple: (posiciones candidatas o None si no hay rangos ni región,
+            pruebas restantes sobre las candidatas, bitmap combinado o None)
+    """
+    n_rows = len(df)
+    
+    # Fuentes de candidatas: (filas que deja, posiciones, prueba por fila)
+    sources = []
+    for column, lo, hi, hi_inclusive in range_predicates(df, state):
+        index = get_range_index(df, column)
+        start, end = range_bounds(index, lo, hi, hi_inclusive)
+        if end - start < n_rows:
+            sources.append((
+                end - start,
+                partial(range_rows, index, start, end),
+                partial(_in_range, df[column].to_numpy(), lo, hi, hi_inclusive),
+            ))
+    
+    if state.get('region') is not None:
+        inside = region_rows(df, state['region'])
+        if len(inside) < n_rows:
+            sources.append((len(inside), lambda: inside, partial(_in_rows, inside)))
+    
+    bitmaps = bitmap_predicates(df, state)
+    bitmap = bitmap_and(bitmaps) if bitmaps else None
+    
+    if not sources:
+        return None, [], bitmap
+    
+    # Filas candidatas: las de la fuente más selectiva
+    sources.sort(key=lambda source: source[0])
+    rows = sources[0][1]()
+    return rows, [check for _, _, check in sources[1:]], bitmap
+
+
+def filter_rows(df, state):
+    """
+    Calcula las posiciones de las filas que cumplen todos los filtros.
+    
+    Los rangos numéricos y la región se resuelven con índices, partiendo
+    del más selectivo, y el resto de predicados se evalúan solo sobre esas
+    filas candidatas, de modo que el coste depende del tamaño del resultado
+    y no del catálogo. Sin rangos ni región activos, las filas salen
+    directamente del bitmap combinado.
+    
+    Args:
+        df (pd.DataFrame): Catálogo completo
+        state (dict): Estado de los filtros (ver DEFAULT_FILTER_STATE)
+        
+    Returns:
+        np.ndarray: Posiciones de las filas seleccionadas, en orden ascendente
+    """
+    return _resolve(df, *_plan(df, state))
+
+
+def _resolve(df, rows, checks, bitmap):
+    """Aplica a las filas candidatas los predicados restantes (ver _plan)."""
+    if rows is None:
+        if bitmap is None:
+            return np.arange(len(df))
+        return bitmap_rows(bitmap, len(df))
+    
+    keep = np.ones(len(rows), dtype=bool)
+    for check in checks:
+        np.logical_and(keep, check(rows), out=keep)
+    if bitmap is not None:
+        np.logical_and(keep, test_rows(bitmap, rows), out=keep)
+    
+    return rows[keep]
+
+
+def _in_range(values, lo, hi, hi_inclusive, rows):
+    """Prueba un predicado de rango solo sobre unas filas."""
+    values = values[rows]
+    keep = np.ones(len(rows), dtype=bool)
+    if lo is not None:
+        np.logical_and(keep, values >= lo, out=keep)
+    if hi is not None:
+        np.logical_and(keep, values <= hi if hi_inclusive else values < hi, out=keep)
+    return keep
+
+
+def _in_rows(selected, rows):
+    """Indica qué filas están en `selected` (posiciones ascendentes)."""
+    if len(selected) == 0:
+        return np.zeros(len(rows), dtype=bool)
+    positions = np.minimum(np.searchsorted(selected, rows), len(selected) - 1)
+    return selected[positions] == rows
+
+
+def count_filtered(df, state):
+    """
+    Cuenta los eventos y tsunamis que dejan los filtros, sin construir el
+    DataFrame filtrado.
+    
+    Si las posiciones ya están en la caché de resultados se cuentan
+    directamente. Si no, sin rangos ni región activos basta un popcount del
+    bitmap combinado (y de su AND con el de tsunamis); con ellos se
+    consultan los bits de las filas seleccionadas.
+    
+    Args:
+        df (pd.DataFrame): Catálogo completo
+        state (dict): Estado de los filtros (ver DEFAULT_FILTER_STATE)
+        
+    Returns:
+        tuple: (eventos, eventos con tsunami)
+    """
+    tsunamis = tsunami_bitmap(df)
+    
+    # Un resultado ya calculado evita planificar (y recorrer la región)
+    key = (get_fingerprint(df), canonical_state(state))
+    rows = _lookup_rows(key, record=False)
+    if rows is None:
+        rows, checks, bitmap = _plan(df, state)
+        if rows is None:
+            if bitmap is None:
+                return len(df), popcount(tsunamis)
+            return popcount(bitmap), popcount(bitmap_and([bitmap, tsunamis]))
+        rows = _store_rows(key, _resolve(df, rows, checks, bitmap))
+    
+    return len(rows), int(test_rows(tsunamis, rows).sum())
+
+
+def filter_catalog(df, state):
+    """
+    Retorna las filas del catálogo que cumplen los filtros.
+    
+    Si ningún filtro excluye filas se devuelve el propio catálogo, sin
+    copiarlo (es de solo lectura); en otro caso se seleccionan las filas
+    una sola vez. Las posiciones se reutilizan de la caché de resultados
+    si la misma combinación de filtros ya se calculó.
+    
+    Args:
+        df (pd.DataFrame): Catálogo completo
+        state (dict): Estado de los filtros (ver DEFAULT_FILTER_STATE)
+        
+    Returns:
+        pd.DataFrame: Catálogo filtrado, con el índice original
+    """
+    return select_rows(df, cached_filter_rows(df, state))
+
+
+def select_rows(df, rows):
+    """
+    Selecciona filas por posición con una única copia.
+    
+    Args:
+        df (pd.DataFrame): Catálogo completo
+        rows (np.ndarray): Posiciones ascendentes de las filas
+        
+    Returns:
+        pd.DataFrame: Filas seleccionadas (el propio `df` si son todas)
+    """
+    if len(rows) == len(df):
+        return df
+    return df.take(rows)
+
+
+# ============================================================================
+# CACHÉ DE RESULTADOS
+# ============================================================================
+
+def canonical_state(state):
+    """
+    Convierte un estado de filtros en una tupla hasheable y canónica.
+    
+    Dos estados equivalentes (p. ej. los mismos hemisferios en otro orden,
+    o claves omitidas con su valor por defecto) producen la misma tupla.
+    
+    Args:
+        state (dict): Estado de los filtros
+        
+    Returns:
+        tuple: Pares (clave, valor) ordenados por clave
+    """
+    def canonical(key, value):
+        if key in ('hemispheres',) + tuple(CATEGORY_FILTERS):
+            return None if value is None else tuple(sorted(value))
+        if isinstance(value, (list, tuple)):
+            return tuple(_plain(item) for item in value)
+        return _plain(value)
+    
+    full = dict(DEFAULT_FILTER_STATE, **state)
+    return tuple((key, canonical(key, full[key])) for key in sorted(full))
+
+
+def _plain(value):
+    """Convierte escalares NumPy en tipos de Python."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def cached_filter_rows(df, state):
+    """
+    Retorna las posiciones filtradas, reutilizando resultados anteriores.
+    
+    La clave es la huella del catálogo más el estado canónico, de modo que
+    cambiar de página o repetir una combinación de filtros (también desde
+    otra sesión) no vuelve a filtrar.
+    
+    Args:
+        df (pd.DataFrame): Catálogo completo
+        state (dict): Estado de los filtros
+        
+    Returns:
+        np.ndarray: Posiciones de las filas (de solo lectura)
+    """
+    return _cached_rows(df, state, lambda: filter_rows(df, state))
+
+
+def _cached_rows(df, state, compute, record=True):
+    """
+    Busca un resultado en la caché LRU o lo calcula y lo guarda.
+    
+    `record=False` no altera los contadores (consultas internas del mismo
+    rerun).
+    """
+    key = (get_fingerprint(df), canonical_state(state))
+    rows = _lookup_rows(key, record)
+    if rows is None:
+        rows = _store_rows(key, compute())
+    return rows
+
+
+def _lookup_rows(key, record=True):
+    """Resultado guardado para una clave (None si no está)."""
+    with _results_lock:
+        rows = _results.get(key)
+        if rows is not None:
+            _results.move_to_end(key)
+        if record:
+            FILTER_CACHE_STATS['hits' if rows is not None else 'misses'] += 1
+    return rows
+
+
+def _store_rows(key, rows):
+    """
+    Guarda un resultado en la caché LRU.
+    
+    Al superar el presupuesto de memoria se descartan los resultados usados
+    hace más tiempo.
+    """
+    global _results_bytes
+    
+    rows.setflags(write=False)
+    
+    budget = FILTER_CACHE_BUDGET_MB * 1024 * 1024
+    if rows.nbytes > budget:
+        return rows
+    
+    with _results_lock:
+        if key not in _results:
+            _results[key] = rows
+            _results_bytes += rows.nbytes
+        while _results_bytes > budget:
+            _, evicted = _results.popitem(last=False)
+            _results_bytes -= evicted.nbytes
+            FILTER_CACHE_STATS['evictions'] += 1
+    return rows
+
+
+def get_filter_cache_stats():
+    """
+    Retorna los contadores y el tamaño de la caché de resultados.
+    
+    Returns:
+        dict: Aciertos ('hits'), fallos ('misses'), descartes ('evictions'),
+            número de resultados ('entries') y memoria usada ('bytes')
+    """
+    with _results_lock:
+        return dict(FILTER_CACHE_STATS, entries=len(_results), bytes=_results_bytes)
+
+
+# ============================================================================
+# FUNCIONES AUXILIARES
+# ============================================================================
+
+def as_column_type(df, column, value):
+    """
+    Convierte el valor de un widget al tipo de la columna.
+
+    Las medidas se guardan en float32: comparar contra el float64 del slider
+    (p. ej. 7.3) excluiría eventos cuyo valor float32 redondea por encima.
+    """
+    return df[column].dtype.type(value)
@@ -0,0 +1,213 @@
+"""
+Filter Spec
+===========
+
+Especificación compacta y canónica del estado de los filtros.
+
+La especificación es una cadena apta para URL (`?f=...`) que describe un
+estado de filtros completo: dos estados equivalentes producen la misma
+cadena, así que también sirve como clave de caché. Un enlace compartido
+reproduce los filtros y reutiliza en el servidor las filas y agregados ya
+calculados para esa especificación.
+
+Formato: `<versión>.<JSON comprimido (deflate) en base64url>`, donde el
+JSON solo contiene las claves cuyo valor difiere de DEFAULT_FILTER_STATE
+(la cadena vacía equivale a "sin filtros").
+"""
+
+import base64
+import binascii
+import json
+import math
+import zlib
+
+from utils.filter_engine import CATEGORY_FILTERS, DEFAULT_FILTER_STATE, HEMISPHERES, canonical_state
+from utils.fingerprint import combine_fingerprints, get_fingerprint
+from utils.regions import bbox_region, polygon_region
+
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+# Versión del formato (cambiarla si cambia el significado de alguna clave)
+SPEC_VERSION = 1
+
+# Parámetro de la URL con la especificación
+FILTER_SPEC_PARAM = 'f'
+
+
+# ============================================================================
+# CODIFICACIÓN
+# ============================================================================
+
+def encode_filter_spec(state):
+    """
+    Codifica un estado de filtros como especificación canónica.
+
+    Args:
+        state (dict): Estado de los filtros
+
+    Returns:
+        str: Especificación ('' si el estado no filtra nada)
+    """
+    defaults = dict(canonical_state(DEFAULT_FILTER_STATE))
+    changed = {
+        key: value for key, value in canonical_state(state)
+        if value != defaults[key]
+    }
+    if not changed:
+        return ''
+
+    payload = json.dumps(changed, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+    packed = compressor.compress(payload.encode('utf-8')) + compressor.flush()
+    encoded = base64.urlsafe_b64encode(packed).decode('ascii').rstrip('=')
+    return f"{SPEC_VERSION}.{encoded}"
+
+
+def decode_filter_spec(spec):
+    """
+    Reconstruye el estado de filtros de una especificación.
+
+    Args:
+        spec (str): Especificación (ver encode_filter_spec)
+
+    Returns:
+        dict: Estado de los filtros completo
+
+    Raises:
+        ValueError: Si la especificación no es válida o es de otra versión
+    """
+    state = dict(DEFAULT_FILTER_STATE)
+    if not spec:
+        return state
+
+    version, _, encoded = spec.partition('.')
+    if version != str(SPEC_VERSION):
+        raise ValueError(f"Versión de especificación no soportada: '{version}'")
+
+    try:
+        padded = encoded + '=' * (-len(encoded) % 4)
+        payload = zlib.decompress(base64.urlsafe_b64decode(padded), -15)
+        changed = json.loads(payload.decode('utf-8'))
+    except (binascii.Error, zlib.error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Especificación ilegible: {e}") from e
+    if not isinstance(changed, dict):
+        raise ValueError("Especificación ilegible: se esperaba un objeto")
+
+    for key, value in changed.items():
+        if key not in _DECODERS:
+            raise ValueError(f"Filtro desconocido: '{key}'")
+        try:
+            state[key] = None if value is None else _DECODERS[key](value)
+        except (TypeError, ValueError, IndexError, KeyError) as e:
+            raise ValueError(f"Valor no válido para '{key}': {e}") from e
+
+    return state
+
+
+def spec_fingerprint(catalog, spec, columns):
+    """
+    Huella de los datos que produce una especificación sobre el catálogo.
+
+    Identifica el subconjunto filtrado sin recorrer sus filas: la misma
+    especificación sobre el mismo catálogo selecciona las mismas filas.
+
+    Args:
+        catalog (pd.DataFrame): Catálogo completo
+        spec (str): Especificación de los filtros
+        columns (list): Columnas del DataFrame resultante
+
+    Returns:
+        str: Huella hexadecimal de 32 caracteres
+    """
+    return combine_fingerprints(get_fingerprint(catalog), 'spec', spec, tuple(columns))
+
+
+# ============================================================================
+# DECODIFICADORES POR CLAVE
+# ============================================================================
+
+def _number_pair(value):
+    """Rango (mínimo, máximo)."""
+    lo, hi = value
+    return (_number(lo), _number(hi))
+
+
+def _number(value):
+    """Número finito del JSON (se rechazan booleanos, textos, NaN e infinitos)."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError(f"se esperaba un número, no {value!r}")
+    if not math.isfinite(value):
+        raise ValueError(f"se esperaba un número finito, no {value!r}")
+    return value
+
+
+def _flag(value):
+    """Booleano del JSON."""
+    if not isinstance(value, bool):
+        raise TypeError(f"se esperaba true/false, no {value!r}")
+    return value
+
+
+def _hemispheres(value):
+    """Lista de hemisferios conocidos."""
+    unknown = set(_list(value)) - set(HEMISPHERES)
+    if unknown:
+        raise ValueError(f"hemisferios desconocidos: {sorted(unknown)}")
+    return list(value)
+
+
+def _categories(value):
+    """Lista de categorías (texto)."""
+    return [str(item) for item in _list(value)]
+
+
+def _list(value):
+    """Comprueba que el valor es una lista (un texto no se acepta como lista de letras)."""
+    if not isinstance(value, (list, tuple)):
+        raise ValueError(f"se esperaba una lista, no {value!r}")
+    return value
+
+
+def _region(value):
+    """
+    Región ['bbox', sur, norte, oeste, este] o ['polygon', [[lon, lat], ...]];
+    se valida con los constructores de utils/regions.py.
+    """
+    if not isinstance(value, list) or not value:
+        raise TypeError(f"se esperaba una lista no vacía, no {value!r}")
+    kind = value[0]
+    if kind == 'bbox':
+        if len(value) != 5:
+            raise ValueError("un rectángulo necesita sur, norte, oeste y este")
+        return bbox_region(*(_number(item) for item in value[1:]))
+    if kind == 'polygon':
+        if len(value) != 2 or not isinstance(value[1], list):
+            raise ValueError("un polígono necesita una lista de vértices")
+        return polygon_region([_number_pair(point) for point in value[1]])
+    raise ValueError(f"tipo de región desconocido: {kind!r}")
+
+
+def _tsunami(value):
+    """0 (sin tsunami) o 1 (con tsunami)."""
+    if value not in (0, 1) or isinstance(value, bool):
+        raise ValueError("debe ser 0 o 1")
+    return int(value)
+
+
+# Decodificador de cada clave del estado
+_DECODERS = {
+    'year_range': _number_pair,
+    'mag_range': _number_pair,
+    'max_depth': _number,
+    'tsunami': _tsunami,
+    'hemispheres': _hemispheres,
+    'region': _region,
+    'min_sig': _number,
+    'shallow_only': _flag,
+    'high_mag_only': _flag,
+    'mainshock_only': _flag,
+    **{key: _categories for key in CATEGORY_FILTERS},
+}
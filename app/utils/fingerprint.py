@@ -0,0 +1,138 @@
+"""
+Fingerprint
+===========
+
+Huella de contenido de los DataFrames del dashboard.
+La huella identifica exactamente qué datos contiene un DataFrame y sirve
+como clave para cualquier caché que dependa de ellos (filtrados, groupbys,
+correlaciones, figuras), en lugar de que Streamlit tenga que hashear el
+DataFrame completo en cada llamada.
+
+Las huellas se registran por objeto y no en `df.attrs`: pandas copia
+`attrs` a los DataFrames derivados (filtrados, copias), que heredarían una
+huella que ya no describe su contenido.
+"""
+
+import hashlib
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+
+# ============================================================================
+# REGISTRO
+# ============================================================================
+
+# Huellas registradas: {id(DataFrame): huella}
+_fingerprints = {}
+
+_lock = threading.Lock()
+
+
+def combine_fingerprints(*parts):
+    """
+    Combina varias partes (huellas, versiones, nombres) en una huella.
+
+    Args:
+        *parts: Valores con representación estable (str, int, tuplas)
+
+    Returns:
+        str: Huella hexadecimal de 32 caracteres
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(repr(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def set_fingerprint(df, fingerprint):
+    """
+    Registra la huella de un DataFrame.
+
+    La huella se olvida automáticamente cuando el DataFrame deja de existir.
+
+    Args:
+        df (pd.DataFrame): DataFrame
+        fingerprint (str): Huella de su contenido
+
+    Returns:
+        pd.DataFrame: El mismo DataFrame
+    """
+    key = id(df)
+    with _lock:
+        if key not in _fingerprints:
+            weakref.finalize(df, _forget, key)
+        _fingerprints[key] = fingerprint
+    return df
+
+
+def _forget(key):
+    """Elimina la huella de un DataFrame liberado."""
+    with _lock:
+        _fingerprints.pop(key, None)
+
+
+def get_fingerprint(df):
+    """
+    Retorna la huella de un DataFrame.
+
+    Si no tiene una registrada (ver set_fingerprint), se calcula a partir de
+    los buffers de sus columnas y se memoriza.
+
+    Args:
+        df (pd.DataFrame): DataFrame
+
+    Returns:
+        str: Huella hexadecimal de 32 caracteres
+    """
+    with _lock:
+        fingerprint = _fingerprints.get(id(df))
+    if fingerprint is None:
+        fingerprint = buffer_fingerprint(df)
+        set_fingerprint(df, fingerprint)
+    return fingerprint
+
+
+# ============================================================================
+# CÁLCULO
+# ============================================================================
+
+def buffer_fingerprint(df):
+    """
+    Calcula la huella de un DataFrame a partir de sus buffers.
+
+    Recorre una sola vez la memoria de cada columna (códigos en las
+    categóricas) y del índice, sin convertir valores a Python.
+
+    Args:
+        df (pd.DataFrame): DataFrame
+
+    Returns:
+        str: Huella hexadecimal de 32 caracteres
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((df.shape, list(df.columns))).encode('utf-8'))
+    digest.update(_array_bytes(df.index.to_numpy()))
+
+    for col in df.columns:
+        values = df[col]
+        digest.update(str(values.dtype).encode('utf-8'))
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            digest.update(repr(values.cat.categories.tolist()).encode('utf-8'))
+            values = values.cat.codes
+        digest.update(_array_bytes(values.to_numpy()))
+
+    return digest.hexdigest()
+
+
+def _array_bytes(values):
+    """
+    Retorna la memoria de un array como bytes hasheables, sin copiarla
+    si ya es contigua (los objetos se convierten a texto).
+    """
+    if values.dtype == object:
+        return repr(values.tolist()).encode('utf-8')
+    return np.ascontiguousarray(values).reshape(-1).view(np.uint8)
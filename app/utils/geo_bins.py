@@ -0,0 +1,168 @@
+"""
+Geo Bins
+========
+
+Agregación de eventos en celdas hexagonales para los mapas densos.
+
+Con muchos eventos, dibujar un marcador por evento hace que el tamaño de la
+figura y el tiempo de dibujo en el navegador crezcan con el catálogo. Por
+encima de MAP_POINT_LIMIT eventos los mapas dibujan en su lugar una rejilla
+hexagonal calculada en el servidor: un marcador por celda con el número de
+eventos, la magnitud máxima, la proporción de tsunamis y otras medidas.
+Por encima de MAP_RASTER_LIMIT eventos dibujan una imagen de densidad
+(utils/raster.py).
+
+La rejilla se define en grados (longitud × latitud), así que las celdas son
+hexágonos regulares en la proyección equirectangular; su área real se
+reduce hacia los polos.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+# Eventos a partir de los cuales los mapas dibujan celdas, configurable
+MAP_POINT_LIMIT = int(os.environ.get('EQ_MAP_POINT_LIMIT', 5000))
+
+# Eventos a partir de los cuales los mapas dibujan una imagen, configurable
+MAP_RASTER_LIMIT = int(os.environ.get('EQ_MAP_RASTER_LIMIT', 100000))
+
+# Tamaño de los hexágonos (grados del centro a un vértice)
+HEX_SIZE_DEGREES = 2.0
+
+# Medidas por celda: {columna: estadísticos}; se omiten las que no existan
+BIN_MEASURES = {
+    'magnitude': ('max', 'mean'),
+    'depth': ('mean', 'max'),
+    'sig': ('max', 'mean'),
+    'nst': ('mean',),
+    'dmin': ('mean',),
+    'monitoring_quality': ('mean',),
+    'impact_level': ('max',),
+}
+
+
+# ============================================================================
+# AGREGACIÓN
+# ============================================================================
+
+def map_mode(df):
+    """
+    Indica cómo debe dibujar un mapa los eventos de `df`.
+
+    Args:
+        df (pd.DataFrame): Datos del mapa
+
+    Returns:
+        str: 'raster' con más de MAP_RASTER_LIMIT eventos, 'hexbins' con
+            más de MAP_POINT_LIMIT y 'points' en otro caso
+    """
+    if len(df) > MAP_RASTER_LIMIT:
+        return 'raster'
+    if len(df) > MAP_POINT_LIMIT:
+        return 'hexbins'
+    return 'points'
+
+
+def hex_cells(latitude, longitude, size_degrees=HEX_SIZE_DEGREES):
+    """
+    Asigna cada punto a un hexágono (coordenadas axiales, vértice arriba).
+
+    Args:
+        latitude (np.ndarray): Latitudes (grados)
+        longitude (np.ndarray): Longitudes (grados)
+        size_degrees (float): Tamaño de los hexágonos
+
+    Returns:
+        tuple: (q, r) enteros de cada punto
+    """
+    x = np.asarray(longitude, dtype=np.float64) / size_degrees
+    y = np.asarray(latitude, dtype=np.float64) / size_degrees
+    q = np.sqrt(3) / 3 * x - y / 3
+    r = 2 / 3 * y
+
+    # Redondeo en coordenadas cúbicas (q + r + s = 0): se corrige el eje
+    # con mayor error de redondeo
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return rq.astype(np.int64), rr.astype(np.int64)
+
+
+def hex_centers(q, r, size_degrees=HEX_SIZE_DEGREES):
+    """
+    Centro de cada hexágono.
+
+    Args:
+        q, r (np.ndarray): Coordenadas axiales
+        size_degrees (float): Tamaño de los hexágonos
+
+    Returns:
+        tuple: (latitudes, longitudes) de los centros, con la longitud
+            llevada a -180..180
+    """
+    longitude = size_degrees * np.sqrt(3) * (q + r / 2)
+    latitude = size_degrees * 1.5 * r
+    return np.clip(latitude, -90, 90), (longitude + 180) % 360 - 180
+
+
+def hexbin_aggregate(df, size_degrees=HEX_SIZE_DEGREES):
+    """
+    Agrega los eventos por hexágono.
+
+    Args:
+        df (pd.DataFrame): Eventos ('latitude', 'longitude', 'tsunami' y
+            las medidas de BIN_MEASURES disponibles)
+        size_degrees (float): Tamaño de los hexágonos
+
+    Returns:
+        pd.DataFrame: Una fila por celda con eventos: 'latitude',
+            'longitude' (centro), 'count', 'tsunami_count', 'tsunami_share'
+            y '<medida>_<estadístico>' (NaN si la celda no tiene valores)
+    """
+    latitude = df['latitude'].to_numpy(dtype=np.float64)
+    longitude = df['longitude'].to_numpy(dtype=np.float64)
+    located = ~(np.isnan(latitude) | np.isnan(longitude))
+
+    q, r = hex_cells(latitude[located], longitude[located], size_degrees)
+    pairs, cells = np.unique(np.stack([q, r], axis=1), axis=0, return_inverse=True)
+    cells = cells.reshape(-1)
+    n_cells = len(pairs)
+
+    center_lat, center_lon = hex_centers(pairs[:, 0], pairs[:, 1], size_degrees)
+    count = np.bincount(cells, minlength=n_cells)
+    tsunamis = np.bincount(cells, weights=df['tsunami'].to_numpy()[located], minlength=n_cells)
+    result = {
+        'latitude': center_lat,
+        'longitude': center_lon,
+        'count': count,
+        'tsunami_count': tsunamis.astype(np.int64),
+        'tsunami_share': tsunamis / np.maximum(count, 1),
+    }
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for column, stats in BIN_MEASURES.items():
+            if column not in df.columns:
+                continue
+            values = df[column].to_numpy(dtype=np.float64)[located]
+            valid = ~np.isnan(values)
+            if 'mean' in stats:
+                n_valid = np.bincount(cells[valid], minlength=n_cells)
+                total = np.bincount(cells[valid], weights=values[valid], minlength=n_cells)
+                result[f'{column}_mean'] = np.where(n_valid > 0, total / n_valid, np.nan)
+            if 'max' in stats:
+                maximum = np.full(n_cells, -np.inf)
+                np.maximum.at(maximum, cells[valid], values[valid])
+                result[f'{column}_max'] = np.where(np.isfinite(maximum), maximum, np.nan)
+
+    return pd.DataFrame(result)
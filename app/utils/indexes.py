@@ -0,0 +1,388 @@
+"""
+Indexes
+=======
+
+Índices precalculados sobre las columnas del catálogo para el filtrado.
+
+Un índice de rango guarda el orden de las filas según una columna y los
+valores ya ordenados: un predicado `lo <= x <= hi` se resuelve con dos
+búsquedas binarias (`np.searchsorted`) y devuelve directamente los ids de
+las filas que lo cumplen, sin recorrer la columna completa.
+
+Un bitmap empaquetado guarda un bit por fila para un predicado de baja
+cardinalidad (tsunami, hemisferio, categoría...): 8 filas por byte. Los
+filtros se combinan con AND/OR bit a bit y los conteos se obtienen con un
+popcount, sin materializar filas.
+
+Los índices se construyen la primera vez que se piden y se memorizan por
+huella del catálogo (ver utils/fingerprint.py), así que se comparten entre
+sesiones y se descartan cuando cambian los datos.
+"""
+
+import math
+import threading
+
+import numpy as np
+
+from utils.fingerprint import get_fingerprint
+
+
+# ============================================================================
+# MEMORIA DE ÍNDICES
+# ============================================================================
+
+# Índices construidos: {(huella, tipo, nombre): índice}
+_indexes = {}
+
+_lock = threading.Lock()
+
+# Número de bits a 1 de cada byte posible (popcount por tabla)
+POPCOUNT_TABLE = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+def _memoized(df, kind, name, build):
+    """
+    Retorna un índice del catálogo, construyéndolo la primera vez.
+
+    Solo se conservan los índices de la última huella: al cargar una nueva
+    versión del catálogo se liberan los de la anterior.
+
+    Args:
+        df (pd.DataFrame): Catálogo completo
+        kind (str): Tipo de índice
+        name: Nombre del índice dentro de su tipo
+        build (callable): Función sin argumentos que construye el índice
+    """
+    fingerprint = get_fingerprint(df)
+    key = (fingerprint, kind, name)
+    with _lock:
+        index = _indexes.get(key)
+    if index is not None:
+        return index
+
+    index = build()
+    with _lock:
+        for stale in [k for k in _indexes if k[0] != fingerprint]:
+            del _indexes[stale]
+        _indexes[key] = index
+    return index
+
+
+# ============================================================================
+# ÍNDICES DE RANGO
+# ============================================================================
+
+def build_range_index(values):
+    """
+    Construye el índice de rango de una columna numérica.
+
+    Args:
+        values (np.ndarray): Valores de la columna
+
+    Returns:
+        dict: {'order': ids de fila ordenados por valor,
+            'values': valores ordenados,
+            'valid': número de valores no nulos (los NaN quedan al final)}
+    """
+    order = np.argsort(values, kind='stable')
+    row_dtype = np.int32 if len(values) < np.iinfo(np.int32).max else np.int64
+    sorted_values = values[order]
+
+    valid = len(sorted_values)
+    if sorted_values.dtype.kind == 'f':
+        valid -= int(np.isnan(sorted_values).sum())
+
+    return {
+        'order': order.astype(row_dtype),
+        'values': sorted_values,
+        'valid': valid,
+    }
+
+
+def get_range_index(df, column):
+    """
+    Retorna el índice de rango de una columna del catálogo.
+
+    Args:
+        df (pd.DataFrame): Catálogo completo
+        column (str): Columna numérica
+
+    Returns:
+        dict: Índice de rango (ver build_range_index)
+    """
+    return _memoized(df, 'range', column,
+                     lambda: build_range_index(df[column].to_numpy()))
+
+
+def range_bounds(index, lo=None, hi=None, hi_inclusive=True):
+    """
+    Localiza en el índice las filas con `lo <= valor <= hi`.
+
+    Args:
+        index (dict): Índice de rango
+        lo: Límite inferior inclusivo (None: sin límite)
+        hi: Límite superior (None: sin límite)
+        hi_inclusive (bool): Si False, el límite superior es estricto
+
+    Returns:
+        tuple: (inicio, fin) de la porción de `index['order']` que cumple
+            el predicado; `fin - inicio` es el número de filas
+    """
+    values = index['values'][:index['valid']]
+    start = 0 if lo is None else int(np.searchsorted(values, lo, side='left'))
+    if hi is None:
+        end = len(values)
+    else:
+        end = int(np.searchsorted(values, hi, side='right' if hi_inclusive else 'left'))
+    return start, max(start, end)
+
+
+def range_rows(index, start, end):
+    """
+    Retorna los ids de fila de una porción del índice, en orden de fila.
+
+    Args:
+        index (dict): Índice de rango
+        start (int): Inicio (ver range_bounds)
+        end (int): Fin (ver range_bounds)
+
+    Returns:
+        np.ndarray: Ids de fila ordenados de forma ascendente
+    """
+    return np.sort(index['order'][start:end])
+
+
+# ============================================================================
+# BITMAPS EMPAQUETADOS
+# ============================================================================
+
+def pack_mask(mask):
+    """
+    Empaqueta una máscara booleana en un bitmap (8 filas por byte).
+
+    Args:
+        mask (np.ndarray): Máscara booleana
+
+    Returns:
+        np.ndarray: Bitmap uint8; el bit `i % 8` del byte `i // 8` es la
+            fila `i`, y los bits de relleno del último byte valen 0
+    """
+    return np.packbits(mask, bitorder='little')
+
+
+def get_bitmap(df, name, condition):
+    """
+    Retorna el bitmap de un predicado sobre el catálogo.
+
+    Args:
+        df (pd.DataFrame): Catálogo completo
+        name: Nombre único del predicado (p. ej. ('tsunami', 1))
+        condition (callable): Función que recibe el catálogo y retorna la
+            máscara booleana del predicado (solo se llama la primera vez)
+
+    Returns:
+        np.ndarray: Bitmap empaquetado (ver pack_mask)
+    """
+    return _memoized(df, 'bitmap', name, lambda: pack_mask(condition(df)))
+
+
+def category_bitmap(df, name, values, categories):
+    """
+    Retorna el bitmap de las filas cuya categoría está entre `categories`.
+
+    Se combina con OR el bitmap de cada categoría, que se memoriza por
+    separado para reutilizarlo en cualquier selección.
+
+    Args:
+        df (pd.DataFrame): Catálogo completo
+        name (str): Nombre de la columna categórica
+        values (pd.Series): Columna categórica alineada con el catálogo
+        categories (list): Categorías seleccionadas
+
+    Returns:
+        np.ndarray: Bitmap empaquetado
+    """
+    codes = values.cat.codes.to_numpy()
+    bitmap = np.zeros((len(df) + 7) // 8, dtype=np.uint8)
+    for code in values.cat.categories.get_indexer(categories):
+        if code < 0:
+            continue
+        np.bitwise_or(
+            bitmap,
+            get_bitmap(df, (name, int(code)), lambda _, code=code: codes == code),
+            out=bitmap
+        )
+    return bitmap
+
+
+def bitmap_and(bitmaps):
+    """
+    Combina bitmaps con AND.
+
+    Args:
+        bitmaps (list): Bitmaps del mismo catálogo (al menos uno)
+
+    Returns:
+        np.ndarray: Nuevo bitmap con las filas presentes en todos
+    """
+    result = bitmaps[0].copy()
+    for bitmap in bitmaps[1:]:
+        np.bitwise_and(result, bitmap, out=result)
+    return result
+
+
+def popcount(bitmap):
+    """
+    Cuenta las filas marcadas en un bitmap.
+
+    Args:
+        bitmap (np.ndarray): Bitmap empaquetado
+
+    Returns:
+        int: Número de bits a 1
+    """
+    return int(POPCOUNT_TABLE[bitmap].sum(dtype=np.int64))
+
+
+def bitmap_rows(bitmap, n_rows):
+    """
+    Retorna las posiciones de las filas marcadas en un bitmap.
+
+    Args:
+        bitmap (np.ndarray): Bitmap empaquetado
+        n_rows (int): Número de filas del catálogo
+
+    Returns:
+        np.ndarray: Posiciones ascendentes
+    """
+    return np.flatnonzero(np.unpackbits(bitmap, count=n_rows, bitorder='little'))
+
+
+def test_rows(bitmap, rows):
+    """
+    Consulta en un bitmap solo unas filas concretas.
+
+    Args:
+        bitmap (np.ndarray): Bitmap empaquetado
+        rows (np.ndarray): Posiciones de las filas
+
+    Returns:
+        np.ndarray: Máscara booleana alineada con `rows`
+    """
+    bits = (bitmap[rows >> 3] >> (rows & 7).astype(np.uint8)) & 1
+    return bits.astype(bool)
+
+
+# ============================================================================
+# ÍNDICE ESPACIAL EN REJILLA
+# ============================================================================
+
+# Tamaño de celda de la rejilla lat/lon (grados)
+GRID_CELL_DEGREES = 1.0
+
+
+def build_grid_index(latitude, longitude, cell_degrees=GRID_CELL_DEGREES):
+    """
+    Construye un índice de rejilla lat/lon en formato CSR.
+
+    Las filas se ordenan por celda (latitud mayor, longitud menor), de modo
+    que las filas de una banda de latitud y un tramo contiguo de longitudes
+    forman una única porción de `order`.
+
+    Args:
+        latitude (np.ndarray): Latitudes (grados)
+        longitude (np.ndarray): Longitudes (grados, -180 a 180)
+        cell_degrees (float): Tamaño de celda
+
+    Returns:
+        dict: {'order': ids de fila ordenados por celda,
+            'offsets': inicio en `order` de cada celda (n_celdas + 1),
+            'n_lat', 'n_lon': celdas por eje, 'cell': tamaño de celda}
+    """
+    n_lat = int(np.ceil(180 / cell_degrees))
+    n_lon = int(np.ceil(360 / cell_degrees))
+
+    lat_bin, lon_bin = _grid_bins(latitude, longitude, cell_degrees, n_lat, n_lon)
+    cells = lat_bin * n_lon + lon_bin
+
+    order = np.argsort(cells, kind='stable')
+    counts = np.bincount(cells, minlength=n_lat * n_lon)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    row_dtype = np.int32 if len(cells) < np.iinfo(np.int32).max else np.int64
+    return {
+        'order': order.astype(row_dtype),
+        'offsets': offsets,
+        'n_lat': n_lat,
+        'n_lon': n_lon,
+        'cell': cell_degrees,
+    }
+
+
+def _grid_bins(latitude, longitude, cell_degrees, n_lat, n_lon):
+    """Retorna la celda (fila y columna de la rejilla) de cada punto."""
+    lat_bin = np.floor((np.asarray(latitude, dtype=np.float64) + 90) / cell_degrees)
+    lon_bin = np.floor((np.asarray(longitude, dtype=np.float64) + 180) / cell_degrees)
+    lat_bin = np.clip(np.nan_to_num(lat_bin), 0, n_lat - 1).astype(np.int64)
+    lon_bin = np.clip(np.nan_to_num(lon_bin), 0, n_lon - 1).astype(np.int64)
+    return lat_bin, lon_bin
+
+
+def _grid_bin(offset, cell_degrees, n_cells):
+    """Celda de una coordenada escalar (ya desplazada a 0..180/360)."""
+    return min(max(int(math.floor(offset / cell_degrees)), 0), n_cells - 1)
+
+
+def get_grid_index(df):
+    """
+    Retorna el índice de rejilla lat/lon del catálogo.
+
+    Args:
+        df (pd.DataFrame): Catálogo completo
+
+    Returns:
+        dict: Índice de rejilla (ver build_grid_index)
+    """
+    return _memoized(df, 'grid', ('latitude', 'longitude'), lambda: build_grid_index(
+        df['latitude'].to_numpy(), df['longitude'].to_numpy()
+    ))
+
+
+def grid_rows(grid, south, north, west, east):
+    """
+    Retorna las filas de las celdas que tocan un rectángulo.
+
+    Un rectángulo con `west > east` cruza la línea de cambio de fecha y se
+    trata como dos tramos de longitud. Las filas devueltas son candidatas:
+    las de las celdas del borde pueden quedar fuera del rectángulo exacto.
+
+    Args:
+        grid (dict): Índice de rejilla
+        south, north (float): Latitudes límite
+        west, east (float): Longitudes límite (-180 a 180)
+
+    Returns:
+        np.ndarray: Posiciones candidatas, en orden ascendente
+    """
+    cell, n_lat, n_lon = grid['cell'], grid['n_lat'], grid['n_lon']
+    lat_lo, lat_hi = (_grid_bin(lat + 90, cell, n_lat) for lat in (south, north))
+
+    if west <= east:
+        spans = [(west, east)]
+    else:
+        spans = [(west, 180.0), (-180.0, east)]
+
+    slices = []
+    for span_west, span_east in spans:
+        lon_lo, lon_hi = (_grid_bin(lon + 180, cell, n_lon) for lon in (span_west, span_east))
+        # Una porción contigua de `order` por cada banda de latitud
+        bands = np.arange(lat_lo, lat_hi + 1) * n_lon
+        starts = grid['offsets'][bands + lon_lo]
+        ends = grid['offsets'][bands + lon_hi + 1]
+        slices.extend(
+            grid['order'][start:end] for start, end in zip(starts, ends) if end > start
+        )
+
+    if not slices:
+        return np.array([], dtype=grid['order'].dtype)
+    return np.sort(np.concatenate(slices))
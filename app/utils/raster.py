@@ -0,0 +1,256 @@
+"""
+Raster
+======
+
+Imagen de densidad de eventos calculada en el servidor para los mapas con
+catálogos muy grandes.
+
+Por encima de MAP_RASTER_LIMIT eventos (utils/geo_bins.py) ni siquiera las
+celdas hexagonales son ligeras: el mapa se dibuja como una única imagen PNG
+superpuesta a los ejes geográficos. En el servidor se calcula:
+
+- Un histograma 2D (longitud × latitud) a resolución de pantalla con
+  np.bincount, opcionalmente ponderado por una columna (p. ej. 'sig') o
+  separado por clase de tsunami.
+- El color de cada píxel: escala de colores logarítmica de la densidad o,
+  separando por tsunami, la mezcla de los colores de cada clase con la
+  opacidad según la densidad. Los píxeles sin eventos quedan transparentes.
+- La imagen PNG (zlib), enviada como data URI.
+
+El tamaño de la figura depende de la resolución, no del número de eventos.
+La imagen es equirectangular: cada píxel ocupa los mismos grados de
+longitud y latitud, así que solo se alinea con la proyección
+equirectangular del mundo completo.
+"""
+
+import base64
+import os
+import struct
+import zlib
+
+import numpy as np
+from plotly.colors import get_colorscale, sample_colorscale, unlabel_rgb
+
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+# Ancho de la imagen en píxeles (el alto es la mitad), configurable
+RASTER_WIDTH = int(os.environ.get('EQ_MAP_RASTER_WIDTH', 1200))
+
+# Opacidad de los píxeles con eventos (la mínima, al separar por clases)
+RASTER_ALPHA = 230
+RASTER_MIN_ALPHA = 70
+
+# Colores RGB de cada clase de tsunami (0: sin tsunami, 1: con tsunami)
+TSUNAMI_COLORS = ((0x44, 0x88, 0xff), (0xff, 0x44, 0x44))
+
+# Nivel de compresión zlib del PNG
+PNG_COMPRESSION = 6
+
+
+# ============================================================================
+# DENSIDAD
+# ============================================================================
+
+def density_raster(df, width=RASTER_WIDTH, weight=None, split=None, color_scale='Inferno'):
+    """
+    Imagen de densidad de eventos lista para superponer al mapa.
+
+    Args:
+        df (pd.DataFrame): Eventos ('latitude', 'longitude' y las columnas
+            de `weight` y `split`)
+        width (int): Ancho de la imagen en píxeles
+        weight (str): Columna que pondera cada evento (None: conteo)
+        split (str): Columna de clase 0/1 con la que se mezclan
+            TSUNAMI_COLORS (None: escala de colores)
+        color_scale (str): Escala de colores de plotly (sin `split`)
+
+    Returns:
+        tuple: (data URI del PNG, densidad máxima por píxel)
+    """
+    grid = density_grid(df, width, weight, split)
+    if split is None:
+        rgba = shade_density(grid[0], color_scale)
+    else:
+        rgba = shade_classes(grid, TSUNAMI_COLORS)
+    return png_data_uri(rgba), float(grid.sum(axis=0).max())
+
+
+def density_grid(df, width=RASTER_WIDTH, weight=None, split=None):
+    """
+    Histograma 2D de los eventos en una rejilla equirectangular.
+
+    Args:
+        df (pd.DataFrame): Eventos
+        width (int): Píxeles de longitud (los de latitud son la mitad)
+        weight (str): Columna que pondera cada evento (None: conteo)
+        split (str): Columna de clase 0/1 (None: una sola capa)
+
+    Returns:
+        np.ndarray: Densidad [clase, fila, columna], con la fila 0 al norte
+    """
+    height = width // 2
+    latitude = df['latitude'].to_numpy(dtype=np.float64)
+    longitude = df['longitude'].to_numpy(dtype=np.float64)
+    valid = ~(np.isnan(latitude) | np.isnan(longitude))
+
+    weights = None
+    if weight is not None:
+        weights = df[weight].to_numpy(dtype=np.float64)
+        valid &= ~np.isnan(weights)
+        weights = np.maximum(weights[valid], 0)
+
+    columns = np.clip(((longitude[valid] + 180) * (width / 360)).astype(np.int64), 0, width - 1)
+    rows = np.clip(((90 - latitude[valid]) * (height / 180)).astype(np.int64), 0, height - 1)
+    pixels = rows * width + columns
+
+    n_layers = 1
+    if split is not None:
+        n_layers = len(TSUNAMI_COLORS)
+        classes = np.clip(df[split].to_numpy()[valid].astype(np.int64), 0, n_layers - 1)
+        pixels += classes * (height * width)
+
+    grid = np.bincount(pixels, weights=weights, minlength=n_layers * height * width)
+    return grid.reshape(n_layers, height, width)
+
+
+def density_levels(density):
+    """
+    Escala logarítmica de la densidad a [0, 1].
+
+    Args:
+        density (np.ndarray): Densidad por píxel
+
+    Returns:
+        np.ndarray: log(1 + densidad) / log(1 + máximo)
+    """
+    peak = density.max() if density.size else 0
+    if peak <= 0:
+        return np.zeros(density.shape)
+    return np.log1p(density) / np.log1p(peak)
+
+
+def density_ticks(peak):
+    """
+    Marcas de la barra de colores (potencias de 10) en la escala logarítmica.
+
+    Args:
+        peak (float): Densidad máxima por píxel
+
+    Returns:
+        tuple: (posiciones en [0, 1], etiquetas)
+    """
+    if peak <= 0:
+        return [0.0], ['0']
+    values = [0] + [10 ** power for power in range(int(np.log10(max(peak, 1))) + 1)]
+    positions = [float(np.log1p(value) / np.log1p(peak)) for value in values]
+    return positions, [f'{value:,}' for value in values]
+
+
+# ============================================================================
+# COLOR
+# ============================================================================
+
+def shade_density(density, color_scale):
+    """
+    Colorea la densidad con una escala de colores.
+
+    Args:
+        density (np.ndarray): Densidad [fila, columna]
+        color_scale (str): Escala de colores de plotly
+
+    Returns:
+        np.ndarray: Imagen RGBA (uint8), transparente donde no hay eventos
+    """
+    lut = colorscale_lut(color_scale)
+    levels = np.round(density_levels(density) * (len(lut) - 1)).astype(np.int64)
+
+    rgba = np.empty(density.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = lut[levels]
+    rgba[..., 3] = np.where(density > 0, RASTER_ALPHA, 0)
+    return rgba
+
+
+def shade_classes(grid, colors):
+    """
+    Mezcla el color de cada clase según su proporción en cada píxel.
+
+    Args:
+        grid (np.ndarray): Densidad [clase, fila, columna]
+        colors (tuple): Color RGB de cada clase
+
+    Returns:
+        np.ndarray: Imagen RGBA (uint8); la opacidad crece con la densidad
+            total y es 0 donde no hay eventos
+    """
+    total = grid.sum(axis=0)
+    shares = grid / np.maximum(total, np.finfo(np.float64).tiny)
+    rgb = np.tensordot(shares, np.asarray(colors, dtype=np.float64), axes=(0, 0))
+    alpha = RASTER_MIN_ALPHA + (RASTER_ALPHA - RASTER_MIN_ALPHA) * density_levels(total)
+
+    rgba = np.empty(total.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = np.round(rgb)
+    rgba[..., 3] = np.where(total > 0, np.round(alpha), 0)
+    return rgba
+
+
+def colorscale_lut(color_scale, n_colors=256):
+    """
+    Tabla de colores muestreada de una escala de plotly.
+
+    Args:
+        color_scale (str): Nombre de la escala (admite el sufijo '_r')
+        n_colors (int): Entradas de la tabla
+
+    Returns:
+        np.ndarray: Colores RGB [entrada, canal] (uint8)
+    """
+    samples = sample_colorscale(get_colorscale(color_scale), np.linspace(0, 1, n_colors))
+    return np.round([unlabel_rgb(color) for color in samples]).astype(np.uint8)
+
+
+# ============================================================================
+# PNG
+# ============================================================================
+
+def encode_png(rgba, level=PNG_COMPRESSION):
+    """
+    Codifica una imagen RGBA como PNG (sin dependencias de imagen).
+
+    Args:
+        rgba (np.ndarray): Imagen [fila, columna, canal] (uint8)
+        level (int): Nivel de compresión zlib
+
+    Returns:
+        bytes: Archivo PNG
+    """
+    height, width, _ = rgba.shape
+
+    # Cada fila empieza con el tipo de filtro (0: ninguno)
+    raw = np.zeros((height, 1 + width * 4), dtype=np.uint8)
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+
+    def chunk(tag, data):
+        return (struct.pack('>I', len(data)) + tag + data
+                + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(raw.tobytes(), level))
+            + chunk(b'IEND', b''))
+
+
+def png_data_uri(rgba):
+    """
+    Imagen RGBA como data URI para `layout.images` de plotly.
+
+    Args:
+        rgba (np.ndarray): Imagen [fila, columna, canal] (uint8)
+
+    Returns:
+        str: 'data:image/png;base64,...'
+    """
+    return 'data:image/png;base64,' + base64.b64encode(encode_png(rgba)).decode('ascii')
@@ -0,0 +1,209 @@
+"""
+Regions
+=======
+
+Filtros por región geográfica arbitraria: rectángulos (bounding boxes) y
+polígonos, p. ej. un área de responsabilidad.
+
+Una región se representa como una tupla hasheable, para que forme parte
+del estado de los filtros y de la clave de la caché de resultados:
+
+    ('bbox', sur, norte, oeste, este)
+    ('polygon', ((lon, lat), (lon, lat), ...))
+
+Las consultas usan el índice de rejilla lat/lon (utils/indexes.py): solo
+los puntos de las celdas que tocan la región se evalúan con la prueba
+exacta (comparación de límites o ray casting vectorizado).
+"""
+
+import numpy as np
+
+from utils.indexes import get_grid_index, grid_rows
+
+
+# ============================================================================
+# CONSTRUCCIÓN DE REGIONES
+# ============================================================================
+
+def bbox_region(south, north, west, east):
+    """
+    Crea una región rectangular.
+
+    Si `west > east`, el rectángulo cruza la línea de cambio de fecha
+    (p. ej. oeste=150, este=-120 cubre el Pacífico central).
+
+    Args:
+        south, north (float): Latitudes límite (grados)
+        west, east (float): Longitudes límite (grados, -180 a 180)
+
+    Returns:
+        tuple: Región ('bbox', sur, norte, oeste, este)
+    """
+    for lat in (south, north):
+        if not -90 <= lat <= 90:
+            raise ValueError("Las latitudes deben estar entre -90 y 90")
+    if south > north:
+        raise ValueError("La latitud sur debe ser menor o igual que la norte")
+    for lon in (west, east):
+        if not -180 <= lon <= 180:
+            raise ValueError("Las longitudes deben estar entre -180 y 180")
+    return ('bbox', float(south), float(north), float(west), float(east))
+
+
+def polygon_region(points):
+    """
+    Crea una región poligonal.
+
+    Args:
+        points (list): Vértices (lon, lat) en orden; el polígono se cierra
+            automáticamente
+
+    Returns:
+        tuple: Región ('polygon', ((lon, lat), ...))
+    """
+    points = [(float(lon), float(lat)) for lon, lat in points]
+    if len(points) > 1 and points[0] == points[-1]:
+        points = points[:-1]
+    if len(points) < 3:
+        raise ValueError("Un polígono necesita al menos 3 vértices")
+    for lon, lat in points:
+        if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+            raise ValueError(f"Vértice fuera de rango: ({lon}, {lat})")
+    return ('polygon', tuple(points))
+
+
+def parse_polygon(text):
+    """
+    Lee un polígono escrito como "lon, lat; lon, lat; ...".
+
+    Args:
+        text (str): Vértices separados por ';' o saltos de línea
+
+    Returns:
+        tuple: Región poligonal
+
+    Raises:
+        ValueError: Si el texto no describe un polígono válido
+    """
+    points = []
+    for chunk in text.replace('\n', ';').split(';'):
+        if not chunk.strip():
+            continue
+        parts = chunk.split(',')
+        if len(parts) != 2:
+            raise ValueError(f"Vértice no válido: '{chunk.strip()}' (use 'lon, lat')")
+        points.append((float(parts[0]), float(parts[1])))
+    return polygon_region(points)
+
+
+# ============================================================================
+# CONSULTAS
+# ============================================================================
+
+def region_rows(df, region):
+    """
+    Retorna las filas del catálogo dentro de una región.
+
+    Args:
+        df (pd.DataFrame): Catálogo completo
+        region (tuple): Región (ver bbox_region y polygon_region)
+
+    Returns:
+        np.ndarray: Posiciones de las filas, en orden ascendente
+    """
+    south, north, west, east = region_bounds(region)
+    candidates = grid_rows(get_grid_index(df), south, north, west, east)
+    if len(candidates) == 0:
+        return candidates
+
+    latitude = df['latitude'].to_numpy()[candidates]
+    longitude = df['longitude'].to_numpy()[candidates]
+    return candidates[points_in_region(region, latitude, longitude)]
+
+
+def region_bounds(region):
+    """
+    Retorna el rectángulo que contiene una región.
+
+    Returns:
+        tuple: (sur, norte, oeste, este); `oeste > este` si cruza la línea
+            de cambio de fecha
+    """
+    if region[0] == 'bbox':
+        return region[1:]
+
+    lons, lats = _polygon_arrays(region)
+    west, east = lons.min(), lons.max()
+    if east > 180:
+        east -= 360
+    return lats.min(), lats.max(), west, east
+
+
+def points_in_region(region, latitude, longitude):
+    """
+    Prueba exacta y vectorizada de pertenencia a una región.
+
+    Args:
+        region (tuple): Región
+        latitude (np.ndarray): Latitudes de los puntos
+        longitude (np.ndarray): Longitudes de los puntos
+
+    Returns:
+        np.ndarray: Máscara booleana de los puntos dentro de la región
+    """
+    if region[0] == 'bbox':
+        _, south, north, west, east = region
+        inside = (latitude >= south) & (latitude <= north)
+        if west <= east:
+            return inside & (longitude >= west) & (longitude <= east)
+        return inside & ((longitude >= west) | (longitude <= east))
+
+    lons, lats = _polygon_arrays(region)
+    if lons.max() > 180:
+        longitude = np.where(longitude < 0, longitude + 360, longitude)
+    return points_in_polygon(longitude, latitude, lons, lats)
+
+
+def points_in_polygon(x, y, poly_x, poly_y):
+    """
+    Ray casting (regla par-impar) vectorizado sobre todos los puntos.
+
+    Se recorre cada arista una vez y se evalúa contra todos los puntos a
+    la vez, así que el coste es O(aristas × puntos) sin bucles en Python
+    sobre los puntos.
+
+    Args:
+        x, y (np.ndarray): Coordenadas de los puntos
+        poly_x, poly_y (np.ndarray): Vértices del polígono (sin cerrar)
+
+    Returns:
+        np.ndarray: Máscara booleana de los puntos dentro del polígono
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    inside = np.zeros(len(x), dtype=bool)
+
+    prev_x, prev_y = poly_x[-1], poly_y[-1]
+    for edge_x, edge_y in zip(poly_x, poly_y):
+        if edge_y != prev_y:
+            crosses = (edge_y > y) != (prev_y > y)
+            x_cross = edge_x + (y - edge_y) * (prev_x - edge_x) / (prev_y - edge_y)
+            inside ^= crosses & (x < x_cross)
+        prev_x, prev_y = edge_x, edge_y
+
+    return inside
+
+
+def _polygon_arrays(region):
+    """
+    Retorna los vértices de un polígono como arrays (longitudes, latitudes).
+
+    Si el polígono cruza la línea de cambio de fecha (saltos de más de 180°
+    entre longitudes), las longitudes negativas se desplazan +360° para que
+    el polígono sea continuo.
+    """
+    points = np.array(region[1], dtype=np.float64)
+    lons, lats = points[:, 0], points[:, 1]
+    if lons.max() - lons.min() > 180:
+        lons = np.where(lons < 0, lons + 360, lons)
+    return lons, lats
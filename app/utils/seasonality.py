@@ -0,0 +1,328 @@
+"""
+Seasonality
+===========
+
+Pruebas de remuestreo sobre la estacionalidad de los eventos y la tasa de
+tsunamis.
+
+- Eventos por mes: Monte Carlo contra una distribución uniforme en el
+  tiempo (proporcional a los días de cada mes), con sorteos multinomiales.
+- Tasa de tsunamis por mes o por año: prueba de permutación de la etiqueta
+  de tsunami entre eventos. Permutar las etiquetas con los conteos por
+  grupo fijos equivale a un sorteo hipergeométrico multivariante, así que
+  cada permutación cuesta O(grupos) y no O(eventos).
+- Tendencia anual de la tasa de tsunamis: pendiente ponderada de la tasa
+  frente al año, con la misma distribución de permutación.
+- Intervalos de confianza bootstrap (percentiles) de los conteos mensuales
+  y de las tasas de tsunamis por grupo.
+
+Cada prueba genera sus remuestreos como matrices (remuestreos × grupos) en
+bloques de CHUNK_RESAMPLES. Cada bloque tiene su propia semilla derivada
+de SeedSequence, así que el resultado es reproducible y no depende de
+cuántos procesos lo calculen. Los bloques de las pruebas grandes se
+reparten en un pool de procesos.
+"""
+
+import multiprocessing
+import os
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+# Remuestreos por prueba
+N_RESAMPLES = 10000
+
+# Remuestreos por bloque (unidad de trabajo y de semilla)
+CHUNK_RESAMPLES = 2500
+
+# Semilla base de todas las pruebas
+TEST_SEED = 20250101
+
+# Nivel de los intervalos de confianza
+CONFIDENCE = 0.95
+
+# Procesos del pool de remuestreo, configurable (1 desactiva el pool)
+MAX_TEST_WORKERS = int(os.environ.get('EQ_TEST_WORKERS', min(4, os.cpu_count() or 1)))
+
+# Tamaño (remuestreos × grupos) a partir del cual compensa usar el pool
+PARALLEL_MIN_CELLS = 2_000_000
+
+# Días medios de cada mes (exposición de la hipótesis uniforme)
+DAYS_IN_MONTH = np.array([31, 28.25, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+# Columnas del resultado de las pruebas
+TEST_COLUMNS = ['test', 'statistic', 'p_value', 'method']
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# ============================================================================
+# PRUEBAS
+# ============================================================================
+
+def seasonality_tests(monthly, yearly, n_resamples=N_RESAMPLES):
+    """
+    Ejecuta todas las pruebas de estacionalidad y tendencia.
+
+    Args:
+        monthly (pd.DataFrame): Una fila por mes (1-12) con 'Month',
+            'events' y 'tsunamis'
+        yearly (pd.DataFrame): Una fila por año con 'Year', 'events' y
+            'tsunamis'
+        n_resamples (int): Remuestreos por prueba
+
+    Returns:
+        tuple: (pruebas, intervalos mensuales, intervalos anuales)
+            - pruebas (pd.DataFrame): TEST_COLUMNS, una fila por prueba
+            - intervalos (pd.DataFrame): Grupos con 'rate', 'rate_lo' y
+              'rate_hi' (y 'events_lo', 'events_hi' los mensuales)
+    """
+    month_events = monthly['events'].to_numpy(dtype=np.int64)
+    month_tsunamis = monthly['tsunamis'].to_numpy(dtype=np.int64)
+    year_events = yearly['events'].to_numpy(dtype=np.int64)
+    year_tsunamis = yearly['tsunamis'].to_numpy(dtype=np.int64)
+
+    tests = pd.DataFrame([
+        ('Eventos por mes',
+         *monthly_count_test(month_events, n_resamples),
+         'Monte Carlo (multinomial, χ²)'),
+        ('Tasa de tsunamis por mes',
+         *rate_heterogeneity_test(month_events, month_tsunamis, n_resamples, 'month'),
+         'Permutación (χ² de heterogeneidad)'),
+        ('Tasa de tsunamis por año',
+         *rate_heterogeneity_test(year_events, year_tsunamis, n_resamples, 'year'),
+         'Permutación (χ² de heterogeneidad)'),
+        ('Tendencia anual de la tasa de tsunamis',
+         *rate_trend_test(yearly['Year'].to_numpy(dtype=float), year_events, year_tsunamis,
+                          n_resamples),
+         'Permutación (pendiente por año)'),
+    ], columns=TEST_COLUMNS)
+
+    month_intervals = monthly[['Month']].assign(
+        **bootstrap_rate_intervals(month_events, month_tsunamis, n_resamples, 'month')
+    )
+    events_lo, events_hi = bootstrap_count_intervals(month_events, n_resamples)
+    month_intervals['events_lo'] = events_lo
+    month_intervals['events_hi'] = events_hi
+
+    year_intervals = yearly[['Year']].assign(
+        **bootstrap_rate_intervals(year_events, year_tsunamis, n_resamples, 'year')
+    )
+    return tests, month_intervals.reset_index(drop=True), year_intervals.reset_index(drop=True)
+
+
+def monthly_count_test(events, n_resamples=N_RESAMPLES):
+    """
+    Prueba si los eventos se reparten por igual entre los meses.
+
+    Args:
+        events (np.ndarray): Eventos de cada mes (12)
+        n_resamples (int): Sorteos de la hipótesis nula
+
+    Returns:
+        tuple: (χ² observado, p-valor)
+    """
+    total = int(events.sum())
+    if total == 0:
+        return 0.0, 1.0
+
+    probabilities = DAYS_IN_MONTH / DAYS_IN_MONTH.sum()
+    expected = total * probabilities
+
+    def chi_square(counts):
+        return ((counts - expected) ** 2 / expected).sum(axis=-1)
+
+    null = draw_resamples('multinomial', (total, probabilities), n_resamples, 'month_counts')
+    observed = chi_square(events)
+    return float(observed), _p_value(chi_square(null), observed)
+
+
+def rate_heterogeneity_test(events, tsunamis, n_resamples=N_RESAMPLES, name='groups'):
+    """
+    Prueba si la tasa de tsunamis es la misma en todos los grupos.
+
+    Args:
+        events (np.ndarray): Eventos de cada grupo
+        tsunamis (np.ndarray): Eventos con tsunami de cada grupo
+        n_resamples (int): Permutaciones
+        name (str): Nombre de los grupos (para la semilla)
+
+    Returns:
+        tuple: (χ² de heterogeneidad observado, p-valor)
+    """
+    total, total_tsunamis = int(events.sum()), int(tsunamis.sum())
+    if total_tsunamis in (0, total):
+        return 0.0, 1.0
+
+    rate = total_tsunamis / total
+    expected = events * rate
+    variance = np.where(events > 0, expected * (1 - rate), 1.0)
+
+    def chi_square(counts):
+        return ((counts - expected) ** 2 / variance).sum(axis=-1)
+
+    null = draw_resamples('hypergeometric', (events, total_tsunamis), n_resamples, f'{name}_rate')
+    observed = chi_square(tsunamis)
+    return float(observed), _p_value(chi_square(null), observed)
+
+
+def rate_trend_test(labels, events, tsunamis, n_resamples=N_RESAMPLES):
+    """
+    Prueba si la tasa de tsunamis cambia linealmente con el año.
+
+    Args:
+        labels (np.ndarray): Año de cada grupo
+        events (np.ndarray): Eventos de cada grupo
+        tsunamis (np.ndarray): Eventos con tsunami de cada grupo
+        n_resamples (int): Permutaciones
+
+    Returns:
+        tuple: (pendiente observada de la tasa por año, p-valor bilateral)
+    """
+    total, total_tsunamis = int(events.sum()), int(tsunamis.sum())
+    centered = labels - (events * labels).sum() / max(total, 1)
+    spread = (events * centered ** 2).sum()
+    if total_tsunamis in (0, total) or spread == 0:
+        return 0.0, 1.0
+
+    # Pendiente de mínimos cuadrados ponderada por eventos de la tasa por grupo
+    def slope(counts):
+        return (counts * centered).sum(axis=-1) / spread
+
+    null = draw_resamples('hypergeometric', (events, total_tsunamis), n_resamples, 'year_trend')
+    observed = slope(tsunamis)
+    return float(observed), _p_value(np.abs(slope(null)), abs(observed))
+
+
+def bootstrap_rate_intervals(events, tsunamis, n_resamples=N_RESAMPLES, name='groups'):
+    """
+    Intervalos bootstrap de la tasa de tsunamis de cada grupo.
+
+    Remuestrear con reemplazo los eventos de un grupo equivale a sortear su
+    número de tsunamis con una binomial de la tasa observada.
+
+    Args:
+        events (np.ndarray): Eventos de cada grupo
+        tsunamis (np.ndarray): Eventos con tsunami de cada grupo
+        n_resamples (int): Remuestreos
+        name (str): Nombre de los grupos (para la semilla)
+
+    Returns:
+        dict: {'rate', 'rate_lo', 'rate_hi'} (NaN en grupos sin eventos)
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rate = np.where(events > 0, tsunamis / np.maximum(events, 1), np.nan)
+        samples = draw_resamples('binomial', (events, np.nan_to_num(rate)), n_resamples,
+                                 f'{name}_bootstrap') / events
+    lo, hi = _percentiles(samples)
+    return {'rate': rate, 'rate_lo': np.where(events > 0, lo, np.nan),
+            'rate_hi': np.where(events > 0, hi, np.nan)}
+
+
+def bootstrap_count_intervals(events, n_resamples=N_RESAMPLES):
+    """
+    Intervalos bootstrap de los eventos de cada mes.
+
+    Args:
+        events (np.ndarray): Eventos de cada mes
+        n_resamples (int): Remuestreos
+
+    Returns:
+        tuple: (límite inferior, límite superior)
+    """
+    total = int(events.sum())
+    if total == 0:
+        return np.zeros(len(events)), np.zeros(len(events))
+    samples = draw_resamples('multinomial', (total, events / total), n_resamples, 'month_bootstrap')
+    return _percentiles(samples)
+
+
+def _p_value(null, observed):
+    """p-valor de Monte Carlo (con la corrección +1 de Davison y Hinkley)."""
+    extreme = int((null >= observed - 1e-12 * max(abs(observed), 1)).sum())
+    return (extreme + 1) / (len(null) + 1)
+
+
+def _percentiles(samples):
+    """Percentiles de un intervalo de confianza central por columna."""
+    tail = (1 - CONFIDENCE) / 2 * 100
+    return np.percentile(samples, [tail, 100 - tail], axis=0)
+
+
+# ============================================================================
+# REMUESTREO POR BLOQUES
+# ============================================================================
+
+def draw_resamples(kind, args, n_resamples, name):
+    """
+    Genera remuestreos por bloques, en paralelo si la prueba es grande.
+
+    Args:
+        kind (str): 'multinomial' (total, probabilidades),
+            'hypergeometric' (eventos por grupo, extracciones) o
+            'binomial' (ensayos por grupo, probabilidades)
+        args (tuple): Parámetros del sorteo
+        n_resamples (int): Remuestreos
+        name (str): Nombre de la prueba (deriva la semilla)
+
+    Returns:
+        np.ndarray: Matriz (remuestreos × grupos)
+    """
+    sizes = [min(CHUNK_RESAMPLES, n_resamples - start)
+             for start in range(0, n_resamples, CHUNK_RESAMPLES)]
+    seeds = np.random.SeedSequence([TEST_SEED, zlib.crc32(name.encode())]).spawn(len(sizes))
+    tasks = [(kind, args, size, seed) for size, seed in zip(sizes, seeds)]
+
+    n_groups = len(args[1]) if kind == 'multinomial' else len(args[0])
+    if MAX_TEST_WORKERS > 1 and len(tasks) > 1 and n_resamples * n_groups >= PARALLEL_MIN_CELLS:
+        try:
+            return np.vstack(list(_get_pool().map(_draw_chunk, *zip(*tasks))))
+        except (BrokenProcessPool, OSError):
+            # Sin procesos disponibles (p. ej. entorno restringido): en serie
+            _reset_pool()
+    return np.vstack([_draw_chunk(*task) for task in tasks])
+
+
+def _draw_chunk(kind, args, size, seed):
+    """Genera un bloque de remuestreos (se ejecuta en el pool)."""
+    rng = np.random.default_rng(seed)
+    if kind == 'multinomial':
+        total, probabilities = args
+        return rng.multinomial(total, probabilities, size=size)
+    if kind == 'hypergeometric':
+        colors, n_draws = args
+        return rng.multivariate_hypergeometric(colors, n_draws, size=size, method='marginals')
+    trials, probabilities = args
+    return rng.binomial(trials, probabilities, size=(size, len(trials)))
+
+
+def _get_pool():
+    """Pool de procesos compartido, creado la primera vez que se usa."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 'spawn': el servidor de Streamlit tiene hilos y no es seguro hacer fork
+            _pool = ProcessPoolExecutor(
+                max_workers=MAX_TEST_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def _reset_pool():
+    """Descarta un pool que ha fallado."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = None
@@ -0,0 +1,198 @@
+"""
+Validation
+==========
+
+Validación fila a fila del catálogo durante la ingesta.
+Cada regla es una función vectorizada que marca las filas que la violan;
+las filas con alguna violación se apartan a un DataFrame de cuarentena
+en lugar de llegar a las páginas, y se cuentan por regla.
+
+El reporte es un diccionario JSON que viaja en `df.attrs['validation']`,
+de modo que se guarda en la caché en disco junto a la huella del CSV y el
+catálogo solo se valida una vez por versión.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# ============================================================================
+# REGLAS
+# ============================================================================
+
+# {nombre: {'func', 'requires', 'description'}}, en orden de registro
+VALIDATION_RULES = {}
+
+# Columna de la cuarentena con las reglas violadas por cada fila
+QUARANTINE_RULES_COLUMN = 'reglas'
+
+
+def validation_rule(name, requires, description):
+    """
+    Decorador que registra una regla de validación.
+
+    La función recibe el DataFrame crudo (columnas del CSV) y retorna un
+    array booleano con True en las filas que violan la regla.
+
+    Args:
+        name (str): Nombre de la regla
+        requires (list): Columnas que evalúa; si falta alguna, la regla
+            no se aplica
+        description (str): Descripción para el reporte
+
+    Returns:
+        callable: Decorador
+    """
+    def decorator(func):
+        VALIDATION_RULES[name] = {
+            'func': func,
+            'requires': list(requires),
+            'description': description,
+        }
+        return func
+    return decorator
+
+
+@validation_rule('latitud_fuera_de_rango', ['latitude'],
+                 'Latitud faltante o fuera de [-90, 90]')
+def _invalid_latitude(df):
+    return ~df['latitude'].between(-90, 90).to_numpy()
+
+
+@validation_rule('longitud_fuera_de_rango', ['longitude'],
+                 'Longitud faltante o fuera de [-180, 180]')
+def _invalid_longitude(df):
+    return ~df['longitude'].between(-180, 180).to_numpy()
+
+
+@validation_rule('profundidad_negativa', ['depth'],
+                 'Profundidad menor que 0 km')
+def _negative_depth(df):
+    return (df['depth'] < 0).to_numpy()
+
+
+@validation_rule('magnitud_faltante', ['magnitude'],
+                 'Magnitud faltante')
+def _missing_magnitude(df):
+    return df['magnitude'].isna().to_numpy()
+
+
+@validation_rule('mes_invalido', ['Month'],
+                 'Mes faltante o fuera de 1-12')
+def _invalid_month(df):
+    return ~df['Month'].isin(range(1, 13)).to_numpy()
+
+
+@validation_rule('año_faltante', ['Year'],
+                 'Año faltante')
+def _missing_year(df):
+    return df['Year'].isna().to_numpy()
+
+
+@validation_rule('tsunami_invalido', ['tsunami'],
+                 'Indicador de tsunami distinto de 0 o 1')
+def _invalid_tsunami(df):
+    return ~df['tsunami'].isin([0, 1]).to_numpy()
+
+
+# ============================================================================
+# VALIDACIÓN
+# ============================================================================
+
+def new_report():
+    """
+    Crea un reporte de validación vacío.
+
+    Returns:
+        dict: {'rows': filas revisadas, 'rejected': filas en cuarentena,
+            'rules': {regla: violaciones}}
+    """
+    return {
+        'rows': 0,
+        'rejected': 0,
+        'rules': {name: 0 for name in VALIDATION_RULES},
+    }
+
+
+def merge_reports(report, other):
+    """
+    Suma en `report` los conteos de `other`.
+
+    Args:
+        report (dict): Reporte acumulado (se modifica)
+        other (dict): Reporte de otro bloque o fragmento
+
+    Returns:
+        dict: El reporte acumulado
+    """
+    report['rows'] += other['rows']
+    report['rejected'] += other['rejected']
+    for name, count in other['rules'].items():
+        report['rules'][name] = report['rules'].get(name, 0) + count
+    return report
+
+
+def validate_rows(df, report=None):
+    """
+    Separa las filas válidas de las que violan alguna regla.
+
+    Todas las reglas se evalúan de forma vectorizada sobre el bloque
+    completo; una fila que viola varias reglas cuenta en cada una de ellas.
+
+    Args:
+        df (pd.DataFrame): DataFrame crudo o bloque
+        report (dict): Reporte que se actualiza con los conteos (opcional)
+
+    Returns:
+        tuple: (filas válidas, filas en cuarentena con la columna 'reglas')
+    """
+    names = [
+        name for name, rule in VALIDATION_RULES.items()
+        if all(col in df.columns for col in rule['requires'])
+    ]
+    if names:
+        violations = np.column_stack([
+            VALIDATION_RULES[name]['func'](df) for name in names
+        ])
+    else:
+        violations = np.zeros((len(df), 0), dtype=bool)
+
+    rejected = violations.any(axis=1)
+
+    if report is not None:
+        counts = violations.sum(axis=0)
+        report['rows'] += len(df)
+        report['rejected'] += int(rejected.sum())
+        for name, count in zip(names, counts):
+            report['rules'][name] = report['rules'].get(name, 0) + int(count)
+
+    quarantine = df[rejected].copy()
+    quarantine[QUARANTINE_RULES_COLUMN] = [
+        ', '.join(np.array(names)[row]) for row in violations[rejected]
+    ]
+    if not rejected.any():
+        return df, quarantine
+    return df[~rejected], quarantine
+
+
+def report_table(report):
+    """
+    Convierte un reporte en una tabla para mostrar.
+
+    Args:
+        report (dict): Reporte de validación
+
+    Returns:
+        pd.DataFrame: Violaciones y descripción por regla
+    """
+    return pd.DataFrame(
+        [
+            {
+                'regla': name,
+                'descripción': VALIDATION_RULES.get(name, {}).get('description', ''),
+                'violaciones': count,
+            }
+            for name, count in report['rules'].items()
+        ],
+        columns=['regla', 'descripción', 'violaciones'],
+    ).set_index('regla')